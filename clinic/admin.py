@@ -1,21 +1,89 @@
 from django.contrib import admin
-from .models import Patient, Provider, Appointment
+from django.db.models import Q
+
+from .large_tables import LargeTableAdmin, PatientFilter, ProviderFilter
+from .models import Patient, Provider, ProviderWorkingHours, Appointment, AppointmentArchive, Reminder, Tenant
+from .search import CANDIDATE_LIMIT, matching_patient_ids
+
+
+@admin.register(Tenant)
+class TenantAdmin(admin.ModelAdmin):
+    list_display = ("slug", "name", "domain", "created_at")
+    search_fields = ("^slug", "^name", "^domain")
 
 
 @admin.register(Patient)
-class PatientAdmin(admin.ModelAdmin):
+class PatientAdmin(LargeTableAdmin):
     list_display = ("chart_number", "last_name", "first_name", "date_of_birth", "phone")
+    # Matched through the PatientSearchTerm index, see get_search_results()
     search_fields = ("chart_number", "first_name", "last_name", "phone")
+    search_help_text = "Chart number prefix, name prefixes, or leading/trailing phone digits."
+    keyset_keys = ("last_name", "first_name", "id")
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=matching_patient_ids(search_term)), False
+
+
+class ProviderWorkingHoursInline(admin.TabularInline):
+    model = ProviderWorkingHours
+    extra = 0
 
 
 @admin.register(Provider)
-class ProviderAdmin(admin.ModelAdmin):
+class ProviderAdmin(LargeTableAdmin):
     list_display = ("name", "specialty")
-    search_fields = ("name",)
+    # istartswith: LIKE 'abc%' on the name index
+    search_fields = ("^name",)
+    inlines = [ProviderWorkingHoursInline]
+    keyset_keys = ("name", "id")
+
+
+def appointment_search(queryset, search_term):
+    """Appointments of matching patients or providers, through the (patient, ...) / (provider, ...) indexes."""
+    term = search_term.strip()
+    if not term:
+        return queryset
+    provider_ids = Provider.objects.filter(name__istartswith=term).values_list("id", flat=True)[:CANDIDATE_LIMIT]
+    return queryset.filter(Q(patient_id__in=matching_patient_ids(term)) | Q(provider_id__in=list(provider_ids)))
 
 
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(LargeTableAdmin):
     list_display = ("patient", "provider", "start_time", "end_time", "status")
-    list_filter = ("provider", "status", "start_time")
-    search_fields = ("patient__last_name", "provider__name", "reason")
+    list_select_related = ("patient", "provider")
+    list_filter = (("provider", ProviderFilter), ("patient", PatientFilter), "status", "start_time")
+    search_fields = ("patient__last_name", "provider__name")
+    search_help_text = "Patient (chart number, name or phone) or provider name prefix."
+    autocomplete_fields = ("patient", "provider")
+    keyset_keys = ("start_time", "id")
+
+    class Media:
+        js = ["clinic/js/autocomplete.js"]
+
+    def get_search_results(self, request, queryset, search_term):
+        return appointment_search(queryset, search_term), False
+
+
+@admin.register(AppointmentArchive)
+class AppointmentArchiveAdmin(LargeTableAdmin):
+    list_display = ("patient", "provider", "start_time", "end_time", "status", "archived_at")
+    list_select_related = ("patient", "provider")
+    list_filter = (("provider", ProviderFilter), ("patient", PatientFilter), "status")
+    raw_id_fields = ("patient", "provider")
+    search_fields = ("patient__last_name", "provider__name")
+    search_help_text = "Patient (chart number, name or phone) or provider name prefix."
+
+    class Media:
+        js = ["clinic/js/autocomplete.js"]
+
+    def get_search_results(self, request, queryset, search_term):
+        return appointment_search(queryset, search_term), False
+
+
+@admin.register(Reminder)
+class ReminderAdmin(LargeTableAdmin):
+    list_display = ("id", "appointment_id", "start_time", "status", "attempts", "sent_at", "last_error")
+    list_filter = ("status",)
+    raw_id_fields = ("appointment",)
@@ -0,0 +1,235 @@
+"""
+Read-only JSON API, version 1 (/api/v1/), for systems that sync patients,
+providers and appointments.
+
+List endpoints:
+- ?fields=id,last_name    only those columns are selected (.values()), not whole rows
+- ?cursor=...             keyset pagination on id; follow "next" until it is null
+- ?page_size=N            default CLINIC_PAGE_SIZE, at most CLINIC_API_MAX_PAGE_SIZE
+- ?updated_since=<ISO 8601 datetime>
+                          change feed: rows with updated_at >= the value, in
+                          (updated_at, id) order on the updated_at index.
+                          Keep the response's "last_updated" and pass it as
+                          updated_since next time. It is never later than
+                          CLINIC_API_FEED_SKEW_SECONDS before now, because
+                          updated_at is stamped before the transaction
+                          commits (and reaches the replica), so a row can
+                          show up later with an older updated_at. Rows are
+                          sent again if they change again or fall inside
+                          that window, so apply them as upserts. Deleted and
+                          archived rows don't appear in the feed.
+
+Every response carries an ETag and detail responses a Last-Modified, both
+derived from updated_at. If-None-Match / If-Modified-Since are checked
+(django.views.decorators.http.condition) before the response body is built:
+a detail check reads one row's updated_at, and a list check reads the
+page's (id, updated_at) pairs. An unchanged resource costs that one narrow
+query and returns 304 with no body.
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_GET
+
+from .models import Appointment, Patient, Provider
+from .pagination import keyset_paginate
+from .routers import read_replica
+
+API_VERSION = "v1"
+
+
+class ApiError(Exception):
+    pass
+
+
+class Resource:
+    def __init__(self, model, fields, filters=None):
+        self.model = model
+        # API field name -> model field/column
+        self.fields = fields
+        # Query parameter -> integer lookup
+        self.filters = filters or {}
+
+
+RESOURCES = {
+    "patients": Resource(Patient, {
+        "id": "id",
+        "chart_number": "chart_number",
+        "first_name": "first_name",
+        "last_name": "last_name",
+        "date_of_birth": "date_of_birth",
+        "phone": "phone",
+        "email": "email",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+    }),
+    "providers": Resource(Provider, {
+        "id": "id",
+        "name": "name",
+        "specialty": "specialty",
+        "updated_at": "updated_at",
+    }),
+    "appointments": Resource(Appointment, {
+        "id": "id",
+        "patient": "patient_id",
+        "provider": "provider_id",
+        "start_time": "start_time",
+        "end_time": "end_time",
+        "reason": "reason",
+        "status": "status",
+        "created_at": "created_at",
+        "updated_at": "updated_at",
+    }, filters={"patient": "patient_id", "provider": "provider_id"}),
+}
+
+
+# --------- Request parsing --------- #
+
+def _selected_fields(request, resource):
+    requested = request.GET.get("fields")
+    if not requested:
+        return list(resource.fields)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(resource.fields)}.")
+    return names
+
+
+def _page_size(request):
+    default = getattr(settings, "CLINIC_PAGE_SIZE", 50)
+    limit = getattr(settings, "CLINIC_API_MAX_PAGE_SIZE", 500)
+    value = request.GET.get("page_size", "")
+    return min(int(value), limit) if value.isdigit() and int(value) > 0 else default
+
+
+def _updated_since(request):
+    value = request.GET.get("updated_since")
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        since = None
+    if since is None:
+        raise ApiError("updated_since must be an ISO 8601 datetime.")
+    return timezone.make_aware(since) if timezone.is_naive(since) else since
+
+
+def _list_query(request, resource):
+    """(queryset, keyset keys) for a list request, filters applied."""
+    qs = resource.model.objects.all()
+    for param, lookup in resource.filters.items():
+        value = request.GET.get(param)
+        if value:
+            if not value.isdigit():
+                raise ApiError(f"{param} must be an id.")
+            qs = qs.filter(**{lookup: int(value)})
+    if resource.model is Appointment and request.GET.get("status"):
+        qs = qs.filter(status=request.GET["status"])
+
+    since = _updated_since(request)
+    if since is None:
+        return qs, ["id"]
+    return qs.filter(updated_at__gte=since), ["updated_at", "id"]
+
+
+def _fetch_page(request, resource, columns):
+    qs, keys = _list_query(request, resource)
+    # The keyset keys are always selected so the cursor can be built
+    return keyset_paginate(
+        qs.values(*dict.fromkeys([*keys, *columns])),
+        keys,
+        cursor=request.GET.get("cursor"),
+        page_size=_page_size(request),
+    )
+
+
+def _error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+# --------- Conditional GET --------- #
+
+def _digest(*parts):
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _list_etag(request, resource):
+    try:
+        page = _fetch_page(request, RESOURCES[resource], ["updated_at"])
+    except ApiError:
+        return None
+    stamps = [(row["id"], row["updated_at"].isoformat()) for row in page]
+    return _digest(API_VERSION, request.get_full_path(), stamps, page.next_cursor)
+
+
+def _updated_at(request, resource, pk):
+    # Both condition() callbacks need it; read it once per request
+    if not hasattr(request, "_api_updated_at"):
+        request._api_updated_at = (
+            RESOURCES[resource].model.objects.filter(pk=pk).values_list("updated_at", flat=True).first()
+        )
+    return request._api_updated_at
+
+
+def _detail_etag(request, resource, pk):
+    updated_at = _updated_at(request, resource, pk)
+    if updated_at is None:
+        return None
+    return _digest(API_VERSION, request.get_full_path(), updated_at.isoformat())
+
+
+def _detail_last_modified(request, resource, pk):
+    return _updated_at(request, resource, pk)
+
+
+def _json(payload, status=200):
+    response = JsonResponse(payload, status=status)
+    # Clients may keep the body but must revalidate (cheap: 304) before using it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# --------- API Views --------- #
+
+@require_GET
+@read_replica
+@condition(etag_func=_list_etag)
+def resource_list(request, resource):
+    spec = RESOURCES[resource]
+    try:
+        fields = _selected_fields(request, spec)
+        page = _fetch_page(request, spec, [spec.fields[name] for name in fields])
+    except ApiError as exc:
+        return _error(str(exc))
+
+    results = [{name: row[spec.fields[name]] for name in fields} for row in page]
+    payload = {"results": results, "next": page.next_cursor}
+    since = _updated_since(request)
+    if since is not None:
+        last = page.items[-1]["updated_at"] if page.items else since
+        skew = timedelta(seconds=getattr(settings, "CLINIC_API_FEED_SKEW_SECONDS", 30))
+        payload["last_updated"] = min(last, timezone.now() - skew).isoformat()
+    return _json(payload)
+
+
+@require_GET
+@read_replica
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+def resource_detail(request, resource, pk):
+    spec = RESOURCES[resource]
+    try:
+        fields = _selected_fields(request, spec)
+    except ApiError as exc:
+        return _error(str(exc))
+    row = spec.model.objects.filter(pk=pk).values(*[spec.fields[name] for name in fields]).first()
+    if row is None:
+        return _error(f"{spec.model._meta.verbose_name.capitalize()} not found.", status=404)
+    return _json({name: row[spec.fields[name]] for name in fields})
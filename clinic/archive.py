@@ -0,0 +1,143 @@
+"""
+Archival of historical appointments.
+
+Old rows are moved from Appointment into AppointmentArchive so the live
+table (and the indexes every conflict check and calendar query walks)
+only holds recent and upcoming appointments. A row is archived when it
+started more than CLINIC_ARCHIVE_AFTER_MONTHS ago, or when it is canceled
+and started more than CLINIC_ARCHIVE_CANCELED_AFTER_MONTHS ago.
+
+Each batch is copied and deleted in one transaction on the primary, in
+(start_time, id) order so the scan can use the (start_time, id) index.
+The delete skips per-row signals and cascades (see RAW_DELETED):
+archiving is a move, not a cancellation, and the affected schedule
+buckets are dropped once per batch instead.
+
+history_page() reads both tables so history pages don't need to know
+where a row lives.
+"""
+
+import calendar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Q, Value
+from django.utils import timezone
+
+from .models import Appointment, AppointmentArchive, Reminder
+from .pagination import _keyset_filter, decode_cursor, encode_cursor
+from .routers import use_primary
+from .schedule import invalidate_buckets
+
+ARCHIVE_FIELDS = [
+    "id",
+    "tenant_id",
+    "patient_id",
+    "provider_id",
+    "start_time",
+    "end_time",
+    "reason",
+    "status",
+    "created_at",
+    "updated_at",
+]
+
+# Batches are removed with _raw_delete(), which skips the ORM's collector:
+# no per-row post_delete (an archived row isn't deleted, so it mustn't
+# emit an outbox DELETED event or leave the daily summaries) and no
+# cascades. Every relation pointing at a raw-deleted model has to be
+# deleted explicitly, so this lists them and check_relations() refuses to
+# run once a model grows a relation the loop doesn't handle.
+RAW_DELETED = {Appointment: {Reminder}, Reminder: set()}
+
+
+def check_relations():
+    for model, handled in RAW_DELETED.items():
+        related = {rel.related_model for rel in model._meta.related_objects}
+        if related - handled:
+            names = ", ".join(sorted(m.__name__ for m in related - handled))
+            raise ImproperlyConfigured(f"Archiving would orphan {names} rows pointing at {model.__name__}.")
+
+
+def months_ago(months, now=None):
+    now = now or timezone.now()
+    year, month = divmod(now.year * 12 + now.month - 1 - months, 12)
+    month += 1
+    return now.replace(year=year, month=month, day=min(now.day, calendar.monthrange(year, month)[1]))
+
+
+def archivable(cutoff, canceled_cutoff=None):
+    """Live appointments due for archiving, oldest first."""
+    canceled_cutoff = max(cutoff, canceled_cutoff or cutoff)
+    return (
+        Appointment.objects.filter(start_time__lt=canceled_cutoff)
+        .filter(Q(start_time__lt=cutoff, end_time__lt=cutoff) | Q(status="canceled"))
+        .order_by("start_time", "id")
+    )
+
+
+def archive_appointments(cutoff=None, canceled_cutoff=None, batch_size=1000, limit=None, progress=None):
+    """
+    Move archivable appointments in batches of `batch_size` (at most `limit`
+    rows in total). Calls progress(moved_so_far) after each batch and
+    returns the number of rows moved.
+    """
+    if cutoff is None:
+        cutoff = months_ago(getattr(settings, "CLINIC_ARCHIVE_AFTER_MONTHS", 12))
+    if canceled_cutoff is None:
+        canceled_cutoff = months_ago(getattr(settings, "CLINIC_ARCHIVE_CANCELED_AFTER_MONTHS", 1))
+
+    check_relations()
+    moved = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        with use_primary(), transaction.atomic():
+            rows = list(archivable(cutoff, canceled_cutoff).select_for_update().values(*ARCHIVE_FIELDS)[:size])
+            if not rows:
+                break
+            AppointmentArchive.objects.bulk_create([AppointmentArchive(**row) for row in rows])
+            ids = [row["id"] for row in rows]
+            # Sent and stale reminders go with their appointments
+            reminders = Reminder.objects.filter(appointment_id__in=ids)
+            reminders._raw_delete(reminders.db)
+            live = Appointment.objects.filter(pk__in=ids)
+            live._raw_delete(live.db)
+            slots = [(row["provider_id"], row["start_time"]) for row in rows]
+            transaction.on_commit(lambda slots=slots: invalidate_buckets(slots))
+        moved += len(rows)
+        if progress:
+            progress(moved)
+    return moved
+
+
+# --------- History --------- #
+
+HISTORY_FIELDS = ["id", "provider_id", "provider__name", "start_time", "end_time", "reason", "status"]
+HISTORY_KEYS = ["start_time", "id"]
+
+
+def history_page(patient_id, cursor=None, page_size=50):
+    """
+    One page of a patient's appointments from the live and archive tables,
+    newest first, as dicts with an extra "archived" flag. Returns
+    (rows, next_cursor).
+    """
+    values, _ = decode_cursor(cursor)
+    live = Appointment.objects.filter(patient_id=patient_id)
+    archived = AppointmentArchive.objects.filter(patient_id=patient_id)
+    if values is not None and len(values) == len(HISTORY_KEYS):
+        condition = _keyset_filter(HISTORY_KEYS, values, "lt")
+        live, archived = live.filter(condition), archived.filter(condition)
+
+    # Each side is cut to page_size + 1 by its (patient, start_time) index before merging
+    newest = ["-start_time", "-id"]
+    live = live.order_by(*newest).values(*HISTORY_FIELDS).annotate(archived=Value(False))[: page_size + 1]
+    archived = archived.order_by(*newest).values(*HISTORY_FIELDS).annotate(archived=Value(True))[: page_size + 1]
+    rows = sorted([*live, *archived], key=lambda row: (row["start_time"], row["id"]), reverse=True)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([rows[-1]["start_time"], rows[-1]["id"]])
+    return rows, next_cursor
@@ -0,0 +1,174 @@
+"""
+Async (ASGI) versions of the read-heavy views, plus a small JSON API.
+
+Under an ASGI server these don't tie up a worker thread while MySQL is
+working: async ORM calls and sync_to_async() helpers run the query in a
+thread and the event loop moves on to other requests meanwhile. Templates
+are rendered through sync_to_async as well because base.html reads the
+session (messages), which is a synchronous database access. Under WSGI
+they still work, Django just runs them through async_to_sync.
+
+Bookings posted to the JSON API go through clinic.booking_queue so a
+burst of requests can't take more than CLINIC_BOOKING_WORKERS database
+connections. Read-only views and API endpoints are served from a read
+replica when one is configured (clinic/routers.py).
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+from django.views.decorators.http import require_GET, require_POST
+
+from .booking_queue import BookingQueueFull, booking_queue
+from .caching import get_providers
+from .forms import PatientSearchForm
+from .models import Appointment, Patient
+from .pagination import akeyset_paginate
+from .routers import read_replica
+from .schedule import get_schedule
+from .search import search_patients
+from .views import _page_size, _parse_date, render_appointment_rows
+
+arender = sync_to_async(render)
+
+
+# --------- Async Views --------- #
+
+@read_replica
+async def patient_search(request):
+    form = PatientSearchForm(request.GET or None)
+    results = []
+    if form.is_valid():
+        # Several dependent index lookups; one thread hop for the lot
+        results = await sync_to_async(search_patients)(
+            name=form.cleaned_data.get("name"),
+            date_of_birth=form.cleaned_data.get("date_of_birth"),
+            phone=form.cleaned_data.get("phone"),
+        )
+    return await arender(request, "clinic/patient_search.html", {"form": form, "results": results})
+
+
+@read_replica
+async def appointment_list(request):
+    appointments = await akeyset_paginate(
+        Appointment.objects.select_related("patient", "provider"),
+        ["start_time", "id"],
+        cursor=request.GET.get("cursor"),
+        page_size=_page_size(),
+    )
+    # Cached row fragments (clinic/fragments.py); the cache client is synchronous
+    rows = await sync_to_async(render_appointment_rows)(appointments.items)
+    return await arender(request, "clinic/appointment_list.html", {"appointments": appointments, "rows": rows})
+
+
+@read_replica
+async def provider_calendar(request):
+    providers = await sync_to_async(get_providers)()
+    provider_id = request.GET.get("provider")
+    selected_date = _parse_date(request.GET.get("date"))
+
+    selected_provider = None
+    appointments = []
+    if provider_id:
+        selected_provider = next((p for p in providers if str(p.pk) == provider_id), None)
+        if selected_provider is None:
+            raise Http404("No Provider matches the given query.")
+        schedule = await sync_to_async(get_schedule)([selected_provider.pk], selected_date, selected_date)
+        appointments = schedule[(selected_provider.pk, selected_date)]
+
+    context = {
+        "providers": providers,
+        "selected_provider": selected_provider,
+        "selected_date": selected_date,
+        "appointments": appointments,
+    }
+    return await arender(request, "clinic/provider_calendar.html", context)
+
+
+# --------- Async JSON API --------- #
+
+def _patient_json(patient):
+    return {
+        "id": patient.pk,
+        "chart_number": patient.chart_number,
+        "first_name": patient.first_name,
+        "last_name": patient.last_name,
+        "date_of_birth": patient.date_of_birth,
+        "phone": patient.phone,
+        "email": patient.email,
+    }
+
+
+def _appointment_json(appointment):
+    return {
+        "id": appointment.pk,
+        "patient": appointment.patient_id,
+        "provider": appointment.provider_id,
+        "start_time": appointment.start_time,
+        "end_time": appointment.end_time,
+        "reason": appointment.reason,
+        "status": appointment.status,
+    }
+
+
+@require_GET
+@read_replica
+async def patient_detail_api(request, patient_id):
+    try:
+        patient = await Patient.objects.aget(pk=patient_id)
+    except Patient.DoesNotExist:
+        return JsonResponse({"error": "Patient not found."}, status=404)
+    return JsonResponse(_patient_json(patient))
+
+
+@require_GET
+@read_replica
+async def patient_appointments_api(request, patient_id):
+    if not await Patient.objects.filter(pk=patient_id).aexists():
+        return JsonResponse({"error": "Patient not found."}, status=404)
+    page = await akeyset_paginate(
+        Appointment.objects.filter(patient_id=patient_id),
+        ["start_time", "id"],
+        cursor=request.GET.get("cursor"),
+        page_size=_page_size(),
+    )
+    return JsonResponse({
+        "results": [_appointment_json(a) for a in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
+
+
+@require_GET
+@read_replica
+async def appointment_list_api(request):
+    qs = Appointment.objects.all()
+    if request.GET.get("provider", "").isdigit():
+        qs = qs.filter(provider_id=int(request.GET["provider"]))
+    if request.GET.get("status"):
+        qs = qs.filter(status=request.GET["status"])
+    page = await akeyset_paginate(qs, ["start_time", "id"], cursor=request.GET.get("cursor"), page_size=_page_size())
+    return JsonResponse({
+        "results": [_appointment_json(a) for a in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
+
+
+@require_POST
+async def appointment_book_api(request):
+    """
+    Book from form-encoded AppointmentForm fields; 201, 400 with errors, or
+    503 when saturated. Like every POST it is CSRF-protected: clients send
+    the csrftoken cookie (set by any page with a form) back in an
+    X-CSRFToken header, or get a 403.
+    """
+    try:
+        appointment, errors = await booking_queue.submit(request.POST)
+    except BookingQueueFull:
+        response = JsonResponse({"error": "Booking queue is full, try again shortly."}, status=503)
+        response["Retry-After"] = "1"
+        return response
+    if errors:
+        return JsonResponse({"errors": errors}, status=400)
+    return JsonResponse(_appointment_json(appointment), status=201)
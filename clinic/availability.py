@@ -0,0 +1,164 @@
+"""
+Free-slot search.
+
+For a set of providers and a date range this builds each provider's working
+windows from ProviderWorkingHours (or CLINIC_DEFAULT_WORKING_HOURS), pulls
+every scheduled appointment in the range with one query, merges the busy
+intervals per provider and subtracts them from the windows. Slots are then
+generated lazily from the gaps and merged across providers in time order,
+so asking for the first N slots stops as soon as N are found.
+"""
+
+import heapq
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .interval_index import enabled as schedule_index_enabled, schedule_index
+from .models import Appointment, ProviderWorkingHours
+
+DEFAULT_WORKING_HOURS = {weekday: [("09:00", "17:00")] for weekday in range(5)}
+
+
+def _default_hours():
+    configured = getattr(settings, "CLINIC_DEFAULT_WORKING_HOURS", DEFAULT_WORKING_HOURS)
+    return {
+        int(weekday): [(time.fromisoformat(start), time.fromisoformat(end)) for start, end in windows]
+        for weekday, windows in configured.items()
+    }
+
+
+def working_hours(provider_ids):
+    """provider_id -> {weekday: [(start time, end time), ...]} in one query."""
+    hours = {}
+    rows = ProviderWorkingHours.objects.filter(provider_id__in=provider_ids).values_list(
+        "provider_id", "weekday", "start_time", "end_time"
+    )
+    for provider_id, weekday, start, end in rows:
+        hours.setdefault(provider_id, {}).setdefault(weekday, []).append((start, end))
+
+    default = _default_hours()
+    return {pk: hours.get(pk, default) for pk in provider_ids}
+
+
+def busy_intervals(provider_ids, range_start, range_end):
+    """provider_id -> merged, sorted [(start, end), ...] of scheduled time."""
+    if schedule_index_enabled():
+        # Served from memory when the range is inside the indexed window
+        busy = schedule_index.busy(provider_ids, range_start, range_end)
+        if busy is not None:
+            return {pk: merge_intervals(intervals) for pk, intervals in busy.items()}
+
+    busy = {pk: [] for pk in provider_ids}
+    rows = Appointment.objects.filter(
+        provider_id__in=provider_ids,
+        status="scheduled",
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+    ).values_list("provider_id", "start_time", "end_time")
+    for provider_id, start, end in rows:
+        busy[provider_id].append((start, end))
+    return {pk: merge_intervals(intervals) for pk, intervals in busy.items()}
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _windows(hours, start_date, end_date, tz):
+    """
+    Working windows as UTC (start, end) pairs. A window whose end is at or
+    before its start runs past midnight, so the day before start_date is
+    included for its overnight windows. UTC keeps slot arithmetic in
+    elapsed time across DST changes.
+    """
+    day = start_date - timedelta(days=1)
+    while day <= end_date:
+        for start, end in sorted(hours.get(day.weekday(), [])):
+            end_day = day if end > start else day + timedelta(days=1)
+            yield (
+                timezone.make_aware(datetime.combine(day, start), tz).astimezone(dt_timezone.utc),
+                timezone.make_aware(datetime.combine(end_day, end), tz).astimezone(dt_timezone.utc),
+            )
+        day += timedelta(days=1)
+
+
+def free_gaps(windows, busy):
+    """
+    Subtract merged `busy` intervals from chronologically ordered `windows`.
+    Yields (window start, gap start, gap end).
+    """
+    i = 0
+    for window_start, window_end in windows:
+        # Busy intervals are sorted, so skip the ones that ended already
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+        cursor = window_start
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            if busy[j][0] > cursor:
+                yield window_start, cursor, busy[j][0]
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < window_end:
+            yield window_start, cursor, window_end
+
+
+def _provider_slots(provider_id, gaps, duration, step, not_before, not_after):
+    for window_start, gap_start, gap_end in gaps:
+        # Candidate starts sit on the step grid from the start of the working
+        # window (9:00, 9:15, ...), not from wherever the gap begins
+        slot = max(gap_start, not_before)
+        offset = (slot - window_start) % step
+        if offset:
+            slot += step - offset
+        end = min(gap_end, not_after)
+        while slot + duration <= end:
+            yield slot, provider_id, slot + duration
+            slot += step
+
+
+def find_free_slots(provider_ids, duration, start_date, end_date, limit=10, step=None):
+    """
+    First `limit` free slots of `duration` across `provider_ids` between
+    start_date and end_date (inclusive), as (start, provider_id, end)
+    tuples (UTC) in chronological order. Slots in the past are skipped.
+    """
+    provider_ids = list(provider_ids)
+    if not provider_ids:
+        return []
+    step = step or timedelta(minutes=getattr(settings, "CLINIC_SLOT_STEP_MINUTES", 15))
+    tz = timezone.get_current_timezone()
+    range_start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    not_before = max(range_start, timezone.now())
+
+    hours = working_hours(provider_ids)
+    busy = busy_intervals(provider_ids, range_start, range_end)
+
+    streams = [
+        _provider_slots(
+            pk,
+            free_gaps(_windows(hours[pk], start_date, end_date, tz), busy[pk]),
+            duration,
+            step,
+            not_before,
+            # Busy time is only loaded up to range_end
+            range_end,
+        )
+        for pk in provider_ids
+    ]
+    slots = []
+    for slot in heapq.merge(*streams):
+        slots.append(slot)
+        if len(slots) >= limit:
+            break
+    return slots
@@ -0,0 +1,652 @@
+"""
+Benchmark scenarios for the hot paths, run against whatever database is
+configured (SQLite or a local MySQL; no network needed). Load data first
+with `manage.py generate_synthetic_data`, then `manage.py run_benchmarks`.
+
+Views are called in-process through RequestFactory + URL resolution, so the
+numbers cover URL routing, ORM and template rendering but not a web server.
+Each scenario reports latency percentiles and SQL query counts; results can
+be saved as a JSON baseline and later runs compared against it.
+
+server_comparison() drives the real WSGI and ASGI handlers (still
+in-process, no sockets) at a fixed concurrency: a thread pool for WSGI,
+like a threaded server, and one event loop for ASGI with the async views.
+An optional artificial per-query delay stands in for a slow MySQL.
+
+profile_views() splits each page's time into ORM (SQL), template
+rendering and the rest of the view, with cold and warm caches.
+
+startup_comparison() starts the WSGI/ASGI entry point in fresh
+interpreters (normal and lean startup, see clinic/startup.py) under
+`python -X importtime` and reports startup phases and import times.
+
+tenant_scaling() adds synthetic clinics (tenants) step by step and times
+the per-clinic pages for the first one after each step.
+"""
+
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, connections, transaction
+from django.db.models.query import QuerySet
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+
+from .availability import find_free_slots
+from .booking import save_appointment
+from .caching import clear_all
+from .interval_index import bump_version
+from .startup import parse_importtime
+from .models import Appointment, Patient, Provider, Tenant
+from .pagination import encode_cursor
+from .synthetic import generate_appointments, generate_patients, generate_providers
+from .tenants import use_tenant
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Benchmark:
+    def __init__(self, seed=42, days_back=365, days_ahead=60):
+        self.rng = random.Random(seed)
+        self.factory = RequestFactory()
+        self.provider_ids = list(Provider.objects.values_list("id", flat=True))
+        self.specialties = list(
+            Provider.objects.exclude(specialty=None).values_list("specialty", flat=True).distinct()
+        )
+        self.min_patient_id = Patient.objects.order_by("id").values_list("id", flat=True).first() or 0
+        self.max_patient_id = Patient.objects.order_by("-id").values_list("id", flat=True).first() or 0
+        self.today = date.today()
+        self.days_back, self.days_ahead = days_back, days_ahead
+
+    # --------- Helpers --------- #
+
+    def get(self, path, params=None):
+        request = self.factory.get(path, params or {})
+        match = resolve(request.path_info)
+        request.resolver_match = match
+        response = match.func(request, *match.args, **match.kwargs)
+        assert response.status_code == 200, f"{path} returned {response.status_code}"
+        if response.streaming:
+            # Streamed pages render while they are read
+            b"".join(response.streaming_content)
+        return response
+
+    def random_patient(self):
+        # Id probing avoids ORDER BY RAND() / OFFSET scans on big tables
+        while True:
+            patient = Patient.objects.filter(
+                pk__gte=self.rng.randint(self.min_patient_id, self.max_patient_id)
+            ).order_by("pk").first()
+            if patient:
+                return patient
+
+    def random_day(self, back=None, ahead=None):
+        back = self.days_back if back is None else back
+        ahead = self.days_ahead if ahead is None else ahead
+        return self.today + timedelta(days=self.rng.randint(-back, ahead))
+
+    # --------- Scenarios --------- #
+
+    def scenario_patient_search_name(self):
+        patient = self.random_patient()
+        name = patient.last_name
+        if len(name) > 4 and self.rng.random() < 0.3:
+            # Typo: swap two letters
+            i = self.rng.randrange(1, len(name) - 2)
+            name = name[:i] + name[i + 1] + name[i] + name[i + 2:]
+        return lambda: self.get("/patients/search/", {"name": name})
+
+    def scenario_patient_search_phone(self):
+        digits = "".join(c for c in self.random_patient().phone if c.isdigit())[-4:]
+        return lambda: self.get("/patients/search/", {"phone": digits})
+
+    def scenario_appointment_conflict_check(self):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(
+            days=self.rng.randint(1, 60), hours=self.rng.randint(0, 8)
+        )
+        appointment = Appointment(
+            patient=self.random_patient(),
+            provider_id=self.rng.choice(self.provider_ids),
+            start_time=start,
+            end_time=start + timedelta(minutes=30),
+        )
+
+        def run():
+            # Full locked check + insert, rolled back so the data stays put
+            with transaction.atomic():
+                try:
+                    save_appointment(appointment)
+                except Exception:
+                    pass
+                transaction.set_rollback(True)
+            appointment.pk = None
+        return run
+
+    def scenario_provider_calendar(self):
+        params = {"provider": self.rng.choice(self.provider_ids), "date": self.random_day().isoformat()}
+        return lambda: self.get("/calendar/", params)
+
+    def scenario_provider_schedule_week(self):
+        providers = self.rng.sample(self.provider_ids, min(5, len(self.provider_ids)))
+        params = {"provider": providers, "view": "week", "date": self.random_day().isoformat()}
+        return lambda: self.get("/calendar/schedule/", params)
+
+    def scenario_free_slots_specialty(self):
+        specialty = self.rng.choice(self.specialties) if self.specialties else None
+        provider_ids = list(Provider.objects.filter(specialty=specialty).values_list("id", flat=True))
+        return lambda: find_free_slots(provider_ids, timedelta(minutes=30), self.today, self.today + timedelta(days=90))
+
+    def scenario_patient_list_first_page(self):
+        return lambda: self.get("/patients/")
+
+    def scenario_patient_list_deep_page(self):
+        patient = self.random_patient()
+        cursor = encode_cursor([patient.last_name, patient.first_name, patient.pk])
+        return lambda: self.get("/patients/", {"cursor": cursor})
+
+    def scenario_appointment_list_deep_page(self):
+        appointment = Appointment.objects.filter(start_time__gte=timezone.now() - timedelta(
+            days=self.rng.randint(0, self.days_back))).order_by("start_time").first()
+        params = {"cursor": encode_cursor([appointment.start_time, appointment.pk])} if appointment else {}
+        return lambda: self.get("/appointments/", params)
+
+    def scenario_patient_list_long(self):
+        return lambda: self.get("/patients/", {"page_size": 1000})
+
+    def scenario_appointment_list_long(self):
+        return lambda: self.get("/appointments/", {"page_size": 1000})
+
+    @classmethod
+    def available(cls):
+        return [name[len("scenario_"):] for name in dir(cls) if name.startswith("scenario_")]
+
+    # --------- Runner --------- #
+
+    def run(self, name, iterations=50, warmup=5):
+        make = getattr(self, f"scenario_{name}")
+        timings = []
+        queries = []
+        for i in range(warmup + iterations):
+            op = make()
+            # Cold cache for every measured call so schedule buckets don't hide the DB cost
+            clear_all()
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                op()
+                elapsed = time.perf_counter() - started
+            if i >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(ctx.captured_queries))
+        timings.sort()
+        return {
+            "iterations": iterations,
+            "p50_ms": percentile(timings, 0.50),
+            "p95_ms": percentile(timings, 0.95),
+            "p99_ms": percentile(timings, 0.99),
+            "mean_ms": statistics.fmean(timings),
+            "max_ms": timings[-1],
+            "queries_mean": statistics.fmean(queries),
+            "queries_max": max(queries),
+        }
+
+
+def environment():
+    return {
+        "vendor": connection.vendor,
+        "python": platform.python_version(),
+        "rows": {
+            "patients": Patient.objects.count(),
+            "providers": Provider.objects.count(),
+            "appointments": Appointment.objects.count(),
+        },
+    }
+
+
+def run_all(names=None, iterations=50, warmup=5, seed=42):
+    bench = Benchmark(seed=seed)
+    names = names or Benchmark.available()
+    return {
+        "environment": environment(),
+        "results": {name: bench.run(name, iterations, warmup) for name in names},
+    }
+
+
+def compare(current, baseline, tolerance=0.25, noise_floor_ms=1.0):
+    """Regression messages for scenarios slower (p95) or chattier (queries) than baseline."""
+    problems = []
+    for name, base in baseline.get("results", {}).items():
+        now = current["results"].get(name)
+        if now is None:
+            continue
+        limit = base["p95_ms"] * (1 + tolerance)
+        if now["p95_ms"] > limit and now["p95_ms"] - base["p95_ms"] > noise_floor_ms:
+            problems.append(f"{name}: p95 {now['p95_ms']:.1f}ms > baseline {base['p95_ms']:.1f}ms (+{tolerance:.0%})")
+        if now["queries_max"] > base["queries_max"]:
+            problems.append(f"{name}: up to {now['queries_max']} queries, baseline {base['queries_max']}")
+    return problems
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(report, path):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+# --------- Template vs ORM --------- #
+
+PROFILE_SCENARIOS = [
+    "patient_list_first_page",
+    "patient_list_long",
+    "appointment_list_deep_page",
+    "appointment_list_long",
+    "provider_calendar",
+    "provider_schedule_week",
+]
+
+
+class _PhaseTimer:
+    """
+    Splits wall time between "orm" (QuerySet evaluation: SQL, fetching
+    and building rows; plus any other SQL) and "template" (Template.render)
+    by whichever is innermost, so lazy querysets evaluated by a template
+    count as ORM and {% include %}s aren't counted twice.
+    """
+
+    def __init__(self):
+        self.seconds = {"orm": 0.0, "template": 0.0}
+        self.queries = 0
+        self._stack = []
+        self._mark = None
+
+    def _enter(self, phase):
+        now = time.perf_counter()
+        if self._stack:
+            self.seconds[self._stack[-1]] += now - self._mark
+        self._stack.append(phase)
+        self._mark = now
+
+    def _exit(self):
+        now = time.perf_counter()
+        self.seconds[self._stack.pop()] += now - self._mark
+        self._mark = now
+
+    def _timed(self, phase, function):
+        def wrapper(*args, **kwargs):
+            self._enter(phase)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._exit()
+        return wrapper
+
+    def _execute(self, execute, sql, params, many, context):
+        self.queries += 1
+        return self._timed("orm", execute)(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack_exit = stack = ExitStack()
+        for owner, name, phase in ((QuerySet, "_fetch_all", "orm"), (Template, "render", "template")):
+            original = getattr(owner, name)
+            setattr(owner, name, self._timed(phase, original))
+            stack.callback(setattr, owner, name, original)
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self._execute))
+        return self
+
+    def __exit__(self, *exc):
+        self._stack_exit.close()
+
+
+def _profile_call(op):
+    with _PhaseTimer() as timer:
+        started = time.perf_counter()
+        op()
+        elapsed = time.perf_counter() - started
+    return elapsed * 1000, timer.seconds["orm"] * 1000, timer.seconds["template"] * 1000, timer.queries
+
+
+def profile_views(names=None, iterations=20, seed=42):
+    """
+    Per scenario, median total / ORM / template milliseconds and query
+    count, with cold caches and then again for the same request with the
+    caches (row fragments, schedule buckets) it just filled.
+    """
+    bench = Benchmark(seed=seed)
+    results = {}
+    for name in names or PROFILE_SCENARIOS:
+        make = getattr(bench, f"scenario_{name}")
+        calls = {"cold": [], "warm": []}
+        for _ in range(iterations):
+            op = make()
+            clear_all()
+            calls["cold"].append(_profile_call(op))
+            calls["warm"].append(_profile_call(op))
+        results[name] = {
+            state: {
+                "total_ms": statistics.median(c[0] for c in runs),
+                "orm_ms": statistics.median(c[1] for c in runs),
+                "template_ms": statistics.median(c[2] for c in runs),
+                "other_ms": statistics.median(c[0] - c[1] - c[2] for c in runs),
+                "queries": statistics.median(c[3] for c in runs),
+            }
+            for state, runs in calls.items()
+        }
+    return {"environment": environment(), "iterations": iterations, "results": results}
+
+
+# --------- WSGI vs ASGI --------- #
+
+# (sync path, async path) pairs rendering the same page
+SERVER_SCENARIOS = {
+    "patient_search": ("/patients/search/", "/async/patients/search/"),
+    "appointment_list": ("/appointments/", "/async/appointments/"),
+    "provider_calendar": ("/calendar/", "/async/calendar/"),
+}
+
+
+def _host():
+    hosts = [h for h in settings.ALLOWED_HOSTS if h and h[0] not in ".*"]
+    return hosts[0] if hosts else "localhost"
+
+
+class _QueryDelay:
+    """execute_wrapper adding a fixed sleep to every query (simulated network/DB latency)."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def _query_strings(name, count, seed):
+    """Request query strings for a scenario, drawn up front so both servers see the same ones."""
+    bench = Benchmark(seed=seed)
+    if name == "patient_search":
+        return [urlencode({"name": bench.random_patient().last_name}) for _ in range(count)]
+    if name == "provider_calendar":
+        return [
+            urlencode({"provider": bench.rng.choice(bench.provider_ids), "date": bench.random_day(30, 30)})
+            for _ in range(count)
+        ]
+    query_strings = []
+    for _ in range(count):
+        appointment = Appointment.objects.filter(
+            start_time__gte=timezone.now() - timedelta(days=bench.rng.randint(0, 365))
+        ).order_by("start_time").first()
+        query_strings.append(urlencode({"cursor": encode_cursor([appointment.start_time, appointment.pk])})
+                             if appointment else "")
+    return query_strings
+
+
+def _summary(timings, errors, elapsed):
+    timings.sort()
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "rps": len(timings) / elapsed if elapsed else None,
+        "p50_ms": percentile(timings, 0.50),
+        "p95_ms": percentile(timings, 0.95),
+        "p99_ms": percentile(timings, 0.99),
+    }
+
+
+def run_wsgi(path, query_strings, concurrency):
+    handler = WSGIHandler()
+    host = _host()
+
+    def one(query_string):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "SCRIPT_NAME": "",
+            "QUERY_STRING": query_string,
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "HTTP_HOST": host,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(b""),
+            "wsgi.errors": sys.stderr,
+        }
+        status = []
+        started = time.perf_counter()
+        response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return (time.perf_counter() - started) * 1000, status[0].startswith("200")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, query_strings))
+    elapsed = time.perf_counter() - started
+    return _summary([ms for ms, _ in results], sum(not ok for _, ok in results), elapsed)
+
+
+def run_asgi(path, query_strings, concurrency):
+    handler = ASGIHandler()
+    host = _host()
+
+    async def one(query_string, limit):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "root_path": "",
+            "query_string": query_string.encode(),
+            "headers": [(b"host", host.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": (host, 80),
+        }
+        body_sent = False
+        status = []
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # No disconnect; Django cancels this listener once the response is done
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        async with limit:
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            return (time.perf_counter() - started) * 1000, status[0] == 200
+
+    async def main():
+        limit = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(one(qs, limit) for qs in query_strings))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    return _summary([ms for ms, _ in results], sum(not ok for _, ok in results), elapsed)
+
+
+def server_comparison(names=None, requests=500, concurrency=50, db_latency_ms=0, seed=42):
+    """{scenario: {"wsgi": summary, "asgi": summary}} for SERVER_SCENARIOS."""
+    delay = _QueryDelay(db_latency_ms / 1000) if db_latency_ms else None
+    if delay:
+        connection_created.connect(delay.install)
+    try:
+        results = {}
+        for name in names or SERVER_SCENARIOS:
+            sync_path, async_path = SERVER_SCENARIOS[name]
+            query_strings = _query_strings(name, requests, seed)
+            # Close this thread's connection so the delay wrapper is installed on reconnect
+            connection.close()
+            clear_all()
+            wsgi = run_wsgi(sync_path, query_strings, concurrency)
+            clear_all()
+            asgi = run_asgi(async_path, query_strings, concurrency)
+            results[name] = {"wsgi": wsgi, "asgi": asgi}
+        return {
+            "environment": environment(),
+            "requests": requests,
+            "concurrency": concurrency,
+            "db_latency_ms": db_latency_ms,
+            "results": results,
+        }
+    finally:
+        if delay:
+            connection_created.disconnect(delay.install)
+
+
+# --------- Startup --------- #
+
+STARTUP_PHASES = ["django_setup", "warmup", "first_request", "first_response"]
+STARTUP_PROBE = "from clinic.startup import probe; probe({entry!r}, {path!r})"
+
+
+def _startup_run(entry, path, lean):
+    env = {**os.environ, "CLINIC_LEAN_STARTUP": "1" if lean else "0"}
+    command = [sys.executable, "-X", "importtime", "-c", STARTUP_PROBE.format(entry=entry, path=path)]
+    started = time.perf_counter()
+    process = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if process.returncode:
+        errors = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"{entry} startup failed: {errors[-1] if errors else process.returncode}")
+    probe = json.loads(process.stdout.strip().splitlines()[-1])
+    return elapsed, probe, parse_importtime(process.stderr.splitlines())
+
+
+def _startup_summary(runs, top):
+    median = statistics.median
+    modules = {}
+    for _, _, imported in runs:
+        for name, self_us, cumulative_us in imported:
+            modules.setdefault(name, []).append((self_us, cumulative_us))
+    packages = {}
+    for name, times in modules.items():
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + median(t[0] for t in times) / 1000
+    slowest = sorted(modules.items(), key=lambda item: -median(t[0] for t in item[1]))[:top]
+    return {
+        "status": runs[0][1]["status"],
+        "process_ms": median(elapsed for elapsed, _, _ in runs) * 1000,
+        "import_ms": sum(packages.values()),
+        "phases_ms": {
+            phase: median(probe["phases"][phase] for _, probe, _ in runs) * 1000
+            for phase in STARTUP_PHASES
+        },
+        "first_response_ms": median(
+            probe["phases"]["first_response"] - probe["phases"]["warmup"] for _, probe, _ in runs
+        ) * 1000,
+        "packages": sorted(packages.items(), key=lambda item: -item[1])[:top],
+        "modules": [
+            (name, median(t[0] for t in times) / 1000, median(t[1] for t in times) / 1000)
+            for name, times in slowest
+        ],
+    }
+
+
+def startup_comparison(entry="wsgi", path="/", runs=5, modes=("normal", "lean"), top=15):
+    """{mode: summary} of `runs` cold starts of hospital_project.<entry>, each followed by one GET `path`."""
+    results = {}
+    for mode in modes:
+        results[mode] = _startup_summary([_startup_run(entry, path, mode == "lean") for _ in range(runs)], top)
+    return {"environment": environment(), "entry": entry, "path": path, "runs": runs, "results": results}
+
+
+# --------- Tenants --------- #
+
+TENANT_SCENARIOS = [
+    "patient_search_name",
+    "appointment_conflict_check",
+    "provider_calendar",
+    "provider_schedule_week",
+    "free_slots_specialty",
+    "patient_list_deep_page",
+    "appointment_list_deep_page",
+]
+
+
+def _add_bench_tenant(number, patients, providers, days, seed):
+    """Tenant "bench-NNN" with its own synthetic providers, patients and +-`days` of appointments."""
+    tenant, created = Tenant.objects.get_or_create(slug=f"bench-{number:03d}", defaults={"name": f"Bench {number}"})
+    if created:
+        rng = random.Random(seed + number)
+        today = date.today()
+        with use_tenant(tenant):
+            provider_ids = generate_providers(providers, rng)
+            generate_patients(patients, rng)
+            patient_ids = list(Patient.objects.values_list("id", flat=True))
+            generate_appointments(
+                provider_ids, patient_ids, today - timedelta(days=days), today + timedelta(days=days), 0.3, rng,
+            )
+    return tenant
+
+
+def tenant_scaling(steps=(1, 10, 50), patients=2000, providers=10, days=60, iterations=30, warmup=3, seed=42,
+                   stdout=None):
+    """
+    Grow the database to each of `steps` equally sized bench tenants and
+    time TENANT_SCENARIOS for the first one, always with the same seed. The
+    first tenant's data never changes, so flat timings across steps mean a
+    clinic doesn't slow down as other clinics' rows pile up around it.
+    Writes tenants "bench-001", ...: run it on a scratch database.
+    """
+    results = {}
+    for step in steps:
+        for number in range(1, step + 1):
+            _add_bench_tenant(number, patients, providers, days, seed)
+        # Bulk inserts skip signals; have the schedule index reload
+        clear_all()
+        bump_version(full_reload=True)
+        if stdout:
+            stdout.write(f"{step} tenants, {Appointment.all_tenants.count()} appointments")
+
+        with use_tenant(Tenant.objects.get(slug="bench-001")):
+            bench = Benchmark(seed=seed, days_back=days, days_ahead=days)
+            results[step] = {
+                "tenants": Tenant.objects.count(),
+                "appointments": Appointment.all_tenants.count(),
+                "patients": Patient.all_tenants.count(),
+                "scenarios": {name: bench.run(name, iterations, warmup) for name in TENANT_SCENARIOS},
+            }
+    return {"environment": environment(), "results": results}
@@ -0,0 +1,95 @@
+"""
+Appointment booking service.
+
+All writes that can create or move a scheduled appointment go through
+save_appointment(), which runs the provider/patient overlap check as one
+query inside the same transaction as the INSERT/UPDATE. The provider and
+patient rows are locked first (SELECT ... FOR UPDATE), always in that
+order, so two workers booking the same provider or patient serialize on
+the lock instead of both passing validation.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .models import Appointment, EditConflict, Patient, Provider
+from .routers import use_primary
+
+
+def lock_schedules(appointment):
+    """
+    Lock the provider row, then the patient row, for the rest of the current
+    transaction. Fixed ordering keeps concurrent bookings deadlock-free.
+    """
+    provider = Provider.objects.select_for_update().filter(pk=appointment.provider_id)
+    if not list(provider.values_list("pk", flat=True)):
+        raise ValidationError("Selected provider no longer exists.")
+    patient = Patient.objects.select_for_update().filter(pk=appointment.patient_id)
+    if not list(patient.values_list("pk", flat=True)):
+        raise ValidationError("Selected patient no longer exists.")
+
+
+def lock_schedule_rows(provider_ids, patient_ids):
+    """
+    Batch form of lock_schedules() for bulk booking: all providers, then all
+    patients, each in primary-key order. Returns the (provider_ids,
+    patient_ids) that actually exist.
+    """
+    providers = Provider.objects.select_for_update().filter(pk__in=provider_ids).order_by("pk")
+    patients = Patient.objects.select_for_update().filter(pk__in=patient_ids).order_by("pk")
+    return (
+        set(providers.values_list("pk", flat=True)),
+        set(patients.values_list("pk", flat=True)),
+    )
+
+
+def save_appointment(appointment, fields=None, expected_version=None):
+    """
+    Validate and save `appointment` atomically. Raises ValidationError on
+    bad times or a provider/patient conflict; nothing is written in that case.
+    With expected_version, only `fields` are written and only if the row is
+    still at that version (VersionedModel.save_changes); raises EditConflict
+    otherwise.
+    """
+    with use_primary(), transaction.atomic():
+        if appointment.status == "scheduled":
+            lock_schedules(appointment)
+        # FK existence is covered by the lock queries above; clean() runs
+        # the single-query overlap check (Appointment.find_conflicts).
+        appointment.full_clean(exclude=["patient", "provider"])
+        if expected_version is None:
+            appointment.save()
+        else:
+            appointment.save_changes(fields, expected_version)
+    return appointment
+
+
+def cancel_appointment(appointment_id, expected_version=None):
+    """
+    Cancel a scheduled appointment with a conditional UPDATE (at
+    expected_version, if given), then read the row back for the post_save
+    receivers. There is no read before the UPDATE, and canceling frees the
+    slot, so it needs no locks or conflict check. Raises EditConflict if the
+    appointment was changed, canceled or deleted meanwhile. Returns the
+    canceled row.
+    """
+    with use_primary(), transaction.atomic():
+        rows = Appointment.objects.filter(pk=appointment_id, status="scheduled")
+        if expected_version is not None:
+            rows = rows.filter(version=expected_version)
+        # updated_at by hand: update() skips auto_now, and row fragments are keyed on it
+        if not rows.update(status="canceled", version=F("version") + 1, updated_at=timezone.now()):
+            raise EditConflict(f"Appointment {appointment_id} is no longer scheduled at that version.")
+        # Read back (the UPDATE holds the row lock) for the receivers: daily
+        # summary, outbox event, schedule buckets and index, all moving from
+        # the scheduled state the UPDATE started from
+        appointment = Appointment.objects.get(pk=appointment_id)
+        appointment._loaded_summary = (*appointment._loaded_summary[:3], "scheduled")
+        post_save.send(
+            sender=Appointment, instance=appointment, created=False,
+            update_fields=frozenset({"status", "version", "updated_at"}), raw=False, using=rows.db,
+        )
+    return appointment
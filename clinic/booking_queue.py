@@ -0,0 +1,109 @@
+"""
+Bounded booking pipeline for async views.
+
+Async request handlers don't hold a thread while they wait, so a burst of
+booking requests under ASGI could otherwise open as many database
+connections as there are requests in flight. Bookings are instead put on
+an asyncio.Queue of CLINIC_BOOKING_QUEUE_SIZE entries and drained by
+CLINIC_BOOKING_WORKERS consumer tasks. Each consumer runs the form
+validation + save_appointment() in a dedicated thread pool of the same
+size, so booking never uses more than that many connections. When the
+queue stays full for CLINIC_BOOKING_QUEUE_TIMEOUT seconds, submit()
+raises BookingQueueFull and the caller should answer 503.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections
+
+from .booking import save_appointment
+from .forms import AppointmentForm
+from .tenants import get_current_tenant, use_tenant
+
+
+class BookingQueueFull(Exception):
+    pass
+
+
+def _book(data, tenant):
+    """Validate and save one booking for `tenant` in a worker thread -> (appointment, errors)."""
+    # Same connection housekeeping as request_started/request_finished
+    close_old_connections()
+    try:
+        with use_tenant(tenant):
+            return _validate_and_save(data)
+    finally:
+        close_old_connections()
+
+
+def _validate_and_save(data):
+    form = AppointmentForm(data)
+    if not form.is_valid():
+        return None, form.errors.get_json_data()
+    try:
+        return save_appointment(form.save(commit=False)), None
+    except ValidationError as e:
+        return None, {"__all__": [{"message": m, "code": ""} for m in e.messages]}
+
+
+class BookingQueue:
+    def __init__(self, workers=None, maxsize=None, timeout=None):
+        self.workers = workers or getattr(settings, "CLINIC_BOOKING_WORKERS", 4)
+        self.maxsize = maxsize or getattr(settings, "CLINIC_BOOKING_QUEUE_SIZE", 100)
+        self.timeout = timeout if timeout is not None else getattr(settings, "CLINIC_BOOKING_QUEUE_TIMEOUT", 2.0)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="clinic-booking")
+        self._lock = threading.Lock()
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+
+    def _ensure_started(self):
+        # asyncio queues belong to one event loop; an ASGI server keeps a
+        # single loop, but async_to_sync (WSGI, tests) may hand us a new one.
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                self._loop = loop
+                self._queue = asyncio.Queue(maxsize=self.maxsize)
+                self._tasks = [loop.create_task(self._consume()) for _ in range(self.workers)]
+        return self._queue
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        queue = self._queue
+        while True:
+            data, tenant, future = await queue.get()
+            try:
+                if not future.cancelled():
+                    result = await loop.run_in_executor(self._executor, _book, data, tenant)
+                    if not future.cancelled():
+                        future.set_result(result)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                queue.task_done()
+
+    def qsize(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, data):
+        """
+        Queue a booking (AppointmentForm data) and wait for it to be
+        processed. Returns (appointment, None) or (None, form-style errors).
+        """
+        queue = self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        # Consumer tasks outlive the request, so its tenant travels with the booking
+        try:
+            await asyncio.wait_for(queue.put((data, get_current_tenant(), future)), self.timeout)
+        except asyncio.TimeoutError:
+            raise BookingQueueFull(f"{self.maxsize} bookings already waiting")
+        return await future
+
+
+booking_queue = BookingQueue()
@@ -0,0 +1,308 @@
+"""
+Bulk appointment booking.
+
+Books a batch of rows (CSV/JSON import, a recurring series, a legacy
+migration) without going through AppointmentForm/full_clean per row:
+
+1. parse every row, resolving chart numbers in one query
+2. lock the affected provider and patient rows (same order as
+   booking.lock_schedules), which also tells us which ones exist, and load
+   every scheduled interval that touches them within the batch rows' time
+   windows (one query per WINDOWS_PER_QUERY windows)
+3. merge those intervals per provider/patient (sort + sweep) and check each
+   row against them in memory with bisect, in input order, so conflicts
+   inside the batch are caught the same way as conflicts with the database
+4. bulk_create the accepted rows and their outbox events (clinic/outbox.py)
+
+Each row gets a BookingResult describing whether it was accepted.
+"""
+
+import csv
+import json
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .booking import lock_schedule_rows
+from .caching import get_default_tenant
+from .interval_index import appointments_bulk_created
+from .outbox import record_many as record_events
+from .routers import use_primary
+from .schedule import invalidate_buckets
+from .utilization import record_appointments
+from .models import Appointment, OutboxEvent, Patient
+from .tenants import get_current_tenant, use_tenant
+
+STATUSES = {value for value, _ in Appointment.STATUS_CHOICES}
+
+
+@dataclass
+class BookingResult:
+    row: int
+    accepted: bool
+    message: str = ""
+    appointment: Appointment = None
+
+
+class IntervalSet:
+    """Disjoint, sorted busy intervals for one provider or patient."""
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        # Sweep: merge overlapping existing rows (legacy data may overlap)
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def overlaps(self, start, end):
+        # Only the last interval starting before `end` can overlap, because
+        # the set is disjoint and sorted.
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.ends[i - 1] > start
+
+    def add(self, start, end):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+
+
+# --------- Input parsing --------- #
+
+def _aware(value):
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def read_rows(fileobj, fmt):
+    """Yield dict rows from a CSV, JSON array or NDJSON file object."""
+    if fmt == "csv":
+        yield from csv.DictReader(fileobj)
+    elif fmt == "json":
+        yield from json.load(fileobj)
+    else:
+        for line in fileobj:
+            if line.strip():
+                yield json.loads(line)
+
+
+def expand_series(patient_id, provider_id, start_time, duration, every=timedelta(weeks=1), count=52, reason=""):
+    """Rows for a recurring series, e.g. weekly for 52 weeks."""
+    for i in range(count):
+        start = start_time + every * i
+        yield {
+            "patient_id": patient_id,
+            "provider_id": provider_id,
+            "start_time": start,
+            "end_time": start + duration,
+            "reason": reason,
+        }
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _parse(raw, patients_by_chart):
+    """Returns (Appointment, None) or (None, error message)."""
+    start = raw.get("start_time")
+    end = raw.get("end_time")
+    start = _aware(parse_datetime(start) if isinstance(start, str) else start)
+    end = _aware(parse_datetime(end) if isinstance(end, str) else end)
+    if start is None or end is None:
+        return None, "Invalid or missing start_time/end_time."
+    if start >= end:
+        return None, "Start time must be before end time."
+
+    patient_id = raw.get("patient_id") or patients_by_chart.get(raw.get("patient_chart_number"))
+    provider_id = raw.get("provider_id")
+    try:
+        patient_id = int(patient_id)
+        provider_id = int(provider_id)
+    except (TypeError, ValueError):
+        return None, "Unknown patient or provider."
+
+    status = raw.get("status") or "scheduled"
+    if status not in STATUSES:
+        return None, f"Invalid status {status!r}."
+
+    return Appointment(
+        patient_id=patient_id,
+        provider_id=provider_id,
+        start_time=start,
+        end_time=end,
+        reason=(raw.get("reason") or "")[:255],
+        status=status,
+    ), None
+
+
+# --------- Booking --------- #
+
+# Gap between two batch rows that still gets one busy-interval window
+WINDOW_MERGE_GAP = timedelta(days=1)
+# Windows OR'ed into one busy-interval query
+WINDOWS_PER_QUERY = 100
+
+
+def _busy_windows(appointments):
+    """
+    The batch rows' intervals merged where they are less than a day apart.
+    A series or legacy migration can span years; loading every row of its
+    providers between the first and last start would read all of them.
+    """
+    windows = []
+    for start, end in sorted((a.start_time, a.end_time) for a in appointments):
+        if windows and start - windows[-1][1] < WINDOW_MERGE_GAP:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            windows.append([start, end])
+    return windows
+
+
+def _load_busy(provider_ids, patient_ids, windows):
+    """Every scheduled interval touching the batch's providers/patients within `windows`."""
+    by_provider = {pk: [] for pk in provider_ids}
+    by_patient = {pk: [] for pk in patient_ids}
+    for group in chunked(windows, WINDOWS_PER_QUERY):
+        overlapping = Q()
+        for start, end in group:
+            overlapping |= Q(start_time__lt=end, end_time__gt=start)
+        rows = Appointment.objects.filter(
+            Q(provider_id__in=provider_ids) | Q(patient_id__in=patient_ids),
+            overlapping,
+            status="scheduled",
+        ).values_list("id", "provider_id", "patient_id", "start_time", "end_time")
+
+        seen = set()
+        for pk, provider_id, patient_id, start, end in rows:
+            # A long row can overlap two windows of one query
+            if pk in seen:
+                continue
+            seen.add(pk)
+            if provider_id in by_provider:
+                by_provider[provider_id].append((start, end))
+            if patient_id in by_patient:
+                by_patient[patient_id].append((start, end))
+    return (
+        {pk: IntervalSet(v) for pk, v in by_provider.items()},
+        {pk: IntervalSet(v) for pk, v in by_patient.items()},
+    )
+
+
+# Columns bulk_create writes; rows equal on all of them are interchangeable
+_READ_BACK_FIELDS = ["provider_id", "patient_id", "start_time", "end_time", "reason", "status", "created_at"]
+
+
+def _read_back_ids(appointments):
+    """
+    Set the ids of bulk-created appointments where the backend didn't
+    return them (MySQL). This transaction inserted them with their
+    provider rows locked, so matching every inserted column picks each one
+    out; canceled rows aren't conflict-checked and may share a provider and
+    start time, but rows that match on everything are identical and can
+    take either id.
+    """
+    found = {}
+    rows = Appointment.objects.filter(
+        provider_id__in={a.provider_id for a in appointments},
+        created_at__gte=min(a.created_at for a in appointments),
+        created_at__lte=max(a.created_at for a in appointments),
+    ).order_by("id").values_list("id", *_READ_BACK_FIELDS)
+    for pk, *key in rows:
+        found.setdefault(tuple(key), []).append(pk)
+    for a in appointments:
+        a.pk = found[tuple(getattr(a, field) for field in _READ_BACK_FIELDS)].pop(0)
+
+
+def bulk_book(rows, start_index=0, dry_run=False, batch_size=1000):
+    """
+    Book one batch of raw rows. Returns a BookingResult per row, in order.
+    Row numbers start at `start_index` so callers can chunk a large file.
+    Rows are booked for the current tenant (default: CLINIC_DEFAULT_TENANT),
+    whose chart numbers, providers and patients they refer to.
+    """
+    with use_tenant(get_current_tenant() or get_default_tenant()):
+        return _bulk_book(rows, start_index, dry_run, batch_size)
+
+
+def _bulk_book(rows, start_index, dry_run, batch_size):
+    rows = list(rows)
+    results = [None] * len(rows)
+
+    charts = {r.get("patient_chart_number") for r in rows if r.get("patient_chart_number")}
+    patients_by_chart = dict(
+        Patient.objects.filter(chart_number__in=charts).values_list("chart_number", "id")
+    ) if charts else {}
+
+    parsed = []
+    for i, raw in enumerate(rows):
+        appointment, error = _parse(raw, patients_by_chart)
+        if error:
+            results[i] = BookingResult(start_index + i, False, error)
+        else:
+            parsed.append((i, appointment))
+
+    with use_primary(), transaction.atomic():
+        known_providers, known_patients = lock_schedule_rows(
+            {a.provider_id for _, a in parsed},
+            {a.patient_id for _, a in parsed},
+        )
+        scheduled = [a for _, a in parsed if a.status == "scheduled"]
+        if scheduled:
+            provider_busy, patient_busy = _load_busy(known_providers, known_patients, _busy_windows(scheduled))
+
+        accepted = []
+        for i, appointment in parsed:
+            if appointment.provider_id not in known_providers:
+                results[i] = BookingResult(start_index + i, False, "Unknown provider.")
+                continue
+            if appointment.patient_id not in known_patients:
+                results[i] = BookingResult(start_index + i, False, "Unknown patient.")
+                continue
+
+            if appointment.status == "scheduled":
+                start, end = appointment.start_time, appointment.end_time
+                providers = provider_busy[appointment.provider_id]
+                patients = patient_busy[appointment.patient_id]
+                if providers.overlaps(start, end):
+                    results[i] = BookingResult(
+                        start_index + i, False, "Conflict: provider already has an appointment at this time.")
+                    continue
+                if patients.overlaps(start, end):
+                    results[i] = BookingResult(
+                        start_index + i, False, "Conflict: patient already has an appointment at this time.")
+                    continue
+                providers.add(start, end)
+                patients.add(start, end)
+
+            results[i] = BookingResult(start_index + i, True, appointment=appointment)
+            accepted.append(appointment)
+
+        if accepted and not dry_run:
+            Appointment.objects.bulk_create(accepted, batch_size=batch_size)
+            if not connection.features.can_return_rows_from_bulk_insert:
+                _read_back_ids(accepted)
+            # bulk_create skips post_save, so update summaries, the outbox, the schedule index
+            # and cached day buckets here
+            record_appointments(accepted)
+            record_events(accepted, OutboxEvent.CREATED, batch_size=batch_size)
+            appointments_bulk_created()
+            transaction.on_commit(lambda: invalidate_buckets(
+                (a.provider_id, a.start_time) for a in accepted if a.status == "scheduled"
+            ))
+
+    return results
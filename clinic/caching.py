@@ -0,0 +1,189 @@
+"""
+Shared caching for hot read paths.
+
+Entries live in the "clinic" cache alias (see CLINIC_CACHE_BACKEND in
+settings: local memory, file-based, or a database cache table, so no
+external service is needed). Keys are namespaced and versioned:
+
+    clinic:<namespace>:v<version>:<parts...>
+
+Bumping a namespace's version (stored in the cache itself) orphans every
+entry in it at once; single entries can also be deleted directly. Model
+signals in clinic/signals.py do the invalidation. Hit/miss counts are kept
+per namespace and exported alongside the request metrics.
+"""
+
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Q
+from django.http.request import split_domain_port
+
+from .models import Patient, Provider, Tenant
+from .routers import use_primary
+from .tenants import default_tenant_id, get_current_tenant
+
+CACHE_ALIAS = "clinic"
+# Rendered rows (clinic/fragments.py)
+FRAGMENTS_ALIAS = "fragments"
+
+_stats_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def _backend(alias=CACHE_ALIAS):
+    return caches[alias] if alias in settings.CACHES else caches["default"]
+
+
+def _count(namespace, hits, misses):
+    with _stats_lock:
+        _hits[namespace] += hits
+        _misses[namespace] += misses
+
+
+def cache_stats():
+    """{namespace: (hits, misses)} for this process."""
+    with _stats_lock:
+        return {ns: (_hits[ns], _misses[ns]) for ns in sorted(set(_hits) | set(_misses))}
+
+
+def clear_all():
+    """Drop everything in the clinic caches (e.g. after bulk loads that skip signals)."""
+    _backend().clear()
+    _backend(FRAGMENTS_ALIAS).clear()
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _hits.clear()
+        _misses.clear()
+
+
+class VersionedCache:
+    def __init__(self, namespace, timeout_setting="CLINIC_CACHE_TIMEOUT", alias=CACHE_ALIAS):
+        self.namespace = namespace
+        self.timeout_setting = timeout_setting
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return _backend(self.alias)
+
+    @property
+    def _timeout(self):
+        return getattr(settings, self.timeout_setting, 300)
+
+    def _version_key(self):
+        return f"clinic:{self.namespace}:version"
+
+    def version(self):
+        backend = self.backend
+        version = backend.get(self._version_key())
+        if version is None:
+            # Never expires; losing it just starts a fresh version
+            backend.add(self._version_key(), 1, None)
+            version = backend.get(self._version_key(), 1)
+        return version
+
+    def _key(self, version, parts):
+        return f"clinic:{self.namespace}:v{version}:" + ":".join(str(p) for p in parts)
+
+    def get(self, *parts):
+        value = self.backend.get(self._key(self.version(), parts))
+        _count(self.namespace, value is not None, value is None)
+        return value
+
+    def set(self, parts, value):
+        self.backend.set(self._key(self.version(), parts), value, self._timeout)
+
+    def get_or_set(self, parts, compute):
+        value = self.get(*parts)
+        if value is None:
+            # Fill from the primary so replica lag can't be cached for a whole timeout
+            with use_primary():
+                value = compute()
+            self.set(parts, value)
+        return value
+
+    def get_many(self, parts_list):
+        """{parts: value} for the entries that are cached; parts are tuples."""
+        version = self.version()
+        keys = {self._key(version, parts): parts for parts in parts_list}
+        found = self.backend.get_many(keys.keys())
+        _count(self.namespace, len(found), len(keys) - len(found))
+        return {keys[key]: value for key, value in found.items()}
+
+    def set_many(self, mapping):
+        version = self.version()
+        self.backend.set_many({self._key(version, parts): value for parts, value in mapping.items()}, self._timeout)
+
+    def delete_many(self, parts_list):
+        version = self.version()
+        keys = [self._key(version, parts) for parts in parts_list]
+        if keys:
+            self.backend.delete_many(keys)
+
+    def delete(self, *parts):
+        self.delete_many([parts])
+
+    def invalidate(self):
+        """Orphan every entry in the namespace by bumping its version."""
+        backend = self.backend
+        try:
+            backend.incr(self._version_key())
+        except ValueError:
+            backend.add(self._version_key(), 2, None)
+
+
+providers_cache = VersionedCache("providers")
+patients_cache = VersionedCache("patient")
+schedule_cache = VersionedCache("schedule", timeout_setting="CLINIC_SCHEDULE_CACHE_TIMEOUT")
+tenants_cache = VersionedCache("tenants")
+
+
+# --------- Cached reads --------- #
+
+def get_providers():
+    """The current tenant's providers (name order) as model instances, cached until any provider changes."""
+    tenant = get_current_tenant()
+    return providers_cache.get_or_set(
+        ("all", tenant.pk if tenant else "*"), lambda: list(Provider.objects.order_by("name", "id")),
+    )
+
+
+def get_patient(patient_id):
+    """A Patient of the current tenant by pk from cache, or None if it doesn't exist."""
+    def load():
+        return Patient.all_tenants.filter(pk=patient_id).first()
+
+    patient = patients_cache.get_or_set((patient_id,), load)
+    tenant = get_current_tenant()
+    if patient is None or (tenant is not None and patient.tenant_id != tenant.pk):
+        return None
+    return patient
+
+
+def get_tenant_for_host(host):
+    """
+    The Tenant serving `host` (port ignored): the one with that domain,
+    else the one whose slug is the host's first label. None if neither.
+    """
+    host = split_domain_port(host)[0]
+
+    def load():
+        label = host.split(".", 1)[0]
+        candidates = list(Tenant.objects.filter(Q(domain=host) | Q(slug=label)))
+        candidates.sort(key=lambda tenant: tenant.domain != host)
+        # False, not None: "no tenant" is cached too
+        return candidates[0] if candidates else False
+
+    return tenants_cache.get_or_set(("host", host), load) or None
+
+
+def get_default_tenant():
+    """The CLINIC_DEFAULT_TENANT Tenant, created if missing."""
+    pk = default_tenant_id()
+    return tenants_cache.get_or_set(("default", pk), lambda: Tenant.objects.get(pk=pk))
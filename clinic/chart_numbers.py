@@ -0,0 +1,93 @@
+"""
+Sequential chart numbers.
+
+Chart numbers are "<prefix>-<9 digits>" (C-000000001, C-000000002, ...),
+taken from the ChartNumberSequence row for the prefix. They sort and
+index like the integers they are, and can't collide, unlike random
+uuid slices.
+
+reserve(count) moves the sequence forward by `count` in one short
+transaction on the primary, with the row locked (SELECT ... FOR UPDATE).
+It commits separately from the caller's insert, so the row isn't held
+locked for a whole import chunk. Numbers reserved by a transaction that
+later rolls back are simply skipped.
+
+Single creates (patient_create) take numbers from a per-process block of
+CLINIC_CHART_NUMBER_BLOCK, so the sequence row is touched once per
+block instead of once per patient. Numbers are therefore unique and
+increasing per process, but not gap-free or strictly ordered across
+processes.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import ChartNumberSequence, Patient
+from .routers import use_primary
+
+DIGITS = 9
+
+
+def prefix():
+    return getattr(settings, "CLINIC_CHART_NUMBER_PREFIX", "C")
+
+
+def format_chart_number(value, chart_prefix=None):
+    return f"{chart_prefix or prefix()}-{value:0{DIGITS}d}"
+
+
+def _first_free(chart_prefix):
+    """1 + the highest chart number already using the prefix (for a new sequence row)."""
+    # Every tenant's: the sequence is shared
+    highest = Patient.all_tenants.filter(chart_number__startswith=f"{chart_prefix}-").aggregate(
+        highest=Max("chart_number")
+    )["highest"]
+    try:
+        return int(highest.split("-", 1)[1]) + 1 if highest else 1
+    except ValueError:
+        return 1
+
+
+def reserve(count, chart_prefix=None):
+    """Reserve `count` consecutive numbers; returns the first one (an int)."""
+    chart_prefix = chart_prefix or prefix()
+    with use_primary(), transaction.atomic():
+        sequence = ChartNumberSequence.objects.select_for_update().filter(prefix=chart_prefix).first()
+        if sequence is None:
+            ChartNumberSequence.objects.get_or_create(prefix=chart_prefix, defaults={"next_value": _first_free(chart_prefix)})
+            sequence = ChartNumberSequence.objects.select_for_update().get(prefix=chart_prefix)
+        first = sequence.next_value
+        sequence.next_value = first + count
+        sequence.save(update_fields=["next_value"])
+    return first
+
+
+class BlockAllocator:
+    """Hands out single chart numbers from blocks reserved ahead of time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+        self._prefix = None
+
+    def next(self):
+        with self._lock:
+            chart_prefix = prefix()
+            if self._next >= self._end or chart_prefix != self._prefix:
+                size = getattr(settings, "CLINIC_CHART_NUMBER_BLOCK", 50)
+                self._next = reserve(size, chart_prefix)
+                self._end = self._next + size
+                self._prefix = chart_prefix
+            value = self._next
+            self._next += 1
+        return format_chart_number(value, chart_prefix)
+
+
+allocator = BlockAllocator()
+
+
+def next_chart_number():
+    return allocator.next()
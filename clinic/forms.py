@@ -1,9 +1,34 @@
 from django import forms
-from .models import Patient, Appointment
+from .models import Patient, Provider, Appointment
 from django.utils import timezone
 
+from .interval_index import enabled as schedule_index_enabled, schedule_index
+from .widgets import AutocompleteSelect
 
-class PatientForm(forms.ModelForm):
+
+class VersionedForm(forms.ModelForm):
+    """
+    Edit form for a VersionedModel: carries the version the page was
+    rendered from, so saving can detect edits made in the meantime.
+    """
+
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False, min_value=1)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial.setdefault("version", self.instance.version)
+
+    def changed_fields(self):
+        """Model fields the submission changes."""
+        return [name for name in self.changed_data if name in self._meta.fields]
+
+    def expected_version(self):
+        """The version the user edited (the loaded one if the page didn't post it)."""
+        return self.cleaned_data.get("version") or self.instance.version
+
+
+class PatientForm(VersionedForm):
     class Meta:
         model = Patient
         fields = ["first_name", "last_name", "date_of_birth", "phone", "email"]
@@ -17,15 +42,53 @@ class PatientSearchForm(forms.Form):
     phone = forms.CharField(required=False, label="Phone")
 
 
-class AppointmentForm(forms.ModelForm):
+class AppointmentForm(VersionedForm):
     class Meta:
         model = Appointment
         fields = ["patient", "provider", "start_time", "end_time", "reason", "status"]
         widgets = {
+            # Only the selected patient/provider is rendered; see clinic/widgets.py
+            "patient": AutocompleteSelect("patient_autocomplete", Patient),
+            "provider": AutocompleteSelect("provider_autocomplete", Provider),
             "start_time": forms.DateTimeInput(attrs={"type": "datetime-local"}),
             "end_time": forms.DateTimeInput(attrs={"type": "datetime-local"}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The field querysets were built at import time, outside any tenant;
+        # rebuild them so only the current clinic's rows validate
+        self.fields["patient"].queryset = Patient.objects.all()
+        self.fields["provider"].queryset = Provider.objects.all()
+
+    def _post_clean(self):
+        # Overlaps are checked under row locks by booking.save_appointment();
+        # form validation only runs the query when the schedule index can't answer.
+        self.instance._skip_conflict_check = True
+        try:
+            super()._post_clean()
+        finally:
+            self.instance._skip_conflict_check = False
+        if not self.errors:
+            self._precheck_conflicts()
+
+    def _precheck_conflicts(self):
+        """Early conflict feedback, from the in-memory schedule index when it can answer."""
+        appointment = self.instance
+        if appointment.status != "scheduled" or not schedule_index_enabled():
+            return
+        conflicts = schedule_index.conflicts(
+            appointment.provider_id, appointment.patient_id,
+            appointment.start_time, appointment.end_time, exclude=appointment.pk,
+        )
+        if conflicts is None:
+            # Index still loading (or the interval is before its window)
+            conflicts = appointment.find_conflicts()
+        if conflicts and conflicts[0]:
+            self.add_error(None, Appointment.PROVIDER_CONFLICT)
+        elif conflicts and conflicts[1]:
+            self.add_error(None, Appointment.PATIENT_CONFLICT)
+
     def clean(self):
         cleaned_data = super().clean()
 
@@ -35,3 +98,56 @@ class AppointmentForm(forms.ModelForm):
 
         # You can do timezone adjustments here if required
         return cleaned_data
+
+
+class AvailabilitySearchForm(forms.Form):
+    provider = forms.ModelChoiceField(queryset=Provider.objects.all(), required=False)
+    specialty = forms.CharField(required=False)
+    duration = forms.IntegerField(min_value=5, max_value=480, initial=30, label="Duration (minutes)")
+    start_date = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    days = forms.IntegerField(min_value=1, max_value=90, initial=14)
+    limit = forms.IntegerField(min_value=1, max_value=100, initial=10, label="Number of slots")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Scope to the current tenant (see AppointmentForm)
+        self.fields["provider"].queryset = Provider.objects.all()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("provider") and not cleaned_data.get("specialty"):
+            raise forms.ValidationError("Choose a provider or enter a specialty.")
+        return cleaned_data
+
+
+class UtilizationReportForm(forms.Form):
+    GROUP_CHOICES = [
+        ("total", "Whole range"),
+        ("month", "Month"),
+        ("week", "Week"),
+        ("day", "Day"),
+    ]
+
+    start_date = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={"type": "date"}))
+    group = forms.ChoiceField(choices=GROUP_CHOICES, initial="total", label="Group by")
+    provider = forms.ModelChoiceField(
+        queryset=Provider.objects.all(),
+        required=False,
+        widget=AutocompleteSelect("provider_autocomplete", Provider),
+    )
+    specialty = forms.CharField(required=False)
+
+    MAX_DAYS = 366 * 2
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Scope to the current tenant (see AppointmentForm)
+        self.fields["provider"].queryset = Provider.objects.all()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start_date"), cleaned_data.get("end_date")
+        if start and end and not 0 <= (end - start).days < self.MAX_DAYS:
+            raise forms.ValidationError(f"The range must be 1-{self.MAX_DAYS} days.")
+        return cleaned_data
@@ -0,0 +1,103 @@
+"""
+Cached row fragments for the long list pages.
+
+Rendering a list row costs {% url %} reversals, date formatting and
+attribute lookups for every row on every request, which on a long page
+takes longer than the query. A row's HTML only depends on the row (for an
+appointment, also on its patient's and provider's names), and every save()
+moves updated_at (auto_now). So each row is rendered once and cached in
+the "fragments" namespace of clinic.caching under its pk and updated_at
+stamps: a changed row gets a new key and its old entry just expires, no
+invalidation signal needed. Writes that bypass save() (queryset.update())
+on these models must set updated_at themselves. Fragments live in their
+own "fragments" cache alias (settings.CACHES): a page reads and writes up
+to CLINIC_LIST_MAX_PAGE_SIZE entries at once, more than the file-based
+"clinic" cache handles well.
+
+Keys also carry the active time zone, because dates are rendered in it,
+and a digest of the row template, so changing the template never serves
+old HTML.
+
+render_rows() renders a page's rows with one get_many, the template only
+for the misses, and one set_many; render_cells() does the same for the
+day cells of the schedule calendar. stream_page() sends a long page as a
+StreamingHttpResponse: the page head first, then the rows chunk by chunk,
+then the foot.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .caching import FRAGMENTS_ALIAS, VersionedCache
+
+ROWS_MARKER = "<!-- clinic:rows -->"
+
+fragments_cache = VersionedCache(
+    "fragments", timeout_setting="CLINIC_FRAGMENT_CACHE_TIMEOUT", alias=FRAGMENTS_ALIAS,
+)
+
+
+def _stamp(value):
+    return int(value.timestamp() * 1_000_000)
+
+
+def _digest(text):
+    return hashlib.md5(text.encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def _render_cached(template_name, items, name, key):
+    """HTML for each item: `template_name` rendered with {name: item}, only for items whose key(item) isn't cached."""
+    template = get_template(template_name)
+    prefix = (template_name, _digest(template.template.source), timezone.get_current_timezone_name())
+    keys = [(*prefix, *key(item)) for item in items]
+    cached = fragments_cache.get_many(keys)
+    missing = {}
+    html = []
+    for cache_key, item in zip(keys, items):
+        fragment = cached.get(cache_key)
+        if fragment is None:
+            fragment = missing[cache_key] = template.render({name: item})
+        html.append(mark_safe(fragment))
+    if missing:
+        fragments_cache.set_many(missing)
+    return html
+
+
+def render_rows(template_name, rows, stamps):
+    """
+    HTML for each row (model instances) as {"row": row}. stamps(row)
+    returns the updated_at values the row's HTML depends on.
+    """
+    return _render_cached(template_name, rows, "row", lambda row: (row.pk, *map(_stamp, stamps(row))))
+
+
+def render_cells(template_name, buckets):
+    """
+    HTML for each schedule bucket (clinic/schedule.py) as {"bucket": bucket}.
+    Bucket entries carry no updated_at, so the key is a digest of the
+    bucket's contents; the bucket cache itself is dropped on every change.
+    """
+    return _render_cached(template_name, buckets, "bucket", lambda bucket: (_digest(repr(bucket)),))
+
+
+def stream_page(request, template_name, context, rows, render):
+    """
+    Stream `template_name` rendered with `context`; its {% for row in rows %}
+    loop gets render(chunk) for CLINIC_STREAM_CHUNK_ROWS rows at a time.
+    """
+    chunk_size = getattr(settings, "CLINIC_STREAM_CHUNK_ROWS", 200)
+    page = render_to_string(template_name, {**context, "rows": [mark_safe(ROWS_MARKER)]}, request)
+    head, foot = page.split(ROWS_MARKER, 1)
+
+    def content():
+        yield head
+        for start in range(0, len(rows), chunk_size):
+            yield "".join(render(rows[start:start + chunk_size]))
+        yield foot
+
+    return StreamingHttpResponse(content(), content_type="text/html; charset=utf-8")
@@ -0,0 +1,433 @@
+"""
+Per-process in-memory index of upcoming scheduled appointments.
+
+For every provider and every patient the index keeps three parallel
+array("q") columns sorted by start: start epoch, end epoch and appointment
+id. Only scheduled appointments ending after the start of yesterday are
+held, which is a small fraction of the table. Overlap and busy-interval
+queries are a bisect plus a short scan, with no database round trip.
+
+Keeping it current:
+- warm() loads everything in one query. It runs when a lean-startup
+  (CLINIC_LEAN_STARTUP) WSGI/ASGI worker starts and otherwise on first
+  use.
+- Appointment signals apply this process's own changes after commit and
+  bump ScheduleVersion.version in the database; bulk booking bumps it
+  once per batch. Deletes and generate_synthetic_data bump .generation
+  instead. Bumps from signals are coalesced to one UPDATE of the shared
+  row per CLINIC_SCHEDULE_INDEX_BUMP_SECONDS per process.
+- Before answering, the index compares its version with the database at
+  most every CLINIC_SCHEDULE_INDEX_CHECK_SECONDS. A new version replays
+  rows by updated_at. A new generation, or an index older than
+  CLINIC_SCHEDULE_INDEX_MAX_AGE, triggers a full reload.
+- Full reloads run in a background thread, never inside a request.
+  Until a cold index (or one with an old generation) is loaded, queries
+  return None and callers use the database; an expired index keeps
+  answering from its replayed data meanwhile.
+
+The index is advisory. It is used for the form pre-check and free-slot
+search. save_appointment() still runs the locked database check at
+commit time.
+"""
+
+import threading
+import time as clock
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Appointment, ScheduleVersion
+from .routers import use_primary
+
+VERSION_NAME = "appointments"
+
+
+def to_epoch(value):
+    return int(value.timestamp())
+
+
+def from_epoch(value):
+    return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+
+class IntervalList:
+    """Sorted intervals for one provider or patient."""
+
+    __slots__ = ("starts", "ends", "ids", "longest")
+
+    def __init__(self):
+        self.starts = array("q")
+        self.ends = array("q")
+        self.ids = array("q")
+        # Longest interval seen; bounds how far back an overlapping start can be
+        self.longest = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, appointment_id, start, end):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, appointment_id)
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, appointment_id, start):
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ids[i] == appointment_id:
+                del self.starts[i], self.ends[i], self.ids[i]
+                return
+            i += 1
+
+    def overlapping(self, start, end, exclude=None):
+        """Ids of intervals with s < end and e > start."""
+        lo = bisect_right(self.starts, start - self.longest)
+        hi = bisect_left(self.starts, end)
+        return [
+            self.ids[i] for i in range(lo, hi)
+            if self.ends[i] > start and self.ids[i] != exclude
+        ]
+
+    def between(self, start, end):
+        lo = bisect_right(self.starts, start - self.longest)
+        hi = bisect_left(self.starts, end)
+        return [(self.starts[i], self.ends[i]) for i in range(lo, hi) if self.ends[i] > start]
+
+
+class ScheduleIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Serializes loads/refreshes so concurrent requests don't all reload at once
+        self._sync_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.providers = {}
+        self.patients = {}
+        self.rows = {}  # appointment id -> (provider_id, patient_id, start, end)
+        self.window_start = None
+        self.version = None
+        self.generation = None
+        # Set when the generation moved on: the rows may include deleted appointments
+        self.outdated = False
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.synced_until = None
+
+    @property
+    def loaded(self):
+        return self.window_start is not None
+
+    # --------- Loading --------- #
+
+    def _window(self):
+        today = timezone.localdate()
+        start = timezone.make_aware(datetime.combine(today - timedelta(days=1), time.min))
+        return to_epoch(start)
+
+    def warm(self):
+        """Full (re)load from the primary."""
+        with use_primary():
+            version, generation = current_version()
+            synced_until = timezone.now()
+            window_start = self._window()
+            rows = Appointment.all_tenants.filter(
+                status="scheduled", end_time__gt=from_epoch(window_start)
+            ).values_list("id", "provider_id", "patient_id", "start_time", "end_time")
+            providers, patients, by_id = {}, {}, {}
+            for pk, provider_id, patient_id, start, end in rows.order_by("start_time").iterator(chunk_size=5000):
+                start, end = to_epoch(start), to_epoch(end)
+                by_id[pk] = (provider_id, patient_id, start, end)
+                for lists, key in ((providers, provider_id), (patients, patient_id)):
+                    intervals = lists.get(key)
+                    if intervals is None:
+                        intervals = lists[key] = IntervalList()
+                    # Rows arrive in start order, so appending keeps the arrays sorted
+                    intervals.starts.append(start)
+                    intervals.ends.append(end)
+                    intervals.ids.append(pk)
+                    intervals.longest = max(intervals.longest, end - start)
+        with self._lock:
+            self.providers, self.patients, self.rows = providers, patients, by_id
+            self.window_start = window_start
+            self.version, self.generation = version, generation
+            self.outdated = False
+            self.loaded_at = self.checked_at = clock.monotonic()
+            self.synced_until = synced_until
+
+    def _refresh(self, version):
+        """Replay appointments changed since the last sync (by updated_at)."""
+        skew = timedelta(seconds=getattr(settings, "CLINIC_SCHEDULE_INDEX_SKEW_SECONDS", 30))
+        with use_primary():
+            synced_until = timezone.now()
+            rows = Appointment.all_tenants.filter(updated_at__gte=self.synced_until - skew).values_list(
+                "id", "provider_id", "patient_id", "start_time", "end_time", "status"
+            )
+            changed = list(rows)
+        with self._lock:
+            for pk, provider_id, patient_id, start, end, status in changed:
+                self._apply(pk, provider_id, patient_id, start, end, status == "scheduled")
+            self.version = version
+            self.synced_until = synced_until
+
+    def _stale(self, now):
+        max_age = getattr(settings, "CLINIC_SCHEDULE_INDEX_MAX_AGE", 600)
+        return not self.loaded or now - self.loaded_at > max_age
+
+    def load(self):
+        """warm() under the sync lock, so requests arriving meanwhile don't start another load."""
+        with self._sync_lock:
+            self.warm()
+
+    def _load_in_background(self):
+        """warm() in a thread that releases the (already held) sync lock when it's done."""
+        def run():
+            try:
+                self.warm()
+            except Exception:
+                # Left as it was; the next sync() after CHECK_SECONDS tries again
+                pass
+            finally:
+                self._sync_lock.release()
+                connections.close_all()
+
+        threading.Thread(target=run, name="schedule-index-load", daemon=True).start()
+
+    def sync(self):
+        """
+        Make sure the index is loaded and not older than the DB version
+        (throttled). Never waits: while another thread loads or checks,
+        the index answers from what it has.
+        """
+        interval = getattr(settings, "CLINIC_SCHEDULE_INDEX_CHECK_SECONDS", 1.0)
+        if clock.monotonic() - self.checked_at < interval or not self._sync_lock.acquire(blocking=False):
+            return
+        handed_off = False
+        try:
+            now = clock.monotonic()
+            if now - self.checked_at < interval:
+                return
+            self.checked_at = now
+            if self._stale(now):
+                self._load_in_background()
+                handed_off = True
+                return
+            with use_primary():
+                version, generation = current_version()
+            if generation != self.generation:
+                self.outdated = True
+                self._load_in_background()
+                handed_off = True
+            elif version != self.version:
+                self._refresh(version)
+        finally:
+            if not handed_off:
+                self._sync_lock.release()
+
+    # --------- Updates --------- #
+
+    def _apply(self, pk, provider_id, patient_id, start, end, scheduled):
+        old = self.rows.pop(pk, None)
+        if old is not None:
+            old_provider, old_patient, old_start, _ = old
+            for lists, key in ((self.providers, old_provider), (self.patients, old_patient)):
+                if key in lists:
+                    lists[key].remove(pk, old_start)
+        if not scheduled or start is None or end is None:
+            return
+        start, end = to_epoch(start), to_epoch(end)
+        if end <= self.window_start:
+            return
+        self.rows[pk] = (provider_id, patient_id, start, end)
+        for lists, key in ((self.providers, provider_id), (self.patients, patient_id)):
+            intervals = lists.get(key)
+            if intervals is None:
+                intervals = lists[key] = IntervalList()
+            intervals.add(pk, start, end)
+
+    def apply(self, appointment):
+        """Record a committed save of `appointment` made by this process."""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._apply(
+                appointment.pk, appointment.provider_id, appointment.patient_id,
+                appointment.start_time, appointment.end_time, appointment.status == "scheduled",
+            )
+
+    def discard(self, appointment_id):
+        if not self.loaded:
+            return
+        with self._lock:
+            self._apply(appointment_id, None, None, None, None, False)
+
+    # --------- Queries --------- #
+
+    def covers(self, start):
+        return self.loaded and not self.outdated and to_epoch(start) >= self.window_start
+
+    def conflicts(self, provider_id, patient_id, start, end, exclude=None):
+        """
+        (provider_conflict, patient_conflict) from memory, or None when the
+        index isn't loaded yet or the interval starts before its window.
+        """
+        self.sync()
+        if not self.covers(start):
+            return None
+        start, end = to_epoch(start), to_epoch(end)
+        with self._lock:
+            provider = self.providers.get(provider_id)
+            patient = self.patients.get(patient_id)
+            return (
+                bool(provider and provider.overlapping(start, end, exclude)),
+                bool(patient and patient.overlapping(start, end, exclude)),
+            )
+
+    def busy(self, provider_ids, range_start, range_end):
+        """
+        provider_id -> sorted [(start, end), ...] (aware datetimes) of
+        scheduled time overlapping the range, or None when the index isn't
+        loaded yet or the range starts before its window.
+        """
+        self.sync()
+        if not self.covers(range_start):
+            return None
+        start, end = to_epoch(range_start), to_epoch(range_end)
+        with self._lock:
+            result = {}
+            for pk in provider_ids:
+                intervals = self.providers.get(pk)
+                pairs = intervals.between(start, end) if intervals else []
+                result[pk] = [(from_epoch(s), from_epoch(e)) for s, e in pairs]
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "appointments": len(self.rows),
+                "providers": len(self.providers),
+                "patients": len(self.patients),
+                "version": self.version,
+                "generation": self.generation,
+            }
+
+
+schedule_index = ScheduleIndex()
+
+
+# --------- Version counter --------- #
+
+def current_version():
+    row = ScheduleVersion.objects.filter(name=VERSION_NAME).values_list("version", "generation").first()
+    return row or (0, 0)
+
+
+def bump_version(full_reload=False):
+    """Tell every process the appointment table changed, right away (call after commit)."""
+    _bump({"generation" if full_reload else "version"})
+
+
+def _bump(fields):
+    updates = {field: F(field) + 1 for field in fields}
+    if not ScheduleVersion.objects.filter(name=VERSION_NAME).update(**updates):
+        ScheduleVersion.objects.get_or_create(name=VERSION_NAME)
+        ScheduleVersion.objects.filter(name=VERSION_NAME).update(**updates)
+
+
+class VersionBumps:
+    """
+    Coalesces this process's bumps of the shared ScheduleVersion row. The
+    first one is written at once; later ones within
+    CLINIC_SCHEDULE_INDEX_BUMP_SECONDS are folded into a single UPDATE when
+    the interval ends. Other processes only look every CHECK_SECONDS, so
+    bumping more often than that tells them nothing new.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._timer = None
+        self._last = float("-inf")
+
+    def request(self, full_reload=False):
+        interval = getattr(settings, "CLINIC_SCHEDULE_INDEX_BUMP_SECONDS", 1.0)
+        with self._lock:
+            self._pending.add("generation" if full_reload else "version")
+            wait = self._last + interval - clock.monotonic()
+            if wait > 0:
+                if self._timer is None:
+                    # Not a daemon: a worker shutting down still writes its last bump
+                    self._timer = threading.Timer(wait, self._flush_from_timer)
+                    self._timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            fields, self._pending = self._pending, set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._last = clock.monotonic()
+        if not fields:
+            return
+        try:
+            _bump(fields)
+        except Exception:
+            with self._lock:
+                self._pending |= fields
+            raise
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            # Still pending; written by the next request()
+            pass
+        finally:
+            connections.close_all()
+
+
+version_bumps = VersionBumps()
+
+
+def enabled():
+    return getattr(settings, "CLINIC_SCHEDULE_INDEX_ENABLED", True)
+
+
+def warm_on_startup():
+    """
+    Run in a thread by lean startup (clinic/startup.py); a failure (e.g. no
+    DB yet) just leaves lazy loading.
+    """
+    if not enabled():
+        return
+    try:
+        schedule_index.load()
+    except Exception:
+        schedule_index._reset()
+    finally:
+        # The thread's own connection; requests have theirs
+        connections.close_all()
+
+
+def appointment_changed(appointment):
+    schedule_index.apply(appointment)
+    version_bumps.request()
+
+
+def appointment_deleted(appointment_id):
+    schedule_index.discard(appointment_id)
+    version_bumps.request(full_reload=True)
+
+
+def appointments_bulk_created(full_reload=False):
+    """For bulk_create paths that skip signals; bumps the version once the transaction commits."""
+    if enabled():
+        transaction.on_commit(lambda: version_bumps.request(full_reload=full_reload))
@@ -0,0 +1,191 @@
+"""
+Large-table mode for the admin changelists (clinic/admin.py).
+
+With millions of rows the stock changelist is slow in four places; each
+has a replacement here:
+
+- counts: the stock paginator runs an exact COUNT(*) (twice, with
+  show_full_result_count). EstimatedCountPaginator counts at most
+  CLINIC_ADMIN_COUNT_LIMIT rows; beyond that an unfiltered list shows
+  the table size from MySQL's statistics (information_schema.TABLES)
+  and a filtered one shows "<limit>+".
+- paging: ?p=N is an OFFSET that reads and discards every earlier row.
+  In the default ordering KeysetChangeList pages with a ?cursor= instead
+  (clinic/pagination.py), so every page is one index range scan. Sorting
+  by a column header falls back to numbered pages.
+- filters: a foreign key list_filter renders a link per related row.
+  AutocompleteFilter renders one autocomplete <select> (clinic/widgets.py).
+- eager loading and search: list_select_related and index-backed
+  get_search_results() on the ModelAdmins themselves.
+"""
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.utils import get_last_value_from_parameters, get_model_from_relation
+from django.contrib.admin.views.main import ERROR_FLAG, ORDER_VAR, PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from .pagination import keyset_paginate
+from .widgets import AutocompleteSelect
+
+CURSOR_VAR = "cursor"
+
+
+def estimated_row_count(model, using="default"):
+    """
+    Row count of the model's table from MySQL's table statistics, without
+    scanning it, or None on other backends. InnoDB samples the figure, so
+    it can be off by some percent.
+    """
+    connection = connections[using]
+    if connection.vendor != "mysql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count stops at CLINIC_ADMIN_COUNT_LIMIT rows.
+    `estimated` / `capped` tell the template how to show it.
+    """
+
+    estimated = False
+    capped = False
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, "CLINIC_ADMIN_COUNT_LIMIT", 10000)
+        queryset = self.object_list
+        # SELECT COUNT(*) FROM (SELECT ... LIMIT n): reads at most n + 1 rows
+        count = queryset.order_by()[: limit + 1].count()
+        if count <= limit:
+            return count
+        if not queryset.query.has_filters():
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                self.estimated = True
+                return max(estimate, count)
+        self.capped = True
+        return limit
+
+
+class KeysetChangeList(ChangeList):
+    """
+    ChangeList that pages with ?cursor= on the ModelAdmin's keyset_keys
+    (ascending, ending in a unique key) while the list is in its default
+    ordering. Used with LargeTableAdmin, whose get_ordering() returns those
+    keys.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset_page = None
+        self.keyset_links = {}
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Links that change sorting, filters or search start from the first page
+        return super().get_query_string(new_params, [*(remove or []), CURSOR_VAR])
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all or self.list_editable:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        page = keyset_paginate(
+            self.queryset, list(self.model_admin.keyset_keys), cursor=self.cursor, page_size=self.list_per_page,
+        )
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = page.items
+        self.can_show_all = False
+        self.multi_page = page.has_next or page.has_previous
+        self.paginator = paginator
+        self.keyset_page = page
+        if page.has_previous:
+            self.keyset_links["first"] = self.get_query_string()
+            self.keyset_links["previous"] = self.get_query_string({CURSOR_VAR: page.previous_cursor})
+        if page.has_next:
+            self.keyset_links["next"] = self.get_query_string({CURSOR_VAR: page.next_cursor})
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Foreign key filter rendered as one autocomplete <select> fed by
+    `url_name`, instead of a link per related row. Rendering it costs one
+    primary-key lookup for the selected value. Subclass and set url_name;
+    the ModelAdmin needs clinic/js/autocomplete.js in its Media.
+    """
+
+    template = "admin/clinic/autocomplete_filter.html"
+    url_name = None
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.related_model = get_model_from_relation(field)
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        self.lookup_val = get_last_value_from_parameters(params, self.lookup_kwarg) or None
+        if self.lookup_val is None:
+            # The form's empty "---------" choice
+            params.pop(self.lookup_kwarg, None)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        # Carried through the filter's GET form so it only changes this filter
+        skip = {self.lookup_kwarg, PAGE_VAR, CURSOR_VAR, ERROR_FLAG}
+        self.hidden_params = [
+            (name, value) for name, values in request.GET.lists() if name not in skip for value in values
+        ]
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.lookup_val is None,
+            "query_string": changelist.get_query_string(remove=[self.lookup_kwarg]),
+            "display": _("All"),
+        }
+
+    def render_widget(self):
+        widget = AutocompleteSelect(self.url_name, self.related_model)
+        return widget.render(self.lookup_kwarg, self.lookup_val, attrs={"id": f"filter_{self.field_path}"})
+
+
+class PatientFilter(AutocompleteFilter):
+    url_name = "patient_autocomplete"
+
+
+class ProviderFilter(AutocompleteFilter):
+    url_name = "provider_autocomplete"
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin base for tables with millions of rows; see the module docstring."""
+
+    # Keyset paging order; needs a matching index
+    keyset_keys = ("id",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Facet counts are a COUNT per filter choice
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_ordering(self, request):
+        return list(self.keyset_keys)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
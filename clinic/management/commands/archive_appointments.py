@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from clinic.archive import archivable, archive_appointments, months_ago
+
+
+class Command(BaseCommand):
+    help = (
+        "Move appointments older than --months (canceled ones older than --canceled-months) "
+        "from the live table into AppointmentArchive, in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=getattr(settings, "CLINIC_ARCHIVE_AFTER_MONTHS", 12))
+        parser.add_argument("--canceled-months", type=int,
+                            default=getattr(settings, "CLINIC_ARCHIVE_CANCELED_AFTER_MONTHS", 1))
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--limit", type=int, help="Stop after moving this many rows")
+        parser.add_argument("--pause", type=float, default=0, help="Seconds to sleep between batches")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be moved")
+
+    def handle(self, *args, **options):
+        cutoff = months_ago(options["months"])
+        canceled_cutoff = months_ago(options["canceled_months"])
+        if options["dry_run"]:
+            count = archivable(cutoff, canceled_cutoff).count()
+            self.stdout.write(f"{count} appointments would be archived (before {cutoff:%Y-%m-%d})")
+            return
+
+        def progress(moved):
+            self.stdout.write(f"  {moved} archived")
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        started = time.monotonic()
+        moved = archive_appointments(
+            cutoff, canceled_cutoff, batch_size=options["batch_size"], limit=options["limit"], progress=progress
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} appointments in {elapsed:.1f}s"))
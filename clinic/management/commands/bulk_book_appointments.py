@@ -0,0 +1,120 @@
+import csv
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from clinic.bulk_booking import bulk_book, chunked, expand_series, read_rows
+from clinic.models import Tenant
+from clinic.tenants import use_tenant
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-book appointments from a CSV/JSON/NDJSON file, or a recurring series, "
+        "with batched conflict detection. Writes a per-row accept/reject report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="Input file (columns: patient_id or patient_chart_number, "
+                                                    "provider_id, start_time, end_time, reason, status)")
+        parser.add_argument("--format", choices=["csv", "json", "ndjson"],
+                            help="Input format (default: from file extension)")
+        parser.add_argument("--chunk-size", type=int, default=5000,
+                            help="Rows conflict-checked and inserted per transaction")
+        parser.add_argument("--dry-run", action="store_true", help="Check conflicts without inserting")
+        parser.add_argument("--report", help="Write the per-row report as CSV to this path ('-' for stdout)")
+        parser.add_argument("--tenant", help="Slug of the clinic to book for (default: CLINIC_DEFAULT_TENANT)")
+
+        series = parser.add_argument_group("recurring series")
+        series.add_argument("--series", action="store_true", help="Book a recurring series instead of a file")
+        series.add_argument("--patient", type=int)
+        series.add_argument("--provider", type=int)
+        series.add_argument("--start", help="First start time (ISO 8601)")
+        series.add_argument("--duration", type=int, default=30, help="Minutes")
+        series.add_argument("--every-days", type=int, default=7)
+        series.add_argument("--count", type=int, default=52)
+        series.add_argument("--reason", default="")
+
+    def handle(self, *args, **options):
+        with use_tenant(self._tenant(options["tenant"])):
+            self._handle(options)
+
+    def _tenant(self, slug):
+        if not slug:
+            return None
+        try:
+            return Tenant.objects.get(slug=slug)
+        except Tenant.DoesNotExist:
+            raise CommandError(f"No tenant with slug {slug!r}.")
+
+    def _handle(self, options):
+        if options["series"]:
+            rows = self._series_rows(options)
+            self._run(rows, options)
+        elif options["path"]:
+            path = Path(options["path"])
+            fmt = options["format"] or path.suffix.lstrip(".").lower()
+            if fmt not in ("csv", "json", "ndjson"):
+                raise CommandError("Cannot tell input format; pass --format.")
+            with path.open(newline="", encoding="utf-8") as f:
+                self._run(read_rows(f, fmt), options)
+        else:
+            raise CommandError("Pass an input file or --series.")
+
+    def _series_rows(self, options):
+        start = parse_datetime(options["start"] or "")
+        if not (options["patient"] and options["provider"] and start):
+            raise CommandError("--series needs --patient, --provider and --start.")
+        if timezone.is_naive(start):
+            start = timezone.make_aware(start)
+        return expand_series(
+            options["patient"],
+            options["provider"],
+            start,
+            timedelta(minutes=options["duration"]),
+            every=timedelta(days=options["every_days"]),
+            count=options["count"],
+            reason=options["reason"],
+        )
+
+    def _run(self, rows, options):
+        report_path = options["report"]
+        report_file = None
+        writer = None
+        if report_path:
+            report_file = sys.stdout if report_path == "-" else open(report_path, "w", newline="")
+            writer = csv.writer(report_file)
+            writer.writerow(["row", "status", "message", "appointment_id"])
+
+        accepted = rejected = 0
+        started = time.monotonic()
+        try:
+            offset = 0
+            for chunk in chunked(rows, options["chunk_size"]):
+                results = bulk_book(chunk, start_index=offset, dry_run=options["dry_run"])
+                offset += len(chunk)
+                for result in results:
+                    if result.accepted:
+                        accepted += 1
+                    else:
+                        rejected += 1
+                    if writer:
+                        writer.writerow([
+                            result.row,
+                            "accepted" if result.accepted else "rejected",
+                            result.message,
+                            result.appointment.pk if result.appointment else "",
+                        ])
+                elapsed = time.monotonic() - started
+                self.stderr.write(f"{offset} rows processed ({offset / max(elapsed, 1e-6):.0f} rows/s)")
+        finally:
+            if report_file and report_file is not sys.stdout:
+                report_file.close()
+
+        verb = "would be booked" if options["dry_run"] else "booked"
+        self.stderr.write(self.style.SUCCESS(f"{accepted} {verb}, {rejected} rejected"))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clinic import benchmarks
+from clinic.models import Patient, Provider
+
+
+class Command(BaseCommand):
+    help = (
+        "Split the time of the list and calendar pages into ORM (SQL), template rendering and the "
+        "rest of the view, with cold caches and with the caches each request filled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios", nargs="*",
+            help=f"Benchmark scenarios (default: {', '.join(benchmarks.PROFILE_SCENARIOS)})",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write results as JSON")
+
+    def handle(self, *args, **options):
+        unknown = set(options["scenarios"]) - set(benchmarks.Benchmark.available())
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if not Patient.objects.exists() or not Provider.objects.exists():
+            raise CommandError("No data to profile; run generate_synthetic_data first.")
+
+        report = benchmarks.profile_views(
+            options["scenarios"] or None, iterations=options["iterations"], seed=options["seed"],
+        )
+
+        self.stdout.write(f"Median of {report['iterations']} requests (ms)")
+        self.stdout.write(
+            f"{'scenario':28} {'cache':6} {'total':>8} {'orm':>8} {'template':>9} {'other':>8} {'queries':>8}"
+        )
+        for name, states in report["results"].items():
+            for state, result in states.items():
+                self.stdout.write(
+                    f"{name:28} {state:6} {result['total_ms']:8.1f} {result['orm_ms']:8.1f} "
+                    f"{result['template_ms']:9.1f} {result['other_ms']:8.1f} {result['queries']:8.0f}"
+                )
+
+        if options["output"]:
+            benchmarks.save(report, options["output"])
+            self.stdout.write(f"Wrote {options['output']}")
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from clinic.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the patient search index (PatientSearchTerm) from the Patient table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_index(batch_size=options["batch_size"], stdout=self.stdout)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} patients in {elapsed:.1f}s"))
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clinic import benchmarks
+from clinic.models import Patient, Provider
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot paths (search, conflict check, calendars, list views) against the "
+        "current database and report latency percentiles and query counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenarios", nargs="*", help=f"Subset of: {', '.join(benchmarks.Benchmark.available())}")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write this run's results as JSON")
+        parser.add_argument("--save-baseline", help="Write results as the baseline JSON to compare against later")
+        parser.add_argument("--compare", help="Baseline JSON; exit non-zero if any scenario regressed")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown vs baseline")
+
+    def handle(self, *args, **options):
+        unknown = set(options["scenarios"]) - set(benchmarks.Benchmark.available())
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if not Patient.objects.exists() or not Provider.objects.exists():
+            raise CommandError("No data to benchmark; run generate_synthetic_data first.")
+
+        report = benchmarks.run_all(
+            options["scenarios"] or None,
+            iterations=options["iterations"],
+            warmup=options["warmup"],
+            seed=options["seed"],
+        )
+
+        env = report["environment"]
+        rows = env["rows"]
+        self.stdout.write(
+            f"{env['vendor']}: {rows['patients']} patients, {rows['providers']} providers, "
+            f"{rows['appointments']} appointments"
+        )
+        self.stdout.write(f"{'scenario':36} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}")
+        for name, result in report["results"].items():
+            self.stdout.write(
+                f"{name:36} {result['p50_ms']:7.1f}ms {result['p95_ms']:7.1f}ms "
+                f"{result['p99_ms']:7.1f}ms {result['queries_max']:8d}"
+            )
+
+        for path in (options["output"], options["save_baseline"]):
+            if path:
+                benchmarks.save(report, path)
+                self.stdout.write(f"Wrote {path}")
+
+        if options["compare"]:
+            problems = benchmarks.compare(report, benchmarks.load(options["compare"]), options["tolerance"])
+            if problems:
+                for problem in problems:
+                    self.stderr.write(problem)
+                raise CommandError(f"{len(problems)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clinic import benchmarks
+from clinic.models import Patient, Provider
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput of the sync views behind the WSGI handler (thread pool) with the async "
+        "views behind the ASGI handler (event loop) at a fixed concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenarios", nargs="*", help=f"Subset of: {', '.join(benchmarks.SERVER_SCENARIOS)}")
+        parser.add_argument("--requests", type=int, default=500, help="Requests per scenario and server")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once")
+        parser.add_argument("--db-latency-ms", type=float, default=0,
+                            help="Sleep added to every SQL query, to mimic a remote/slow MySQL")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write results as JSON")
+
+    def handle(self, *args, **options):
+        unknown = set(options["scenarios"]) - set(benchmarks.SERVER_SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if not Patient.objects.exists() or not Provider.objects.exists():
+            raise CommandError("No data to benchmark; run generate_synthetic_data first.")
+
+        report = benchmarks.server_comparison(
+            options["scenarios"] or None,
+            requests=options["requests"],
+            concurrency=options["concurrency"],
+            db_latency_ms=options["db_latency_ms"],
+            seed=options["seed"],
+        )
+
+        self.stdout.write(
+            f"{report['environment']['vendor']}: {report['requests']} requests x {report['concurrency']} "
+            f"concurrent, +{report['db_latency_ms']}ms per query"
+        )
+        self.stdout.write(f"{'scenario':20} {'server':6} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+        for name, servers in report["results"].items():
+            for server, result in servers.items():
+                self.stdout.write(
+                    f"{name:20} {server:6} {result['rps']:8.1f} {result['p50_ms']:7.1f}ms "
+                    f"{result['p95_ms']:7.1f}ms {result['p99_ms']:7.1f}ms {result['errors']:7d}"
+                )
+
+        if options["output"]:
+            benchmarks.save(report, options["output"])
+            self.stdout.write(f"Wrote {options['output']}")
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clinic import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Add synthetic clinics (tenants bench-001, ...) up to each step and time one clinic's pages after "
+        "each step, to check per-clinic latency stays flat as clinics are added. Use a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--steps", default="1,10,50", help="Comma-separated tenant counts")
+        parser.add_argument("--patients", type=int, default=2000, help="Patients per tenant")
+        parser.add_argument("--providers", type=int, default=10, help="Providers per tenant")
+        parser.add_argument("--days", type=int, default=60, help="Days of appointments before and after today")
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write results as JSON")
+
+    def handle(self, *args, **options):
+        try:
+            steps = sorted({int(step) for step in options["steps"].split(",")})
+        except ValueError:
+            raise CommandError("--steps must be comma-separated integers.")
+        if not steps or steps[0] < 1:
+            raise CommandError("--steps must be positive.")
+
+        report = benchmarks.tenant_scaling(
+            steps,
+            patients=options["patients"],
+            providers=options["providers"],
+            days=options["days"],
+            iterations=options["iterations"],
+            seed=options["seed"],
+            stdout=self.stderr,
+        )
+
+        results = report["results"]
+        self.stdout.write("p50 / p95 (ms) for tenant bench-001")
+        self.stdout.write(f"{'scenario':28}" + "".join(f"{f'{step} tenants':>18}" for step in results))
+        self.stdout.write(f"{'appointments':28}" + "".join(f"{r['appointments']:>18}" for r in results.values()))
+        for name in benchmarks.TENANT_SCENARIOS:
+            self.stdout.write(f"{name:28}" + "".join(
+                f"{r['scenarios'][name]['p50_ms']:>9.1f}{r['scenarios'][name]['p95_ms']:>9.1f}"
+                for r in results.values()
+            ))
+
+        if options["output"]:
+            benchmarks.save(report, options["output"])
+            self.stdout.write(f"Wrote {options['output']}")
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from clinic.reminders import Dispatcher, FileTransport
+
+
+class Command(BaseCommand):
+    help = (
+        "Send reminders for appointments starting within CLINIC_REMINDER_LEAD_HOURS through the "
+        "configured transport, on a rate-limited worker pool. Each reminder's delivery state is recorded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--follow", action="store_true", help="Keep running a tick every --interval seconds")
+        parser.add_argument("--interval", type=float, default=10.0)
+        parser.add_argument("--file", help="Write reminders as NDJSON to this file instead of the configured transport")
+        parser.add_argument("--workers", type=int, help="Worker threads (default CLINIC_REMINDER_WORKERS)")
+        parser.add_argument("--rate", type=float,
+                            help="Sends per second, 0 for no limit (default CLINIC_REMINDER_RATE_PER_SECOND)")
+
+    def handle(self, *args, **options):
+        transport = FileTransport(options["file"]) if options["file"] else None
+        dispatcher = Dispatcher(transport, workers=options["workers"], rate=options["rate"])
+        try:
+            while True:
+                started = time.monotonic()
+                counts = dispatcher.tick()
+                if counts:
+                    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+                    self.stderr.write(f"{summary} in {time.monotonic() - started:.1f}s")
+                if not options["follow"]:
+                    break
+                close_old_connections()
+                time.sleep(max(0.0, options["interval"] - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.close()
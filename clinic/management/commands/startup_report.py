@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from clinic import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the WSGI/ASGI entry point in fresh interpreters and report startup phases, time to "
+        "first response and the slowest imports (python -X importtime)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entry", choices=["wsgi", "asgi"], default="wsgi")
+        parser.add_argument("--path", default="/", help="Path of the first request")
+        parser.add_argument("--runs", type=int, default=5, help="Cold starts per mode (medians are reported)")
+        parser.add_argument("--compare", action="store_true", help="Run normal and lean startup (CLINIC_LEAN_STARTUP)")
+        parser.add_argument("--lean", action="store_true", help="Only run lean startup")
+        parser.add_argument("--top", type=int, default=15, help="How many modules/packages to list")
+        parser.add_argument("--output", help="Write results as JSON")
+
+    def handle(self, *args, **options):
+        modes = ["normal", "lean"] if options["compare"] else ["lean" if options["lean"] else "normal"]
+        report = benchmarks.startup_comparison(
+            options["entry"], options["path"], runs=options["runs"], modes=modes, top=options["top"],
+        )
+
+        results = report["results"]
+        self.stdout.write(f"{report['entry']} GET {report['path']}, median of {report['runs']} cold starts (ms)")
+        self.stdout.write(f"{'':24}" + "".join(f"{mode:>10}" for mode in results))
+        rows = [("process (start to exit)", "process_ms"), ("imports", "import_ms")]
+        rows += [(phase, phase) for phase in benchmarks.STARTUP_PHASES]
+        rows += [("first request latency", "first_response_ms")]
+        for label, key in rows:
+            values = [summary["phases_ms"].get(key, summary.get(key)) for summary in results.values()]
+            self.stdout.write(f"{label:24}" + "".join(f"{value:10.1f}" for value in values))
+
+        for mode, summary in results.items():
+            self.stdout.write(f"\n{mode}: import time by top-level package (ms)")
+            for package, ms in summary["packages"]:
+                self.stdout.write(f"  {package:40} {ms:8.1f}")
+            self.stdout.write(f"{mode}: slowest modules, self / cumulative (ms)")
+            for name, self_ms, cumulative_ms in summary["modules"]:
+                self.stdout.write(f"  {name:40} {self_ms:8.1f} {cumulative_ms:8.1f}")
+
+        if options["output"]:
+            benchmarks.save(report, options["output"])
+            self.stdout.write(f"Wrote {options['output']}")
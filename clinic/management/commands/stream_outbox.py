@@ -0,0 +1,66 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from clinic.models import OutboxCursor
+from clinic.outbox import CursorMoved, NdjsonDirectorySink, NdjsonFileSink, deliver, prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream appointment and patient change events from the outbox as NDJSON, in batches. "
+        "Each consumer has a durable cursor that moves only after a batch was written (at-least-once)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--consumer", default="default", help="Cursor name; one per downstream system")
+        target = parser.add_mutually_exclusive_group()
+        target.add_argument("--output", help="Append events to this NDJSON file ('-' for stdout)")
+        target.add_argument("--output-dir", help="Write each batch to its own NDJSON file in this directory")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--follow", action="store_true", help="Keep polling for new events")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls with --follow")
+        parser.add_argument("--from-id", type=int,
+                            help="Move the consumer's cursor first, so events after this id are sent (again)")
+        parser.add_argument("--prune", action="store_true",
+                            help="Only delete events every consumer has received that are older than "
+                                 "CLINIC_OUTBOX_RETENTION_DAYS")
+
+    def handle(self, *args, **options):
+        if options["prune"]:
+            self.stdout.write(self.style.SUCCESS(f"Pruned {prune()} outbox events"))
+            return
+
+        consumer = options["consumer"]
+        if options["from_id"] is not None:
+            OutboxCursor.objects.update_or_create(name=consumer, defaults={"position": options["from_id"], "gaps": []})
+
+        if options["output_dir"]:
+            self._run(NdjsonDirectorySink(options["output_dir"]), options)
+        elif options["output"] in (None, "-"):
+            self._run(NdjsonFileSink(sys.stdout, sync=False), options)
+        else:
+            with open(options["output"], "a", encoding="utf-8") as f:
+                self._run(NdjsonFileSink(f), options)
+
+    def _run(self, sink, options):
+        consumer = options["consumer"]
+        sent = 0
+        try:
+            while True:
+                count = deliver(consumer, sink, batch_size=options["batch_size"])
+                sent += count
+                if count:
+                    self.stderr.write(f"{sent} events sent")
+                    continue
+                if not options["follow"]:
+                    break
+                close_old_connections()
+                time.sleep(options["poll_interval"])
+        except CursorMoved as exc:
+            raise CommandError(str(exc))
+        except KeyboardInterrupt:
+            pass
+        self.stderr.write(self.style.SUCCESS(f"{sent} events sent to {consumer}"))
@@ -0,0 +1,40 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over its SQLite replica(s). Local stand-in for "
+        "replication when running with CLINIC_DB_BACKEND=sqlite; anything written since the "
+        "last sync is 'replica lag'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("aliases", nargs="*", help="Replica aliases (default: CLINIC_READ_REPLICAS)")
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or getattr(settings, "CLINIC_READ_REPLICAS", [])
+        if not aliases:
+            raise CommandError("No read replicas configured.")
+
+        primary = settings.DATABASES["default"]
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("Only SQLite primaries can be copied; use database replication otherwise.")
+
+        for alias in aliases:
+            replica = settings.DATABASES.get(alias)
+            if replica is None or replica["ENGINE"] != "django.db.backends.sqlite3":
+                raise CommandError(f"{alias} is not a SQLite database.")
+            connections[alias].close()
+            # Online backup API: consistent snapshot even while the primary is in use
+            source = sqlite3.connect(primary["NAME"])
+            target = sqlite3.connect(replica["NAME"])
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(f"Copied {primary['NAME']} -> {replica['NAME']}")
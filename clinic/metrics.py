@@ -0,0 +1,202 @@
+"""
+In-process request metrics collected by clinic.middleware.QueryProfilingMiddleware.
+
+Each worker process keeps fixed-bucket histograms per URL name (wall time,
+SQL query count, SQL time) plus duplicate/similar query counters. They are
+exported in Prometheus text format by the metrics view and summarized
+(p50/p95/p99 estimated from the buckets) on the admin profiling page,
+together with the clinic cache hit/miss counters.
+"""
+
+import threading
+from bisect import bisect_left
+
+from . import startup
+from .caching import cache_stats
+
+# Upper bounds, Prometheus-style; +Inf is implicit
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# How many distinct "similar query" examples to keep per view
+MAX_SIMILAR_EXAMPLES = 5
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.samples = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.samples += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside the bucket."""
+        if not self.samples:
+            return None
+        rank = q * self.samples
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                if i >= len(self.bounds):
+                    return lower
+                upper = self.bounds[i]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            running += count
+            yield bound, running
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.wall = Histogram(SECONDS_BUCKETS)
+        self.sql_count = Histogram(COUNT_BUCKETS)
+        self.sql_time = Histogram(SECONDS_BUCKETS)
+        self.duplicate_queries = 0
+        self.similar_queries = 0
+        self.similar_examples = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def _stats(self, view):
+        stats = self._views.get(view)
+        if stats is None:
+            stats = self._views[view] = ViewStats()
+        return stats
+
+    def record_request(self, view, seconds):
+        with self._lock:
+            stats = self._stats(view)
+            stats.requests += 1
+            stats.wall.observe(seconds)
+
+    def record_queries(self, view, count, seconds, duplicates, similar):
+        """`similar` maps SQL text (params stripped) -> times executed."""
+        with self._lock:
+            stats = self._stats(view)
+            stats.sql_count.observe(count)
+            stats.sql_time.observe(seconds)
+            stats.duplicate_queries += duplicates
+            for sql, times in similar.items():
+                if times > 1:
+                    stats.similar_queries += times - 1
+                    if sql in stats.similar_examples or len(stats.similar_examples) < MAX_SIMILAR_EXAMPLES:
+                        stats.similar_examples[sql] = max(times, stats.similar_examples.get(sql, 0))
+
+    def snapshot(self):
+        with self._lock:
+            return sorted(self._views.items())
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+# --------- Export --------- #
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _histogram_lines(name, help_text, items):
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} histogram"
+    for view, histogram in items:
+        label = f'view="{_label(view)}"'
+        for bound, count in histogram.cumulative():
+            yield f'{name}_bucket{{{label},le="{_format_bound(bound)}"}} {count}'
+        yield f"{name}_sum{{{label}}} {histogram.total}"
+        yield f"{name}_count{{{label}}} {histogram.samples}"
+
+
+def _counter_lines(name, help_text, items, label="view"):
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} counter"
+    for key, value in items:
+        yield f'{name}{{{label}="{_label(key)}"}} {value}'
+
+
+def _gauge_lines(name, help_text, items, label):
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} gauge"
+    for key, value in items:
+        yield f'{name}{{{label}="{_label(key)}"}} {value}'
+
+
+def prometheus_text(snapshot=None):
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    lines = []
+    lines += _counter_lines(
+        "clinic_requests_total", "Requests handled, per URL name.",
+        [(v, s.requests) for v, s in snapshot])
+    lines += _histogram_lines(
+        "clinic_request_duration_seconds", "Wall time per request.",
+        [(v, s.wall) for v, s in snapshot])
+    lines += _histogram_lines(
+        "clinic_request_sql_queries", "SQL queries per sampled request.",
+        [(v, s.sql_count) for v, s in snapshot])
+    lines += _histogram_lines(
+        "clinic_request_sql_duration_seconds", "SQL time per sampled request.",
+        [(v, s.sql_time) for v, s in snapshot])
+    lines += _counter_lines(
+        "clinic_duplicate_queries_total", "Identical SQL+params repeated within a sampled request.",
+        [(v, s.duplicate_queries) for v, s in snapshot])
+    lines += _counter_lines(
+        "clinic_similar_queries_total", "Same SQL with different params repeated within a sampled request (N+1).",
+        [(v, s.similar_queries) for v, s in snapshot])
+    cache = cache_stats()
+    lines += _counter_lines(
+        "clinic_cache_hits_total", "Clinic cache hits, per namespace.",
+        [(ns, hits) for ns, (hits, _) in cache.items()], label="namespace")
+    lines += _counter_lines(
+        "clinic_cache_misses_total", "Clinic cache misses, per namespace.",
+        [(ns, misses) for ns, (_, misses) in cache.items()], label="namespace")
+    lines += _gauge_lines(
+        "clinic_startup_seconds", "Seconds from entry point import to each startup phase (clinic/startup.py).",
+        sorted(startup.phases.items(), key=lambda item: item[1]), label="phase")
+    return "\n".join(lines) + "\n"
+
+
+def summary_rows(snapshot=None):
+    """Per-view dicts for the admin profiling page."""
+    snapshot = registry.snapshot() if snapshot is None else snapshot
+    rows = []
+    for view, stats in snapshot:
+        sampled = stats.sql_count.samples
+        rows.append({
+            "view": view,
+            "requests": stats.requests,
+            "sampled": sampled,
+            "p50": stats.wall.quantile(0.50),
+            "p95": stats.wall.quantile(0.95),
+            "p99": stats.wall.quantile(0.99),
+            "avg_queries": stats.sql_count.total / sampled if sampled else None,
+            "p95_queries": stats.sql_count.quantile(0.95),
+            "avg_sql_time": stats.sql_time.total / sampled if sampled else None,
+            "duplicate_queries": stats.duplicate_queries,
+            "similar_queries": stats.similar_queries,
+            "similar_examples": sorted(stats.similar_examples.items(), key=lambda item: -item[1]),
+        })
+    return rows
@@ -0,0 +1,140 @@
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import Http404
+from django.utils.deprecation import MiddlewareMixin
+
+from .caching import get_default_tenant, get_tenant_for_host
+from .metrics import registry
+from .routers import PIN_COOKIE, replicas
+from .tenants import use_tenant
+
+
+class _QueryRecorder:
+    """execute_wrapper that counts/time queries and spots repeats."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.exact = Counter()
+        self.similar = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.similar[sql] += 1
+            try:
+                self.exact[(sql, repr(params))] += 1
+            except Exception:
+                pass
+
+    @property
+    def duplicates(self):
+        return sum(times - 1 for times in self.exact.values() if times > 1)
+
+
+class QueryProfilingMiddleware:
+    """
+    Opt-in per-view latency and SQL profiling.
+
+    Wall time is recorded for every request (a perf_counter pair). SQL
+    counting wraps every database connection, so it only runs for a random
+    CLINIC_PROFILING_SAMPLE_RATE fraction of requests to keep overhead low.
+    Results go to clinic.metrics.registry, keyed by URL name.
+
+    Connections are per thread. Under ASGI the ORM runs in the request's
+    sync_to_async thread rather than on the event loop, so the async path
+    installs the wrappers on that thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "CLINIC_PROFILING_SAMPLE_RATE", 0.05)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = self._recorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            if recorder:
+                _wrap_connections(stack, recorder)
+            response = self.get_response(request)
+        self._record(request, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = self._recorder()
+        started = time.perf_counter()
+        stack = ExitStack()
+        if recorder:
+            await sync_to_async(_wrap_connections)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if recorder:
+                await sync_to_async(stack.close)()
+        self._record(request, time.perf_counter() - started, recorder)
+        return response
+
+    def _recorder(self):
+        return _QueryRecorder() if random.random() < self.sample_rate else None
+
+    def _record(self, request, elapsed, recorder):
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else None) or "<unresolved>"
+        registry.record_request(view, elapsed)
+        if recorder:
+            registry.record_queries(view, recorder.count, recorder.seconds, recorder.duplicates, recorder.similar)
+
+
+def _wrap_connections(stack, recorder):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """After a successful write request, pin the client to the primary for CLINIC_REPLICA_PIN_SECONDS."""
+
+    def process_response(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE") and response.status_code < 400 and replicas():
+            seconds = getattr(settings, "CLINIC_REPLICA_PIN_SECONDS", 10)
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite="Lax")
+        return response
+
+
+class TenantMiddleware:
+    """
+    Serve each request as the Tenant its host resolves to (clinic/tenants.py):
+    sets request.tenant and scopes the clinic models' managers to it. Hosts
+    matching no tenant get CLINIC_DEFAULT_TENANT, or a 404 when
+    CLINIC_TENANT_REQUIRED is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.required = getattr(settings, "CLINIC_TENANT_REQUIRED", False)
+
+    def __call__(self, request):
+        tenant = get_tenant_for_host(request.get_host())
+        if tenant is None:
+            if self.required:
+                raise Http404("No clinic is served at this address.")
+            tenant = get_default_tenant()
+        request.tenant = tenant
+        with use_tenant(tenant):
+            return self.get_response(request)
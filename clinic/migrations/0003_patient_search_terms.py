@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_search_terms(apps, schema_editor):
+    from clinic.search import term_pairs
+
+    Patient = apps.get_model("clinic", "Patient")
+    PatientSearchTerm = apps.get_model("clinic", "PatientSearchTerm")
+    batch = []
+    for patient in Patient.objects.order_by("id").iterator(chunk_size=2000):
+        for kind, term in term_pairs(patient.first_name, patient.last_name, patient.phone):
+            batch.append(PatientSearchTerm(patient_id=patient.pk, kind=kind, term=term))
+        if len(batch) >= 10000:
+            PatientSearchTerm.objects.bulk_create(batch)
+            batch = []
+    PatientSearchTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0002_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patient',
+            name='date_of_birth',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.CreateModel(
+            name='PatientSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('name', 'Name token'), ('trigram', 'Name trigram'), ('phone', 'Phone digits'), ('phone_rev', 'Phone digits reversed')], max_length=10)),
+                ('term', models.CharField(max_length=100)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='clinic.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'term', 'patient'], name='clinic_pati_kind_ab682d_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0003_patient_search_terms'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='provider',
+            name='specialty',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProviderWorkingHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to='clinic.provider')),
+            ],
+            options={
+                'verbose_name_plural': 'provider working hours',
+                'ordering': ['provider', 'weekday', 'start_time'],
+            },
+        ),
+    ]
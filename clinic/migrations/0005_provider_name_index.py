@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0004_provider_working_hours'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='provider',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0005_provider_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('canceled', 'Canceled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='clinic.patient')),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='clinic.provider')),
+            ],
+            options={
+                'ordering': ['start_time'],
+                'indexes': [models.Index(fields=['patient', 'start_time'], name='clinic_appo_patient_26a97b_idx'), models.Index(fields=['provider', 'start_time'], name='clinic_appo_provide_af4e06_idx')],
+            },
+        ),
+    ]
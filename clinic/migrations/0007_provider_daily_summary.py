@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0006_appointment_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked_count', models.IntegerField(default=0)),
+                ('booked_minutes', models.IntegerField(default=0)),
+                ('canceled_count', models.IntegerField(default=0)),
+                ('canceled_minutes', models.IntegerField(default=0)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='clinic.provider')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'provider'], name='clinic_prov_date_7e6d8c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('provider', 'date'), name='unique_provider_daily_summary')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0008_schedule_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChartNumberSequence',
+            fields=[
+                ('prefix', models.CharField(max_length=10, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField(default=1)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='patientsearchterm',
+            name='kind',
+            field=models.CharField(choices=[('name', 'Name token'), ('trigram', 'Name trigram'), ('phone', 'Phone digits'), ('phone_rev', 'Phone digits reversed'), ('match', 'Duplicate blocking key')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0009_chart_number_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='provider',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['updated_at', 'id'], name='clinic_pati_updated_f4b598_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provider',
+            index=models.Index(fields=['updated_at', 'id'], name='clinic_prov_updated_0c4764_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:32
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0010_api_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(choices=[('appointment', 'Appointment'), ('patient', 'Patient')], max_length=20)),
+                ('entity_id', models.BigIntegerField()),
+                ('event', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('canceled', 'Canceled'), ('deleted', 'Deleted')], max_length=10)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='clinic_outb_created_8e6b03_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:47
+
+import clinic.tenants
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+TENANT_MODELS = ["appointment", "appointmentarchive", "patient", "patientsearchterm", "provider"]
+
+
+def tenant_field(**kwargs):
+    return models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='clinic.tenant', **kwargs)
+
+
+def assign_default_tenant(apps, schema_editor):
+    # Historical models only: the live default (clinic.tenants.current_tenant_id) isn't called here
+    Tenant = apps.get_model("clinic", "Tenant")
+    tenant, _ = Tenant.objects.get_or_create(
+        slug=getattr(settings, "CLINIC_DEFAULT_TENANT", "default"), defaults={"name": "Default clinic"},
+    )
+    for name in TENANT_MODELS:
+        apps.get_model("clinic", name)._base_manager.filter(tenant__isnull=True).update(tenant=tenant)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0012_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('domain', models.CharField(blank=True, max_length=253, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='clinic_appo_provide_a0b5d9_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='clinic_appo_patient_324906_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointmentarchive',
+            name='clinic_appo_patient_26a97b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointmentarchive',
+            name='clinic_appo_provide_af4e06_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='patient',
+            name='clinic_pati_last_na_7c4bf2_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='patientsearchterm',
+            name='clinic_pati_kind_ab682d_idx',
+        ),
+        migrations.AlterField(
+            model_name='patient',
+            name='chart_number',
+            field=models.CharField(max_length=32),
+        ),
+        # Nullable first, filled from the default tenant, then NOT NULL
+        *[
+            migrations.AddField(model_name=name, name='tenant', field=tenant_field(null=True))
+            for name in TENANT_MODELS
+        ],
+        migrations.RunPython(assign_default_tenant, migrations.RunPython.noop),
+        # The default only matters to the ORM; keep it out of the ALTER, which would call it
+        *[
+            migrations.SeparateDatabaseAndState(
+                database_operations=[migrations.AlterField(model_name=name, name='tenant', field=tenant_field())],
+                state_operations=[migrations.AlterField(
+                    model_name=name, name='tenant', field=tenant_field(default=clinic.tenants.current_tenant_id),
+                )],
+            )
+            for name in TENANT_MODELS
+        ],
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['tenant', 'provider', 'start_time', 'end_time'], name='clinic_appo_tenant__564af9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['tenant', 'patient', 'start_time', 'end_time'], name='clinic_appo_tenant__d811d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['tenant', 'start_time', 'id'], name='clinic_appo_tenant__9cf0ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentarchive',
+            index=models.Index(fields=['tenant', 'patient', 'start_time'], name='clinic_appo_tenant__3ed598_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentarchive',
+            index=models.Index(fields=['tenant', 'provider', 'start_time'], name='clinic_appo_tenant__c94291_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['tenant', 'last_name', 'first_name', 'id'], name='clinic_pati_tenant__6fbf1e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientsearchterm',
+            index=models.Index(fields=['tenant', 'kind', 'term', 'patient'], name='clinic_pati_tenant__b1844d_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='patient',
+            constraint=models.UniqueConstraint(fields=('tenant', 'chart_number'), name='unique_tenant_chart_number'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0013_tenants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0014_edit_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxcursor',
+            name='gaps',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
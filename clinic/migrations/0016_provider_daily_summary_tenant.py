@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_provider_tenant(apps, schema_editor):
+    Provider = apps.get_model("clinic", "Provider")
+    ProviderDailySummary = apps.get_model("clinic", "ProviderDailySummary")
+    ProviderDailySummary._base_manager.filter(tenant__isnull=True).update(
+        tenant=models.Subquery(Provider._base_manager.filter(pk=models.OuterRef("provider_id")).values("tenant")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clinic', '0015_outbox_cursor_gaps'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='providerdailysummary',
+            name='clinic_prov_date_7e6d8c_idx',
+        ),
+        # Nullable first, copied from each row's provider, then NOT NULL
+        migrations.AddField(
+            model_name='providerdailysummary',
+            name='tenant',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='clinic.tenant'),
+        ),
+        migrations.RunPython(copy_provider_tenant, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='providerdailysummary',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='clinic.tenant'),
+        ),
+        migrations.AddIndex(
+            model_name='providerdailysummary',
+            index=models.Index(fields=['tenant', 'date', 'provider'], name='clinic_prov_tenant__7fdbbf_idx'),
+        ),
+    ]
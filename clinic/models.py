@@ -1,40 +1,209 @@
-from django.db import models
+from django.db import models, router
+from django.db.models.signals import post_save, pre_save
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
+from .tenants import TenantManager, current_tenant_id
 
-class Patient(models.Model):
-    chart_number = models.CharField(max_length=32, unique=True)
+
+class Tenant(models.Model):
+    """
+    One clinic (site) sharing the database with the others (clinic/tenants.py).
+    Requests are matched to a tenant by `domain` or by a subdomain equal to
+    `slug`; unmatched hosts get CLINIC_DEFAULT_TENANT.
+    """
+
+    slug = models.SlugField(max_length=50, unique=True)
+    name = models.CharField(max_length=100)
+    domain = models.CharField(max_length=253, unique=True, blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class EditConflict(Exception):
+    """The row was changed or deleted since the version an edit started from."""
+
+
+class VersionedModel(models.Model):
+    """
+    Optimistic concurrency. `version` goes up by one with every save, and
+    edit forms post back the version they were rendered from;
+    save_changes() only writes if the row is still at that version.
+    """
+
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            if update_fields is not None:
+                update_fields = {*update_fields, "version"}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    def save_changes(self, fields, expected_version):
+        """
+        Write only `fields` (plus version and updated_at) in one
+        UPDATE ... WHERE id = %s AND version = %s. Raises EditConflict when
+        the row has moved past expected_version (or is gone); nothing is
+        written then. Sends pre_save/post_save like save(update_fields=...),
+        so the model's signal receivers see the change.
+        """
+        cls = type(self)
+        using = router.db_for_write(cls, instance=self)
+        fields = [*fields, "updated_at", "version"]
+        pre_save.send(sender=cls, instance=self, raw=False, using=using, update_fields=frozenset(fields))
+        self.updated_at = timezone.now()
+        values = {name: getattr(self, self._meta.get_field(name).attname) for name in fields if name != "version"}
+        updated = cls._base_manager.using(using).filter(pk=self.pk, version=expected_version).update(
+            version=expected_version + 1, **values,
+        )
+        if not updated:
+            raise EditConflict(f"{cls._meta.verbose_name} {self.pk} changed since version {expected_version}.")
+        self.version = expected_version + 1
+        post_save.send(
+            sender=cls, instance=self, created=False, update_fields=frozenset(fields), raw=False, using=using,
+        )
+
+
+class Patient(VersionedModel):
+    tenant = models.ForeignKey(Tenant, on_delete=models.PROTECT, default=current_tenant_id, related_name="+")
+    chart_number = models.CharField(max_length=32)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
-    date_of_birth = models.DateField()
+    date_of_birth = models.DateField(db_index=True)
     phone = models.CharField(max_length=20)
     email = models.EmailField(blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Scoped to the current tenant; all_tenants for cross-tenant jobs
+    objects = TenantManager()
+    all_tenants = models.Manager()
+
     class Meta:
         ordering = ["last_name", "first_name"]
+        constraints = [
+            # Chart numbers are per clinic; lookups by chart are a tenant-local range
+            models.UniqueConstraint(fields=["tenant", "chart_number"], name="unique_tenant_chart_number"),
+        ]
+        indexes = [
+            # Backs keyset pagination of the patient list
+            models.Index(fields=["tenant", "last_name", "first_name", "id"]),
+            # ?updated_since= change feed of the JSON API (clinic/api.py)
+            models.Index(fields=["updated_at", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.chart_number} - {self.last_name}, {self.first_name}"
 
 
+class PatientSearchTerm(models.Model):
+    """
+    Normalized lookup keys for patient search (see clinic/search.py).
+    Maintained from Patient post_save; rebuild with
+    `manage.py rebuild_patient_search`.
+    """
+
+    NAME = "name"
+    TRIGRAM = "trigram"
+    PHONE = "phone"
+    PHONE_REVERSED = "phone_rev"
+    MATCH = "match"
+    KIND_CHOICES = [
+        (NAME, "Name token"),
+        (TRIGRAM, "Name trigram"),
+        (PHONE, "Phone digits"),
+        (PHONE_REVERSED, "Phone digits reversed"),
+        (MATCH, "Duplicate blocking key"),
+    ]
+
+    # The patient's tenant, so searches never walk other clinics' terms
+    tenant = models.ForeignKey(Tenant, on_delete=models.PROTECT, default=current_tenant_id, related_name="+")
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="search_terms")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    term = models.CharField(max_length=100)
+
+    objects = TenantManager()
+    all_tenants = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Exact and prefix (LIKE 'abc%') lookups are range scans on this index
+            models.Index(fields=["tenant", "kind", "term", "patient"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.term}"
+
+
 class Provider(models.Model):
-    name = models.CharField(max_length=100)
-    specialty = models.CharField(max_length=100, blank=True, null=True)
+    tenant = models.ForeignKey(Tenant, on_delete=models.PROTECT, default=current_tenant_id, related_name="+")
+    name = models.CharField(max_length=100, db_index=True)
+    specialty = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = TenantManager()
+    all_tenants = models.Manager()
+
+    class Meta:
+        indexes = [
+            # ?updated_since= change feed of the JSON API (clinic/api.py)
+            models.Index(fields=["updated_at", "id"]),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Appointment(models.Model):
+class ProviderWorkingHours(models.Model):
+    """
+    One bookable window on a weekday; add several rows for split shifts.
+    Providers without any rows fall back to CLINIC_DEFAULT_WORKING_HOURS.
+    """
+
+    WEEKDAY_CHOICES = [
+        (0, "Monday"),
+        (1, "Tuesday"),
+        (2, "Wednesday"),
+        (3, "Thursday"),
+        (4, "Friday"),
+        (5, "Saturday"),
+        (6, "Sunday"),
+    ]
+
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name="working_hours")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ["provider", "weekday", "start_time"]
+        verbose_name_plural = "provider working hours"
+
+    def __str__(self):
+        return f"{self.provider} {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+    def clean(self):
+        if self.start_time >= self.end_time:
+            raise ValidationError("Start time must be before end time.")
+
+
+class Appointment(VersionedModel):
     STATUS_CHOICES = [
         ("scheduled", "Scheduled"),
         ("canceled", "Canceled"),
     ]
 
+    tenant = models.ForeignKey(Tenant, on_delete=models.PROTECT, default=current_tenant_id, related_name="+")
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="appointments")
     provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name="appointments")
     start_time = models.DateTimeField()
@@ -45,12 +214,26 @@ class Appointment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TenantManager()
+    all_tenants = models.Manager()
+
+    PROVIDER_CONFLICT = "Conflict: provider already has an appointment at this time."
+    PATIENT_CONFLICT = "Conflict: patient already has an appointment at this time."
+
     class Meta:
         ordering = ["start_time"]
         # Optional: enforce provider + time uniqueness at DB level for scheduled only
         indexes = [
-            models.Index(fields=["provider", "start_time", "end_time"]),
-            models.Index(fields=["patient", "start_time", "end_time"]),
+            # Conflict checks, calendars and history: tenant-local range scans
+            models.Index(fields=["tenant", "provider", "start_time", "end_time"]),
+            models.Index(fields=["tenant", "patient", "start_time", "end_time"]),
+            # Backs keyset pagination of the appointment list
+            models.Index(fields=["tenant", "start_time", "id"]),
+            # Cross-tenant jobs by time: archiving, reminders, schedule index loads
+            models.Index(fields=["start_time", "id"]),
+            # Incremental refresh of the in-memory schedule index (clinic/interval_index.py)
+            # and the ?updated_since= feed of the JSON API (InnoDB/SQLite append the pk)
+            models.Index(fields=["updated_at"]),
         ]
 
     def __str__(self):
@@ -62,25 +245,241 @@ class Appointment(models.Model):
             raise ValidationError("Start time must be before end time.")
 
         # Only check conflicts for scheduled appointments
-        if self.status != "scheduled":
+        if self.status != "scheduled" or getattr(self, "_skip_conflict_check", False):
             return
 
+        provider_conflict, patient_conflict = self.find_conflicts()
+
+        if provider_conflict:
+            raise ValidationError(self.PROVIDER_CONFLICT)
+
+        if patient_conflict:
+            raise ValidationError(self.PATIENT_CONFLICT)
+
+    def find_conflicts(self):
+        """
+        Returns (provider_conflict, patient_conflict) using one aggregate
+        query that can use both the (tenant, provider, ...) and (tenant,
+        patient, ...) indexes.
+        """
         # Conflict rule:
         # new_start < existing_end AND new_end > existing_start
-        overlapping_qs = Appointment.objects.filter(
-            status="scheduled",
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time,
-        ).exclude(pk=self.pk)  # exclude self when editing
+        # Always against the primary: a lagging replica would miss fresh bookings
+        counts = (
+            Appointment.all_tenants.using(router.db_for_write(Appointment, instance=self)).filter(
+                models.Q(provider_id=self.provider_id) | models.Q(patient_id=self.patient_id),
+                tenant_id=self.tenant_id,
+                status="scheduled",
+                start_time__lt=self.end_time,
+                end_time__gt=self.start_time,
+            )
+            .exclude(pk=self.pk)  # exclude self when editing
+            .aggregate(
+                provider=models.Count("id", filter=models.Q(provider_id=self.provider_id)),
+                patient=models.Count("id", filter=models.Q(patient_id=self.patient_id)),
+            )
+        )
+        return counts["provider"] > 0, counts["patient"] > 0
 
-        # Conflict for same provider
-        provider_conflict = overlapping_qs.filter(provider=self.provider).exists()
 
-        # Conflict for same patient
-        patient_conflict = overlapping_qs.filter(patient=self.patient).exists()
+class AppointmentArchive(models.Model):
+    """
+    Appointments moved out of the live table by `manage.py archive_appointments`
+    (see clinic/archive.py). Keeps the original id, so a row is in exactly
+    one of the two tables. Conflict checks and calendars never look here;
+    patient history reads both.
+    """
 
-        if provider_conflict:
-            raise ValidationError("Conflict: provider already has an appointment at this time.")
+    id = models.BigIntegerField(primary_key=True)
+    tenant = models.ForeignKey(Tenant, on_delete=models.PROTECT, default=current_tenant_id, related_name="+")
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name="archived_appointments")
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name="archived_appointments")
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    reason = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES)
 
-        if patient_conflict:
-            raise ValidationError("Conflict: patient already has an appointment at this time.")
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TenantManager()
+    all_tenants = models.Manager()
+
+    class Meta:
+        ordering = ["start_time"]
+        indexes = [
+            models.Index(fields=["tenant", "patient", "start_time"]),
+            models.Index(fields=["tenant", "provider", "start_time"]),
+        ]
+
+    def __str__(self):
+        return f"{self.patient} with {self.provider} at {self.start_time} (archived)"
+
+
+class ProviderDailySummary(models.Model):
+    """
+    Per provider and (local) day totals of booked and canceled appointments,
+    kept up to date by signals and bulk paths (see clinic/utilization.py) so
+    utilization reports never scan Appointment. Days without appointments
+    have no row.
+    """
+
+    # The provider's tenant (set from it by clinic/utilization.py, not from the current tenant)
+    tenant = models.ForeignKey(Tenant, on_delete=models.PROTECT, related_name="+")
+    provider = models.ForeignKey(Provider, on_delete=models.CASCADE, related_name="daily_summaries")
+    date = models.DateField()
+    booked_count = models.IntegerField(default=0)
+    booked_minutes = models.IntegerField(default=0)
+    canceled_count = models.IntegerField(default=0)
+    canceled_minutes = models.IntegerField(default=0)
+
+    objects = TenantManager()
+    all_tenants = models.Manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "date"], name="unique_provider_daily_summary"),
+        ]
+        indexes = [
+            # All-provider reports scan a date range of one clinic
+            models.Index(fields=["tenant", "date", "provider"]),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} on {self.date}"
+
+
+class ScheduleVersion(models.Model):
+    """
+    Change counters for the per-process schedule index (clinic/interval_index.py).
+    `version` is bumped after every committed appointment change, and
+    `generation` after changes a process can't replay from updated_at
+    (deletes, regenerated data), which force a full reload.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    generation = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version} g{self.generation}"
+
+
+class ChartNumberSequence(models.Model):
+    """
+    Next free chart number per prefix (clinic/chart_numbers.py). Numbers
+    are handed out in reserved blocks, so a crashed worker leaves a gap
+    rather than a collision.
+    """
+
+    prefix = models.CharField(max_length=10, primary_key=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.prefix}: next {self.next_value}"
+
+
+class OutboxEvent(models.Model):
+    """
+    Append-only log of appointment and patient changes (clinic/outbox.py),
+    written in the same transaction as the change. Consumers read it in id
+    order with `manage.py stream_outbox` instead of polling the tables.
+    """
+
+    APPOINTMENT = "appointment"
+    PATIENT = "patient"
+    ENTITY_CHOICES = [
+        (APPOINTMENT, "Appointment"),
+        (PATIENT, "Patient"),
+    ]
+
+    CREATED = "created"
+    UPDATED = "updated"
+    CANCELED = "canceled"
+    DELETED = "deleted"
+    EVENT_CHOICES = [
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (CANCELED, "Canceled"),
+        (DELETED, "Deleted"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    entity_id = models.BigIntegerField()
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES)
+    # The row as it was after the change
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Pruning by age
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.entity} {self.entity_id} {self.event}"
+
+
+class OutboxCursor(models.Model):
+    """
+    Last OutboxEvent id delivered to a consumer; moved only after delivery
+    succeeded. `gaps` holds [first, last, skipped_at] id ranges at or below
+    it that were missing when the reader moved past them and are polled
+    again until they appear or time out (clinic/outbox.py).
+    """
+
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    gaps = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at #{self.position}"
+
+
+class Reminder(models.Model):
+    """
+    Delivery state of one appointment reminder (clinic/reminders.py).
+    Keyed by the appointment's start time, so an appointment that is moved
+    after its reminder went out gets a new one for the new time.
+    """
+
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (SENDING, "Sending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+        (SKIPPED, "Skipped"),
+    ]
+
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name="reminders")
+    start_time = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a pending reminder may be sent (retry backoff), or when a
+    # dispatcher's claim on a sending one expires
+    next_attempt_at = models.DateTimeField()
+    claimed_by = models.CharField(max_length=32, blank=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["appointment", "start_time"], name="unique_reminder_per_start_time"),
+        ]
+        indexes = [
+            # Dispatcher: reminders ready to (re)send
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"Reminder for appointment {self.appointment_id} at {self.start_time} ({self.status})"
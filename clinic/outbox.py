@@ -0,0 +1,232 @@
+"""
+Outbox (change data capture) for appointments and patients.
+
+Every create, update, cancel and delete of an Appointment or Patient
+inserts an OutboxEvent holding the row as it was after the change
+(signals.py; bulk_booking and patient_import for their bulk inserts). The
+event is written by the same transaction as the change, so it exists
+exactly when the change committed. Archiving moves rows without changing
+them and writes no events; neither does generate_synthetic_data.
+
+`manage.py stream_outbox` hands events to a sink (an NDJSON file or a
+directory of NDJSON batch files) in id order and then moves the
+consumer's OutboxCursor past them. If delivery or the process fails in
+between, the batch is sent again next time: delivery is at least once and
+consumers should skip event ids they have already applied.
+
+Ids are taken at INSERT but become visible at COMMIT, so event 41 can be
+readable while event 40's transaction is still open. A reader stops at a
+gap in the ids until the gap is CLINIC_OUTBOX_SETTLE_SECONDS old. It then
+reads past it, but the missing ids are kept on the cursor and polled
+again with every batch. An event that shows up late is sent then, out of
+id order. A gap is only given up as a rolled back transaction (MySQL
+doesn't reuse those ids) after CLINIC_OUTBOX_GAP_SECONDS.
+"""
+
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import Appointment, OutboxCursor, OutboxEvent, Patient
+from .routers import use_primary
+
+# Model -> (entity, payload fields)
+ENTITIES = {
+    Appointment: (OutboxEvent.APPOINTMENT, [
+        "id", "tenant_id", "patient_id", "provider_id", "start_time", "end_time", "reason", "status", "version",
+        "created_at", "updated_at",
+    ]),
+    Patient: (OutboxEvent.PATIENT, [
+        "id", "tenant_id", "chart_number", "first_name", "last_name", "date_of_birth", "phone", "email", "version",
+        "created_at", "updated_at",
+    ]),
+}
+
+
+class CursorMoved(Exception):
+    """Another process moved the consumer's cursor while a batch was being delivered."""
+
+
+# --------- Writing --------- #
+
+def _event(instance, event):
+    entity, fields = ENTITIES[type(instance)]
+    return OutboxEvent(
+        entity=entity,
+        entity_id=instance.pk,
+        event=event,
+        payload={name: getattr(instance, name) for name in fields},
+    )
+
+
+def record(instance, event):
+    """Insert one event for `instance`; call it inside the transaction that changed it."""
+    _event(instance, event).save()
+
+
+def record_many(instances, event, batch_size=1000):
+    """record() for rows inserted with bulk_create (their ids must be set)."""
+    OutboxEvent.objects.bulk_create([_event(instance, event) for instance in instances], batch_size=batch_size)
+
+
+# --------- Reading --------- #
+
+def ready_events(after_id, limit, settle_seconds=None, skipped=None):
+    """
+    Up to `limit` events after `after_id` in id order, stopping before a
+    gap in the ids that may still be filled by an open transaction. Gaps
+    older than the settle time are read past; pass a list as `skipped` to
+    collect their (first, last) id ranges.
+    """
+    if settle_seconds is None:
+        settle_seconds = getattr(settings, "CLINIC_OUTBOX_SETTLE_SECONDS", 30)
+    settled = timezone.now() - timedelta(seconds=settle_seconds)
+    ready = []
+    expected = after_id + 1
+    for event in OutboxEvent.objects.filter(id__gt=after_id).order_by("id")[:limit]:
+        if event.id != expected:
+            if event.created_at > settled:
+                break
+            if skipped is not None:
+                skipped.append((expected, event.id - 1))
+        ready.append(event)
+        expected = event.id + 1
+    return ready
+
+
+def filled_gaps(gaps, limit):
+    """Up to `limit` events, in id order, that have appeared in the [first, last, ...] ranges of `gaps`."""
+    if not gaps:
+        return []
+    condition = Q()
+    for first, last, *_ in gaps:
+        condition |= Q(id__range=(first, last))
+    return list(OutboxEvent.objects.filter(condition).order_by("id")[:limit])
+
+
+def remaining_gaps(gaps, found_ids, expires=None):
+    """`gaps` less `found_ids`, without the ranges skipped before the `expires` timestamp."""
+    found = sorted(found_ids)
+    remaining = []
+    for first, last, skipped_at in gaps:
+        if expires is not None and skipped_at < expires:
+            continue
+        start = first
+        for pk in found:
+            if start <= pk <= last:
+                if pk > start:
+                    remaining.append([start, pk - 1, skipped_at])
+                start = pk + 1
+        if start <= last:
+            remaining.append([start, last, skipped_at])
+    return remaining
+
+
+def as_message(event):
+    return {
+        "id": event.id,
+        "entity": event.entity,
+        "entity_id": event.entity_id,
+        "event": event.event,
+        "created_at": event.created_at.isoformat(),
+        "data": event.payload,
+    }
+
+
+def deliver(consumer, send, batch_size=500):
+    """
+    Pass the consumer's next batch of messages to send(messages), then move
+    its cursor past them. The batch starts with events that filled earlier
+    gaps. Returns the number of events sent (0 when caught up). If send()
+    raises, the cursor stays where it was.
+    """
+    gap_seconds = getattr(settings, "CLINIC_OUTBOX_GAP_SECONDS", 3600)
+    with use_primary():
+        cursor, _ = OutboxCursor.objects.get_or_create(name=consumer)
+        late = filled_gaps(cursor.gaps, batch_size)
+        skipped = []
+        events = ready_events(cursor.position, batch_size - len(late), skipped=skipped)
+        now = timezone.now().timestamp()
+        # A truncated re-poll may not have seen every fill, so nothing expires this time
+        expires = now - gap_seconds if len(late) < batch_size else None
+        gaps = remaining_gaps(cursor.gaps, [event.id for event in late], expires)
+        gaps += [[first, last, now] for first, last in skipped]
+        batch = late + events
+        if not batch and gaps == cursor.gaps:
+            return 0
+        if batch:
+            send([as_message(event) for event in batch])
+        # Compare-and-set, so two streamers for one consumer can't move it backwards
+        moved = OutboxCursor.objects.filter(
+            name=consumer, position=cursor.position, updated_at=cursor.updated_at,
+        ).update(position=events[-1].id if events else cursor.position, gaps=gaps, updated_at=timezone.now())
+    if not moved:
+        raise CursorMoved(f"Cursor {consumer!r} was moved by another process.")
+    return len(batch)
+
+
+def prune(retention_days=None, batch_size=5000):
+    """
+    Delete events older than CLINIC_OUTBOX_RETENTION_DAYS that every
+    consumer has received. Returns the number deleted.
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, "CLINIC_OUTBOX_RETENTION_DAYS", 30)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted = 0
+    with use_primary():
+        old = OutboxEvent.objects.filter(created_at__lt=cutoff)
+        floor = OutboxCursor.objects.aggregate(floor=Min("position"))["floor"]
+        if floor is not None:
+            old = old.filter(id__lte=floor)
+        while True:
+            ids = list(old.order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
+
+
+# --------- Sinks --------- #
+
+def _ndjson(messages):
+    return "".join(json.dumps(message, separators=(",", ":")) + "\n" for message in messages)
+
+
+class NdjsonFileSink:
+    """Appends messages to an NDJSON file (synced to disk per batch) or a stream such as stdout."""
+
+    def __init__(self, stream, sync=True):
+        self.stream = stream
+        self.sync = sync
+
+    def __call__(self, messages):
+        self.stream.write(_ndjson(messages))
+        self.stream.flush()
+        if self.sync:
+            os.fsync(self.stream.fileno())
+
+
+class NdjsonDirectorySink:
+    """
+    Writes each batch to its own file, <first id>-<last id>.ndjson, renamed
+    into place once complete: a queue stand-in whose readers take files in
+    name order and delete them when done.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __call__(self, messages):
+        name = f"{messages[0]['id']:020d}-{messages[-1]['id']:020d}.ndjson"
+        partial = self.directory / f".{name}.partial"
+        with open(partial, "w", encoding="utf-8") as f:
+            f.write(_ndjson(messages))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, self.directory / name)
@@ -0,0 +1,146 @@
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values, direction="next"):
+    payload = {"k": [None if v is None else str(v) for v in values], "d": direction}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Returns (values, direction) or (None, "next") for a missing/garbled cursor,
+    so a bad query string just falls back to the first page.
+    """
+    if not cursor:
+        return None, "next"
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["k"]
+        direction = payload.get("d", "next")
+    except (ValueError, KeyError, TypeError):
+        return None, "next"
+    if not isinstance(values, list) or direction not in ("next", "prev"):
+        return None, "next"
+    return values, direction
+
+
+def _keyset_filter(keys, values, op):
+    # Row-value comparison (k1, k2, k3) > (v1, v2, v3) spelled out as
+    # k1 > v1 OR (k1 = v1 AND k2 > v2) OR (k1 = v1 AND k2 = v2 AND k3 > v3)
+    # so it works on every backend and can use the composite index.
+    condition = Q()
+    for i, key in enumerate(keys):
+        clause = Q(**{f"{key}__{op}": values[i]})
+        for prev_key, prev_value in zip(keys[:i], values[:i]):
+            clause &= Q(**{prev_key: prev_value})
+        condition |= clause
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, items, keys, has_next, has_previous):
+        self.items = items
+        self.keys = keys
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def _cursor_for(self, obj, direction):
+        # Rows are model instances, or dicts when the queryset uses .values()
+        if isinstance(obj, dict):
+            return encode_cursor([obj[key] for key in self.keys], direction)
+        return encode_cursor([getattr(obj, key) for key in self.keys], direction)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        return self._cursor_for(self.items[-1], "next")
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self.items:
+            return None
+        return self._cursor_for(self.items[0], "prev")
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _typed_values(model, keys, values):
+    """
+    Cursor values (strings) converted by their model fields, or None if one
+    doesn't convert, so a tampered cursor falls back to the first page
+    instead of failing in the query.
+    """
+    typed = []
+    for key, value in zip(keys, values):
+        try:
+            field = model._meta.get_field(key)
+        except FieldDoesNotExist:
+            typed.append(value)
+            continue
+        try:
+            typed.append(field.to_python(value))
+        except (ValidationError, TypeError, ValueError):
+            return None
+    return typed
+
+
+def _keyset_query(queryset, keys, cursor):
+    values, direction = decode_cursor(cursor)
+    if values is not None and len(values) == len(keys):
+        values = _typed_values(queryset.model, keys, values)
+    else:
+        values = None
+    if values is None:
+        direction = "next"
+
+    if values is None:
+        qs = queryset.order_by(*keys)
+    elif direction == "next":
+        qs = queryset.filter(_keyset_filter(keys, values, "gt")).order_by(*keys)
+    else:
+        qs = queryset.filter(_keyset_filter(keys, values, "lt")).order_by(*[f"-{k}" for k in keys])
+    return qs, values is not None, direction
+
+
+def _keyset_page(rows, keys, page_size, has_cursor, direction):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if direction == "prev" and has_cursor:
+        rows.reverse()
+        return KeysetPage(rows, keys, has_next=True, has_previous=has_more)
+
+    return KeysetPage(rows, keys, has_next=has_more, has_previous=has_cursor)
+
+
+def keyset_paginate(queryset, keys, cursor=None, page_size=50):
+    """
+    Cursor (keyset) pagination over ascending `keys`. The last key must be
+    unique (normally "id") so ties on the leading keys are broken
+    deterministically. Each page costs one indexed range scan of
+    page_size + 1 rows no matter how deep the client has paged.
+    """
+    qs, has_cursor, direction = _keyset_query(queryset, keys, cursor)
+    rows = list(qs[: page_size + 1])
+    return _keyset_page(rows, keys, page_size, has_cursor, direction)
+
+
+async def akeyset_paginate(queryset, keys, cursor=None, page_size=50):
+    """keyset_paginate() for async views, using the async ORM iterator."""
+    qs, has_cursor, direction = _keyset_query(queryset, keys, cursor)
+    rows = [obj async for obj in qs[: page_size + 1]]
+    return _keyset_page(rows, keys, page_size, has_cursor, direction)
@@ -0,0 +1,215 @@
+"""
+Streaming bulk patient import.
+
+Rows (CSV, JSON or NDJSON; columns first_name, last_name, date_of_birth,
+phone, email) are read lazily and handled in chunks, so a file with
+millions of rows never has to fit in memory. For each chunk:
+
+1. parse and validate every row
+2. compute each row's duplicate blocking keys (search.match_keys) and look
+   up all of the chunk's keys with equality lookups on the
+   PatientSearchTerm (kind, term) index. A row sharing a key with an
+   existing patient, or with an earlier row of the chunk, is a probable
+   duplicate. Rows of earlier chunks are already indexed (unless it is a
+   dry run), so duplicates across the whole file are found the same way,
+   with no pairwise comparisons.
+3. reserve a block of chart numbers for the rows to insert
+   (clinic/chart_numbers.py)
+4. bulk_create the patients, their search terms and their outbox events
+   (clinic/outbox.py) in one transaction
+
+Each row gets an ImportResult. Probable duplicates are skipped unless
+on_duplicate="import", in which case they are inserted and flagged.
+Patients that existed before the `match` search terms were introduced
+need `manage.py rebuild_patient_search` once to be found as duplicates.
+"""
+
+from dataclasses import dataclass
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .bulk_booking import chunked
+from .caching import get_default_tenant
+from .chart_numbers import format_chart_number, prefix, reserve
+from .models import OutboxEvent, Patient, PatientSearchTerm
+from .outbox import record_many as record_events
+from .routers import use_primary
+from .search import insert_terms, match_keys
+from .tenants import get_current_tenant, use_tenant
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+
+# Terms per IN (...) lookup; keeps SQLite under its bound-parameter limit
+LOOKUP_BATCH = 1000
+
+
+@dataclass
+class ImportResult:
+    row: int
+    status: str
+    message: str = ""
+    patient_id: int = None
+    chart_number: str = ""
+    duplicate_of: str = ""
+
+
+# --------- Input parsing --------- #
+
+def _text(raw, field, max_length):
+    value = raw.get(field)
+    value = "" if value is None else str(value).strip()
+    if len(value) > max_length:
+        raise ValidationError(f"{field} is longer than {max_length} characters.")
+    return value
+
+
+def _parse(raw):
+    """Returns (Patient, None) or (None, error message)."""
+    try:
+        first_name = _text(raw, "first_name", 100)
+        last_name = _text(raw, "last_name", 100)
+        phone = _text(raw, "phone", 20)
+        email = _text(raw, "email", 254) or None
+    except ValidationError as exc:
+        return None, exc.messages[0]
+    if not (first_name and last_name and phone):
+        return None, "first_name, last_name and phone are required."
+
+    date_of_birth = raw.get("date_of_birth")
+    if not isinstance(date_of_birth, date):
+        try:
+            date_of_birth = parse_date(str(date_of_birth or "").strip())
+        except ValueError:
+            date_of_birth = None
+    if date_of_birth is None:
+        return None, "Invalid or missing date_of_birth (YYYY-MM-DD)."
+    if date_of_birth > timezone.localdate():
+        return None, "date_of_birth is in the future."
+
+    if email:
+        try:
+            validate_email(email)
+        except ValidationError:
+            return None, f"Invalid email {email!r}."
+
+    return Patient(
+        first_name=first_name,
+        last_name=last_name,
+        date_of_birth=date_of_birth,
+        phone=phone,
+        email=email,
+    ), None
+
+
+# --------- Duplicates --------- #
+
+def existing_matches(keys):
+    """{blocking key: patient_id} for keys already used by a stored patient."""
+    found = {}
+    for batch in chunked(sorted(keys), LOOKUP_BATCH):
+        rows = PatientSearchTerm.objects.filter(kind=PatientSearchTerm.MATCH, term__in=batch).values_list(
+            "term", "patient_id"
+        )
+        for term, patient_id in rows:
+            found.setdefault(term, patient_id)
+    return found
+
+
+def _find_duplicates(parsed, start_index=0):
+    """{index: description of the first match} for the probable duplicates in `parsed`."""
+    keys_by_row = {
+        i: match_keys(p.first_name, p.last_name, p.date_of_birth, p.phone)
+        for i, p in parsed
+    }
+    existing = existing_matches(set().union(*keys_by_row.values()))
+    seen = {}
+    duplicates = {}
+    for i, keys in keys_by_row.items():
+        for key in sorted(keys):
+            if key in existing:
+                duplicates[i] = f"patient {existing[key]} ({key})"
+                break
+            if key in seen:
+                duplicates[i] = f"row {start_index + seen[key]} ({key})"
+                break
+        for key in keys:
+            seen.setdefault(key, i)
+    return duplicates
+
+
+# --------- Import --------- #
+
+def _insert(patients, batch_size):
+    """Insert patients (chart numbers set) plus their search terms; returns them with ids."""
+    Patient.objects.bulk_create(patients, batch_size=batch_size)
+    if not connection.features.can_return_rows_from_bulk_insert:
+        # MySQL doesn't return ids from a multi-row INSERT; read them back by chart number
+        ids = dict(
+            Patient.objects.filter(chart_number__in=[p.chart_number for p in patients])
+            .values_list("chart_number", "id")
+        )
+        for patient in patients:
+            patient.pk = ids[patient.chart_number]
+    # bulk_create skips post_save, so index the new patients for search and
+    # write their outbox events here
+    insert_terms(patients)
+    record_events(patients, OutboxEvent.CREATED, batch_size=batch_size)
+    return patients
+
+
+def import_patients(rows, start_index=0, dry_run=False, on_duplicate="skip", batch_size=1000):
+    """
+    Import one chunk of raw rows. Returns an ImportResult per row, in
+    order, with row numbers starting at `start_index`. Patients are created
+    in, and checked for duplicates against, the current tenant (default:
+    CLINIC_DEFAULT_TENANT).
+    """
+    with use_tenant(get_current_tenant() or get_default_tenant()):
+        return _import_patients(rows, start_index, dry_run, on_duplicate, batch_size)
+
+
+def _import_patients(rows, start_index, dry_run, on_duplicate, batch_size):
+    rows = list(rows)
+    results = [None] * len(rows)
+    parsed = []
+    for i, raw in enumerate(rows):
+        patient, error = _parse(raw)
+        if error:
+            results[i] = ImportResult(start_index + i, INVALID, error)
+        else:
+            parsed.append((i, patient))
+
+    with use_primary():
+        duplicates = _find_duplicates(parsed, start_index)
+        to_insert = [
+            (i, patient) for i, patient in parsed
+            if i not in duplicates or on_duplicate == "import"
+        ]
+
+        if to_insert and not dry_run:
+            chart_prefix = prefix()
+            first = reserve(len(to_insert), chart_prefix)
+            for offset, (_, patient) in enumerate(to_insert):
+                patient.chart_number = format_chart_number(first + offset, chart_prefix)
+            with transaction.atomic():
+                _insert([patient for _, patient in to_insert], batch_size)
+
+    inserted = {i for i, _ in to_insert}
+    for i, patient in parsed:
+        duplicate_of = duplicates.get(i, "")
+        if i in inserted:
+            status, message = CREATED, "Probable duplicate, imported anyway." if duplicate_of else ""
+        else:
+            status, message = DUPLICATE, "Probable duplicate, skipped."
+        results[i] = ImportResult(
+            start_index + i, status, message,
+            patient_id=patient.pk, chart_number=patient.chart_number, duplicate_of=duplicate_of,
+        )
+    return results
@@ -0,0 +1,345 @@
+"""
+Appointment reminders.
+
+`manage.py send_reminders` runs a tick every few seconds. Each tick:
+
+1. schedule_due(): one range query on the Appointment (start_time, id)
+   index finds scheduled appointments starting within
+   CLINIC_REMINDER_LEAD_HOURS that have no Reminder for their start time
+   yet (a NOT EXISTS on the Reminder unique key). It inserts a pending
+   Reminder for each. The unique key (appointment, start_time) makes a
+   second insert a no-op, so the query can run on a lagging replica.
+2. claim(): a batch of due reminders is marked "sending" with a claim
+   token and a lease of CLINIC_REMINDER_LEASE_SECONDS, so dispatchers
+   running side by side never share a batch. A batch left "sending" by
+   a crashed dispatcher is claimed again once its lease runs out.
+3. dispatch(): the batch is sent through the transport on a pool of
+   CLINIC_REMINDER_WORKERS threads. A shared token bucket caps the rate
+   at CLINIC_REMINDER_RATE_PER_SECOND. Failed sends are retried with
+   exponential backoff, up to CLINIC_REMINDER_MAX_ATTEMPTS. Worker threads
+   never touch the database; the main thread records the batch's outcome
+   in one bulk_update. Before sending and when recording, only reminders
+   still claimed by this dispatcher's token are kept. A batch that
+   outlived its lease and was claimed again belongs to the new claimant.
+
+A reminder is sent once. The exceptions are a dispatcher that crashes
+after sending but before recording the batch, and one whose lease ran
+out while it was sending. Either batch is sent again after the lease. Booking paths are untouched: no signal or trigger runs
+on save.
+
+Transports take a Message and raise on failure (Undeliverable when
+retrying can't help, e.g. no email address). CLINIC_REMINDER_TRANSPORT
+picks the class: EmailTransport (Django's email backend; point EMAIL_HOST
+and EMAIL_PORT at a local SMTP debug server to try it) or FileTransport
+(NDJSON lines, for tests and development).
+"""
+
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Appointment, Reminder
+from .routers import use_primary, use_replica
+
+SUBJECT = "Appointment reminder"
+BODY = (
+    "Dear {first_name} {last_name},\n\n"
+    "This is a reminder of your appointment with {provider} on {start:%A, %B %d at %H:%M}.\n"
+    "If you can't make it, please call us to reschedule.\n"
+)
+
+
+def _setting(name, default):
+    return getattr(settings, f"CLINIC_REMINDER_{name}", default)
+
+
+@dataclass
+class Message:
+    reminder_id: int
+    email: str
+    phone: str
+    subject: str
+    body: str
+
+
+class Undeliverable(Exception):
+    """The reminder can't be delivered by this transport; don't retry."""
+
+
+# --------- Transports --------- #
+
+class EmailTransport:
+    """
+    Sends reminders with Django's email backend (EMAIL_* settings). Each
+    worker thread opens one connection and keeps it for its later sends.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = get_connection()
+            connection.open()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def send(self, message):
+        if not message.email:
+            raise Undeliverable("Patient has no email address.")
+        connection = self._connection()
+        try:
+            EmailMessage(message.subject, message.body, to=[message.email], connection=connection).send()
+        except Exception:
+            # The connection may be broken; the retry opens a new one
+            self._local.connection = None
+            raise
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+
+class FileTransport:
+    """Appends each reminder as an NDJSON line to `path`."""
+
+    def __init__(self, path=None):
+        self.path = path or _setting("FILE", "reminders.ndjson")
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        line = json.dumps(asdict(message)) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def close(self):
+        pass
+
+
+def get_transport():
+    return import_string(_setting("TRANSPORT", "clinic.reminders.EmailTransport"))()
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads: `rate` sends per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Take the token now (possibly going negative) and wait outside the lock
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+# --------- Scheduling --------- #
+
+def schedule_due(now=None, limit=5000):
+    """
+    Create pending reminders for appointments now within the lead time.
+    Returns how many appointments were found due. A concurrent tick may
+    have inserted some of those reminders first; ignore_conflicts skips
+    them without saying which.
+    """
+    now = now or timezone.now()
+    lead = timedelta(hours=_setting("LEAD_HOURS", 24))
+    with use_replica():
+        found = list(
+            Appointment.all_tenants.filter(status="scheduled", start_time__gt=now, start_time__lte=now + lead)
+            .exclude(Exists(Reminder.objects.filter(appointment=OuterRef("pk"), start_time=OuterRef("start_time"))))
+            .order_by("start_time", "id")
+            .values_list("id", "start_time")[:limit]
+        )
+    if not found:
+        return 0
+    Reminder.objects.bulk_create(
+        [Reminder(appointment_id=pk, start_time=start_time, next_attempt_at=now) for pk, start_time in found],
+        ignore_conflicts=True,
+    )
+    return len(found)
+
+
+def claim(now=None, batch_size=None):
+    """Mark up to batch_size due reminders as sending for this caller; returns them."""
+    now = now or timezone.now()
+    batch_size = batch_size or _setting("BATCH_SIZE", 200)
+    token = uuid.uuid4().hex
+    ready = Q(status=Reminder.PENDING) | Q(status=Reminder.SENDING)
+    with use_primary():
+        ids = list(
+            Reminder.objects.filter(ready, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        lease = timedelta(seconds=_setting("LEASE_SECONDS", 300))
+        # Conditional on the row still being ready: a concurrent claim of the same ids gets none of them
+        Reminder.objects.filter(ready, id__in=ids, next_attempt_at__lte=now).update(
+            status=Reminder.SENDING, claimed_by=token, next_attempt_at=now + lease,
+        )
+        return list(
+            Reminder.objects.filter(claimed_by=token, status=Reminder.SENDING)
+            .select_related("appointment__patient", "appointment__provider")
+        )
+
+
+# --------- Sending --------- #
+
+def build_message(reminder):
+    appointment = reminder.appointment
+    patient = appointment.patient
+    return Message(
+        reminder_id=reminder.pk,
+        email=patient.email or "",
+        phone=patient.phone,
+        subject=SUBJECT,
+        body=BODY.format(
+            first_name=patient.first_name,
+            last_name=patient.last_name,
+            provider=appointment.provider.name,
+            start=timezone.localtime(appointment.start_time),
+        ),
+    )
+
+
+def _send(transport, limiter, message):
+    """Runs on a worker thread. Returns None when sent, else (error, retryable)."""
+    limiter.acquire()
+    try:
+        transport.send(message)
+    except Undeliverable as exc:
+        return str(exc), False
+    except Exception as exc:
+        return f"{type(exc).__name__}: {exc}", True
+    return None
+
+
+def _record(reminder, outcome, now):
+    reminder.attempts += 1
+    reminder.claimed_by = ""
+    if outcome is None:
+        reminder.status = Reminder.SENT
+        reminder.sent_at = now
+        reminder.last_error = ""
+        return
+    error, retryable = outcome
+    reminder.last_error = error[:255]
+    if retryable and reminder.attempts < _setting("MAX_ATTEMPTS", 5):
+        reminder.status = Reminder.PENDING
+        reminder.next_attempt_at = now + timedelta(
+            seconds=_setting("RETRY_SECONDS", 60) * 2 ** (reminder.attempts - 1)
+        )
+    else:
+        reminder.status = Reminder.FAILED if retryable else Reminder.SKIPPED
+
+
+def _still_claimed(reminders, token):
+    """The reminders whose claim is still `token`; call in a transaction (their rows stay locked)."""
+    held = set(
+        Reminder.objects.select_for_update()
+        .filter(id__in=[reminder.pk for reminder in reminders], claimed_by=token, status=Reminder.SENDING)
+        .values_list("id", flat=True)
+    )
+    return [reminder for reminder in reminders if reminder.pk in held]
+
+
+def dispatch(reminders, transport, pool, limiter):
+    """
+    Send a claimed batch on the pool and record the outcomes. Returns
+    {status: count}; reminders another dispatcher claimed after this
+    batch's lease ran out are counted as "lease_lost" and left to it.
+    """
+    if not reminders:
+        return {}
+    token = reminders[0].claimed_by
+    with use_primary(), transaction.atomic():
+        claimed = _still_claimed(reminders, token)
+    lost = len(reminders) - len(claimed)
+    reminders = claimed
+
+    now = timezone.now()
+    to_send = []
+    for reminder in reminders:
+        appointment = reminder.appointment
+        if appointment.status != "scheduled" or appointment.start_time != reminder.start_time:
+            reminder.status, reminder.claimed_by = Reminder.SKIPPED, ""
+            reminder.last_error = "Appointment was canceled or moved."
+        elif appointment.start_time <= now:
+            reminder.status, reminder.claimed_by = Reminder.SKIPPED, ""
+            reminder.last_error = "Appointment already started."
+        else:
+            to_send.append(reminder)
+
+    outcomes = pool.map(lambda reminder: _send(transport, limiter, build_message(reminder)), to_send)
+    finished = timezone.now()
+    for reminder, outcome in zip(to_send, outcomes):
+        _record(reminder, outcome, finished)
+
+    with use_primary(), transaction.atomic():
+        # Sending may have outlived the lease too
+        claimed = _still_claimed(reminders, token)
+        Reminder.objects.bulk_update(
+            claimed, ["status", "attempts", "next_attempt_at", "claimed_by", "sent_at", "last_error"],
+        )
+    lost += len(reminders) - len(claimed)
+    counts = {"lease_lost": lost} if lost else {}
+    for reminder in claimed:
+        counts[reminder.status] = counts.get(reminder.status, 0) + 1
+    return counts
+
+
+class Dispatcher:
+    """Holds the transport, worker pool and rate limiter across ticks."""
+
+    def __init__(self, transport=None, workers=None, rate=None):
+        self.transport = transport or get_transport()
+        self.pool = ThreadPoolExecutor(
+            max_workers=workers or _setting("WORKERS", 8), thread_name_prefix="reminder",
+        )
+        self.limiter = RateLimiter(_setting("RATE_PER_SECOND", 20) if rate is None else rate)
+
+    def tick(self, now=None):
+        """Schedule newly due reminders and send every claimable batch. Returns {status: count}."""
+        schedule_due(now)
+        totals = {}
+        while True:
+            batch = claim(now)
+            if not batch:
+                return totals
+            for status, count in dispatch(batch, self.transport, self.pool, self.limiter).items():
+                totals[status] = totals.get(status, 0) + count
+
+    def close(self):
+        self.pool.shutdown()
+        self.transport.close()
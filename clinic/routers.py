@@ -0,0 +1,102 @@
+"""
+Primary/replica database routing.
+
+Everything reads from and writes to "default" (the primary) unless a view
+opts in with @read_replica, in which case reads of clinic models inside
+that view go to one of settings.CLINIC_READ_REPLICAS. Sessions, auth and
+other contrib models always stay on the primary.
+
+Replicas lag, so:
+- a successful POST (or other unsafe request) sets a short-lived cookie
+  (clinic.middleware.ReplicaPinningMiddleware) and @read_replica views
+  serve that browser from the primary until it expires, so the list you
+  are redirected to after booking shows the booking;
+- code that must see committed data (the booking conflict check, cache
+  fills) wraps itself in use_primary().
+"""
+
+import contextvars
+import functools
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = "clinic_primary"
+
+# Alias reads should go to in the current request/task, or None for the primary
+_read_alias = contextvars.ContextVar("clinic_read_alias", default=None)
+
+
+def replicas():
+    return getattr(settings, "CLINIC_READ_REPLICAS", [])
+
+
+@contextmanager
+def use_replica(alias=None):
+    """Route clinic reads to `alias` (default: a random replica) inside the block."""
+    available = replicas()
+    token = _read_alias.set(alias or (random.choice(available) if available else None))
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def use_primary():
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_replica(view):
+    """View decorator: serve the view's reads from a replica unless the client is pinned."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or is_pinned(request):
+                return await view(request, *args, **kwargs)
+            with use_replica():
+                return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or is_pinned(request):
+                return view(request, *args, **kwargs)
+            with use_replica():
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == "clinic":
+            return _read_alias.get() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Instances read from a replica remember it in _state.db; never write there
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db not in replicas()
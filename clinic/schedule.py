@@ -0,0 +1,129 @@
+"""
+Provider schedules grouped into per-day buckets.
+
+A bucket is the list of scheduled appointments for one provider on one
+(local) day, stored as plain dicts so it can live in the cache. Calendar
+views ask for a provider x date grid; buckets missing from the cache are
+filled with a single overlap query on (provider, start_time, end_time)
+covering the missing range, then written back to the "schedule" namespace
+of clinic.caching. Appointment signals (see clinic/signals.py) drop just
+the buckets a save/cancel/delete touched.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .caching import schedule_cache
+from .models import Appointment
+from .routers import use_primary
+
+BUCKET_FIELDS = [
+    "id",
+    "provider_id",
+    "start_time",
+    "end_time",
+    "reason",
+    "patient_id",
+    "patient__first_name",
+    "patient__last_name",
+    "patient__chart_number",
+]
+
+
+def day_bounds(start_date, end_date=None):
+    """Aware [start, end) datetimes covering start_date..end_date in the current timezone."""
+    end_date = end_date or start_date
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min), tz),
+        timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz),
+    )
+
+
+def date_range(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def bucket_key(provider_id, day):
+    return (provider_id, day.isoformat())
+
+
+def _bucket_entry(row):
+    return {
+        "id": row["id"],
+        "start_time": row["start_time"],
+        "end_time": row["end_time"],
+        "reason": row["reason"],
+        "patient": {
+            "id": row["patient_id"],
+            "first_name": row["patient__first_name"],
+            "last_name": row["patient__last_name"],
+            "chart_number": row["patient__chart_number"],
+        },
+    }
+
+
+def _fetch_buckets(provider_ids, start_date, end_date):
+    """One indexed range query for every provider over start_date..end_date."""
+    range_start, range_end = day_bounds(start_date, end_date)
+    buckets = {(pk, day): [] for pk in provider_ids for day in date_range(start_date, end_date)}
+    rows = (
+        Appointment.objects.filter(
+            provider_id__in=provider_ids,
+            status="scheduled",
+            start_time__lt=range_end,
+            end_time__gt=range_start,
+        )
+        .order_by("provider_id", "start_time")
+        .values(*BUCKET_FIELDS)
+    )
+    for row in rows:
+        day = timezone.localtime(row["start_time"]).date()
+        bucket = buckets.get((row["provider_id"], day))
+        # Appointments that started the evening before the range are skipped
+        if bucket is not None:
+            bucket.append(_bucket_entry(row))
+    return buckets
+
+
+def get_schedule(provider_ids, start_date, end_date):
+    """
+    {(provider_id, date): [appointment dict, ...]} for every provider/day in
+    the range, served from cached buckets where possible.
+    """
+    provider_ids = list(provider_ids)
+    keys = {
+        bucket_key(pk, day): (pk, day)
+        for pk in provider_ids
+        for day in date_range(start_date, end_date)
+    }
+    cached = schedule_cache.get_many(keys.keys())
+    schedule = {keys[key]: value for key, value in cached.items()}
+
+    missing = [slot for key, slot in keys.items() if key not in cached]
+    if missing:
+        # Filled from the primary, like every other cache fill (see VersionedCache.get_or_set)
+        with use_primary():
+            fetched = _fetch_buckets(
+                sorted({pk for pk, _ in missing}),
+                min(day for _, day in missing),
+                max(day for _, day in missing),
+            )
+        for slot in missing:
+            schedule[slot] = fetched[slot]
+        schedule_cache.set_many({bucket_key(*slot): fetched[slot] for slot in missing})
+
+    return schedule
+
+
+def invalidate_buckets(slots):
+    """Drop cached buckets for an iterable of (provider_id, start_time) pairs."""
+    schedule_cache.delete_many({
+        bucket_key(provider_id, timezone.localtime(start_time).date())
+        for provider_id, start_time in slots
+        if provider_id and start_time
+    })
@@ -0,0 +1,332 @@
+"""
+Indexed patient search.
+
+Instead of leading-wildcard LIKE scans over Patient, every patient gets a
+handful of PatientSearchTerm rows:
+
+- name:      normalized first/last name tokens ("o'brien" -> "o", "brien")
+- trigram:   padded 3-grams of each name token, for typo tolerance
+- phone:     digits-only phone number, for prefix matches ("555...")
+- phone_rev: the same digits reversed, so "last 4 digits" is also a prefix match
+- match:     duplicate blocking keys (name + DOB, DOB + phone, name + phone),
+             looked up by equality when importing patients (clinic/patient_import.py)
+
+All lookups are equality or prefix matches on the (kind, term, patient)
+index, and every step is capped, so the cost depends on the size of the
+result rather than the size of the Patient table. Terms are stored
+lowercase, so prefix lookups use istartswith: on MySQL that is a plain
+LIKE 'abc%' range scan, whereas startswith becomes LIKE BINARY, which
+can't use the index.
+"""
+
+import difflib
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .models import Patient, PatientSearchTerm, Tenant
+from .tenants import get_current_tenant, use_tenant
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NON_DIGIT_RE = re.compile(r"\D")
+
+# Per-query-token cap on candidate rows pulled from the index
+CANDIDATE_LIMIT = 1000
+
+# Minimum similarity for a fuzzy (trigram) match to count
+FUZZY_THRESHOLD = 0.6
+
+MIN_PHONE_DIGITS = 3
+
+
+def normalize_tokens(value):
+    """Lowercase, strip accents and split on anything that isn't a letter/digit."""
+    if not value:
+        return []
+    decomposed = unicodedata.normalize("NFKD", value)
+    ascii_only = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(ascii_only.lower())
+
+
+def trigrams(token):
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def phone_digits(value):
+    return _NON_DIGIT_RE.sub("", value or "")
+
+
+def match_keys(first_name, last_name, date_of_birth, phone):
+    """
+    Blocking keys for duplicate detection. Two patients sharing any key are
+    probable duplicates: same last name, first initial and DOB; same DOB
+    and phone; or same last name and phone.
+    """
+    last = "".join(normalize_tokens(last_name))[:40]
+    first = "".join(normalize_tokens(first_name))
+    digits = phone_digits(phone)[-10:]
+    keys = set()
+    if last and date_of_birth:
+        keys.add(f"nd:{last}|{first[:1]}|{date_of_birth.isoformat()}")
+    if len(digits) >= 7:
+        if date_of_birth:
+            keys.add(f"dp:{date_of_birth.isoformat()}|{digits}")
+        if last:
+            keys.add(f"np:{last}|{digits}")
+    return keys
+
+
+def term_pairs(first_name, last_name, phone, date_of_birth=None):
+    """(kind, term) pairs to index for one patient."""
+    terms = set()
+    for token in set(normalize_tokens(first_name) + normalize_tokens(last_name)):
+        terms.add((PatientSearchTerm.NAME, token[:100]))
+        for gram in trigrams(token):
+            terms.add((PatientSearchTerm.TRIGRAM, gram))
+
+    digits = phone_digits(phone)
+    if digits:
+        terms.add((PatientSearchTerm.PHONE, digits))
+        terms.add((PatientSearchTerm.PHONE_REVERSED, digits[::-1]))
+
+    for key in match_keys(first_name, last_name, date_of_birth, phone):
+        terms.add((PatientSearchTerm.MATCH, key))
+    return terms
+
+
+def build_terms(patient):
+    return [
+        PatientSearchTerm(tenant_id=patient.tenant_id, patient_id=patient.pk, kind=kind, term=term)
+        for kind, term in term_pairs(patient.first_name, patient.last_name, patient.phone, patient.date_of_birth)
+    ]
+
+
+def insert_terms(patients):
+    """
+    Index newly inserted patients with one executemany() INSERT. For bulk
+    loads, where building and compiling a PatientSearchTerm instance per
+    term (~20 per patient) costs more than the insert itself.
+    """
+    meta = PatientSearchTerm._meta
+    alias = router.db_for_write(PatientSearchTerm)
+    quote = connections[alias].ops.quote_name
+    columns = ", ".join(quote(meta.get_field(name).column) for name in ("tenant", "patient", "kind", "term"))
+    sql = f"INSERT INTO {quote(meta.db_table)} ({columns}) VALUES (%s, %s, %s, %s)"
+    rows = [
+        (patient.tenant_id, patient.pk, kind, term)
+        for patient in patients
+        for kind, term in term_pairs(patient.first_name, patient.last_name, patient.phone, patient.date_of_birth)
+    ]
+    with connections[alias].cursor() as cursor:
+        cursor.executemany(sql, rows)
+    return len(rows)
+
+
+def index_patient(patient):
+    with transaction.atomic():
+        PatientSearchTerm.objects.filter(patient_id=patient.pk).delete()
+        PatientSearchTerm.objects.bulk_create(build_terms(patient))
+
+
+def rebuild_index(batch_size=2000, stdout=None):
+    """
+    Drop and rebuild every PatientSearchTerm in batches, one tenant at a
+    time (only the current one, if set) so the deletes use the
+    (tenant, ...) index. Returns patients indexed.
+    """
+    current = get_current_tenant()
+    count = 0
+    for tenant in [current] if current else Tenant.objects.order_by("id"):
+        with use_tenant(tenant):
+            PatientSearchTerm.objects.all().delete()
+            patients = Patient.objects.only(
+                "id", "tenant_id", "first_name", "last_name", "phone", "date_of_birth",
+            ).order_by("id")
+            pending = []
+            for patient in patients.iterator(chunk_size=batch_size):
+                pending.extend(build_terms(patient))
+                count += 1
+                if count % batch_size == 0:
+                    PatientSearchTerm.objects.bulk_create(pending, batch_size=batch_size)
+                    pending = []
+                    if stdout:
+                        stdout.write(f"Indexed {count} patients")
+            if pending:
+                PatientSearchTerm.objects.bulk_create(pending, batch_size=batch_size)
+    return count
+
+
+# --------- Lookup --------- #
+
+def prefix_search(query, limit=20):
+    """
+    Cheap as-you-type lookup: every query token must be a prefix of one of
+    the patient's name tokens, or the query is a chart number prefix.
+    No trigram/fuzzy pass, so it is a couple of index range scans.
+    """
+    tokens = normalize_tokens(query)
+    if not tokens:
+        return []
+
+    by_chart = list(
+        Patient.objects.filter(chart_number__istartswith=query.strip())
+        .order_by("chart_number")[:limit]
+    )
+    if by_chart:
+        return by_chart
+
+    candidate_ids = _name_prefix_ids(tokens)
+    if not candidate_ids:
+        return []
+    return list(
+        Patient.objects.filter(pk__in=candidate_ids).order_by("last_name", "first_name", "id")[:limit]
+    )
+
+
+def matching_patient_ids(query, limit=CANDIDATE_LIMIT):
+    """
+    Ids (at most `limit`) of patients whose chart number starts with
+    `query`, whose name tokens start with every query token, or, for a
+    query without letters, whose phone starts or ends with its digits.
+    For filtering other tables with patient_id IN (...), e.g. in the admin.
+    """
+    query = query.strip()
+    tokens = normalize_tokens(query)
+    if not tokens:
+        return set()
+    ids = set(
+        Patient.objects.filter(chart_number__istartswith=query).order_by("chart_number")
+        .values_list("id", flat=True)[:limit]
+    )
+    ids |= _name_prefix_ids(tokens)
+    if not any(char.isalpha() for char in query):
+        ids |= _phone_candidate_ids(query) or set()
+    return set(sorted(ids)[:limit])
+
+
+def _name_prefix_ids(tokens):
+    """Ids of patients with a name token starting with each of `tokens`."""
+    candidate_ids = None
+    for token in tokens:
+        ids = set(
+            PatientSearchTerm.objects
+            .filter(kind=PatientSearchTerm.NAME, term__istartswith=token)
+            .values_list("patient_id", flat=True)[:CANDIDATE_LIMIT]
+        )
+        candidate_ids = ids if candidate_ids is None else candidate_ids & ids
+        if not candidate_ids:
+            return set()
+    return candidate_ids
+
+
+def _name_candidates(query_tokens):
+    """Patient ids hit by any query token via exact/prefix/trigram match."""
+    candidates = set()
+    for token in query_tokens:
+        rows = (
+            PatientSearchTerm.objects
+            .filter(kind=PatientSearchTerm.NAME, term__istartswith=token)
+            .values_list("patient_id", flat=True)[:CANDIDATE_LIMIT]
+        )
+        matched = set(rows)
+
+        # Fall back to trigram overlap when the exact/prefix pass is thin,
+        # which is where misspellings end up. Each trigram is its own capped
+        # range scan; grouping all of them in SQL would count every matching
+        # row (common grams like " ma" hit a large share of the table) before
+        # the limit applied.
+        grams = trigrams(token)
+        if len(token) >= 3 and len(matched) < CANDIDATE_LIMIT:
+            min_hits = max(2, int(len(grams) * 0.4))
+            hits = Counter()
+            for gram in grams:
+                hits.update(set(
+                    PatientSearchTerm.objects
+                    .filter(kind=PatientSearchTerm.TRIGRAM, term=gram)
+                    .values_list("patient_id", flat=True)[:CANDIDATE_LIMIT]
+                ))
+            fuzzy = [patient_id for patient_id, count in hits.most_common() if count >= min_hits]
+            matched.update(fuzzy[:CANDIDATE_LIMIT])
+
+        candidates |= matched
+    return candidates
+
+
+def _phone_candidate_ids(phone):
+    digits = phone_digits(phone)
+    if len(digits) < MIN_PHONE_DIGITS:
+        return None
+    prefix = PatientSearchTerm.objects.filter(
+        kind=PatientSearchTerm.PHONE, term__istartswith=digits,
+    ).values_list("patient_id", flat=True)[:CANDIDATE_LIMIT]
+    suffix = PatientSearchTerm.objects.filter(
+        kind=PatientSearchTerm.PHONE_REVERSED, term__istartswith=digits[::-1],
+    ).values_list("patient_id", flat=True)[:CANDIDATE_LIMIT]
+    return set(prefix) | set(suffix)
+
+
+def _token_score(query_token, name_tokens):
+    best = 0.0
+    for name_token in name_tokens:
+        if name_token == query_token:
+            return 1.0
+        if name_token.startswith(query_token):
+            best = max(best, 0.9)
+            continue
+        ratio = difflib.SequenceMatcher(None, query_token, name_token).ratio()
+        best = max(best, ratio * 0.8)
+    return best
+
+
+def _rank(patient, query_tokens):
+    name_tokens = normalize_tokens(patient.first_name) + normalize_tokens(patient.last_name)
+    scores = [_token_score(token, name_tokens) for token in query_tokens]
+    # Every query token has to match something reasonably well
+    if min(scores) < FUZZY_THRESHOLD * 0.8:
+        return None
+    return sum(scores) / len(scores)
+
+
+def search_patients(name=None, date_of_birth=None, phone=None, limit=None):
+    """
+    Ranked, typo-tolerant patient lookup. Criteria are ANDed like the old
+    icontains filters; name matches are ordered best-first. Phone matching
+    is on leading or trailing digits, ignoring punctuation.
+    """
+    limit = limit or getattr(settings, "CLINIC_SEARCH_RESULT_LIMIT", 50)
+    query_tokens = normalize_tokens(name)
+    candidate_ids = None
+
+    if query_tokens:
+        candidate_ids = _name_candidates(query_tokens)
+
+    if phone:
+        phone_ids = _phone_candidate_ids(phone)
+        if phone_ids is not None:
+            candidate_ids = phone_ids if candidate_ids is None else candidate_ids & phone_ids
+
+    qs = Patient.objects.all()
+    if candidate_ids is not None:
+        if not candidate_ids:
+            return []
+        qs = qs.filter(pk__in=candidate_ids)
+    elif not date_of_birth:
+        return []
+
+    if date_of_birth:
+        qs = qs.filter(date_of_birth=date_of_birth)
+
+    if not query_tokens:
+        return list(qs.order_by("last_name", "first_name", "id")[:limit])
+
+    ranked = []
+    for patient in qs:
+        score = _rank(patient, query_tokens)
+        if score is not None:
+            ranked.append((-score, patient.last_name, patient.first_name, patient.pk, patient))
+    ranked.sort(key=lambda row: row[:4])
+    return [row[-1] for row in ranked[:limit]]
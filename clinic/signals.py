@@ -0,0 +1,159 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_migrate, post_save
+from django.dispatch import receiver
+
+from .caching import patients_cache, providers_cache, tenants_cache
+from .interval_index import appointment_changed, appointment_deleted, enabled as schedule_index_enabled
+from .models import Appointment, OutboxEvent, Patient, Provider, Tenant
+from .outbox import record as record_event
+from .schedule import invalidate_buckets
+from .search import index_patient
+from .tenants import forget_default_tenant
+from .utilization import apply_changes, summary_state
+
+SEARCH_FIELDS = {"first_name", "last_name", "phone", "date_of_birth"}
+SCHEDULE_PATIENT_FIELDS = {"first_name", "last_name", "chart_number"}
+
+
+@receiver(post_save, sender=Patient)
+def reindex_patient_search(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    index_patient(instance)
+
+
+@receiver(post_save, sender=Patient)
+def invalidate_patient_schedule(sender, instance, created=False, update_fields=None, raw=False, **kwargs):
+    # Cached day buckets embed the patient's name and chart number
+    if raw or created:
+        return
+    if update_fields is not None and not SCHEDULE_PATIENT_FIELDS.intersection(update_fields):
+        return
+    slots = list(instance.appointments.filter(status="scheduled").values_list("provider_id", "start_time"))
+    transaction.on_commit(lambda: invalidate_buckets(slots))
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_cached_patient(sender, instance, **kwargs):
+    patient_id = instance.pk
+    transaction.on_commit(lambda: patients_cache.delete(patient_id))
+
+
+@receiver(post_save, sender=Provider)
+@receiver(post_delete, sender=Provider)
+def invalidate_cached_providers(sender, instance, **kwargs):
+    transaction.on_commit(providers_cache.invalidate)
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_cached_tenants(sender, instance, **kwargs):
+    # Host lookups and the default tenant
+    forget_default_tenant()
+    transaction.on_commit(tenants_cache.invalidate)
+
+
+# flush (e.g. between TransactionTestCases) can drop the default tenant
+post_migrate.connect(forget_default_tenant, dispatch_uid="clinic.forget_default_tenant")
+
+
+# --------- Appointment schedule buckets --------- #
+
+@receiver(post_init, sender=Appointment)
+def remember_schedule_slot(sender, instance, **kwargs):
+    # Where the row was when loaded, so a move invalidates the old day too.
+    # Read __dict__ directly so deferred fields aren't fetched here.
+    instance._loaded_slot = (instance.__dict__.get("provider_id"), instance.__dict__.get("start_time"))
+
+
+@receiver(post_save, sender=Appointment)
+def invalidate_appointment_schedule(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Invalidate after commit so a concurrent reader can't re-cache the old rows
+    slots = [instance._loaded_slot, (instance.provider_id, instance.start_time)]
+    transaction.on_commit(lambda: invalidate_buckets(slots))
+    instance._loaded_slot = slots[-1]
+
+
+@receiver(post_delete, sender=Appointment)
+def invalidate_deleted_appointment_schedule(sender, instance, **kwargs):
+    slots = [instance._loaded_slot, (instance.provider_id, instance.start_time)]
+    transaction.on_commit(lambda: invalidate_buckets(slots))
+
+
+# --------- Outbox --------- #
+# Written by the saving transaction (views wrap their saves in one; admin
+# and save_appointment do already), so an event commits with its change.
+
+@receiver(post_save, sender=Patient)
+def record_patient_event(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    record_event(instance, OutboxEvent.CREATED if created else OutboxEvent.UPDATED)
+
+
+@receiver(post_save, sender=Appointment)
+def record_appointment_event(sender, instance, created=False, raw=False, **kwargs):
+    # Connected before update_daily_summary, which moves _loaded_summary on to the saved state
+    if raw:
+        return
+    if created:
+        event = OutboxEvent.CREATED
+    elif instance.status == "canceled" and instance._loaded_summary[3] != "canceled":
+        event = OutboxEvent.CANCELED
+    else:
+        event = OutboxEvent.UPDATED
+    record_event(instance, event)
+
+
+@receiver(post_delete, sender=Patient)
+@receiver(post_delete, sender=Appointment)
+def record_delete_event(sender, instance, **kwargs):
+    record_event(instance, OutboxEvent.DELETED)
+
+
+# --------- Provider daily summaries --------- #
+
+@receiver(post_init, sender=Appointment)
+def remember_summary_state(sender, instance, **kwargs):
+    fields = instance.__dict__
+    instance._loaded_summary = (
+        fields.get("provider_id"), fields.get("start_time"), fields.get("end_time"), fields.get("status"),
+    )
+
+
+@receiver(post_save, sender=Appointment)
+def update_daily_summary(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    # Runs in the saving transaction (save_appointment, cancel view, admin),
+    # so the summary commits or rolls back with the appointment itself
+    state = summary_state(instance)
+    apply_changes([] if created else [instance._loaded_summary], [state])
+    instance._loaded_summary = state
+
+
+@receiver(post_delete, sender=Appointment)
+def remove_from_daily_summary(sender, instance, **kwargs):
+    apply_changes([instance._loaded_summary], [])
+
+
+# --------- Schedule index --------- #
+
+@receiver(post_save, sender=Appointment)
+def update_schedule_index(sender, instance, raw=False, **kwargs):
+    if raw or not schedule_index_enabled():
+        return
+    transaction.on_commit(lambda: appointment_changed(instance))
+
+
+@receiver(post_delete, sender=Appointment)
+def remove_from_schedule_index(sender, instance, **kwargs):
+    if not schedule_index_enabled():
+        return
+    appointment_id = instance.pk
+    transaction.on_commit(lambda: appointment_deleted(appointment_id))
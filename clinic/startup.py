@@ -0,0 +1,199 @@
+"""
+Startup timing and warmup for the WSGI/ASGI entry points.
+
+wsgi.py/asgi.py import this module before Django. Phases are recorded
+as seconds since that import and exported on /metrics/ as
+clinic_startup_seconds:
+
+    django_setup    get_wsgi_application()/get_asgi_application() returned
+    warmup          warm_up() finished (the worker is ready for traffic)
+    first_request   the first request arrived
+    first_response  the first request finished (time to first response)
+
+In lean mode (CLINIC_LEAN_STARTUP=1) the admin is not autodiscovered
+during django.setup(); hospital_project/admin_urls.py does that on the
+first /admin/ request, so web workers that never serve the admin, and
+management commands and queue workers, never import the ModelAdmins.
+Before it accepts traffic, a web worker then:
+- loads the URLconf;
+- compiles the clinic/*.html page templates into the cached loader;
+- opens the database connections.
+The schedule index loads in a background thread meanwhile; requests that
+arrive first check conflicts against the database. Without lean mode
+importing the entry point doesn't touch the database: all of this is
+paid by the first requests.
+
+`python manage.py startup_report` runs the entry point in fresh
+interpreters under `python -X importtime` and reports per-module import
+times and these phases. With --compare it runs both modes.
+"""
+
+import time
+
+# This module is imported before Django is set up, so Django (and clinic
+# modules that need the app registry) are imported inside the functions.
+STARTED = time.perf_counter()
+
+phases = {}
+
+
+def mark(phase):
+    """Record the first time `phase` is reached."""
+    phases.setdefault(phase, time.perf_counter() - STARTED)
+
+
+# --------- Warmup --------- #
+
+def warm_templates():
+    """Compile the clinic/*.html page and row templates into the cached loader. Returns the count."""
+    from pathlib import Path
+
+    from django.apps import apps
+    from django.template.loader import get_template
+
+    root = Path(apps.get_app_config("clinic").path) / "templates" / "clinic"
+    paths = [*root.glob("*.html"), *root.glob("rows/*.html")]
+    names = sorted(f"clinic/{path.relative_to(root).as_posix()}" for path in paths)
+    for name in names:
+        get_template(name)
+    return len(names)
+
+
+def warm_urls():
+    from django.urls import get_resolver, reverse
+
+    resolver = get_resolver()
+    resolver.url_patterns
+    # Builds the reverse lookup tables {% url %} uses (for every include)
+    reverse("base")
+
+
+def warm_connections():
+    """
+    Connect every database alias; with CONN_MAX_AGE the connection is
+    reused by the first request on this thread. Only call this after the
+    server has forked its workers (e.g. gunicorn without --preload).
+    """
+    from django.db import connections
+
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def warm_up():
+    import threading
+
+    from django.conf import settings
+
+    if not getattr(settings, "CLINIC_LEAN_STARTUP", False):
+        return
+
+    from .interval_index import warm_on_startup
+
+    threading.Thread(target=warm_on_startup, name="schedule-index-warmup", daemon=True).start()
+    warm_urls()
+    warm_templates()
+    warm_connections()
+
+
+# --------- Entry points --------- #
+
+def _first_request(**kwargs):
+    mark("first_request")
+
+
+def _first_response(**kwargs):
+    from django.core.signals import request_finished, request_started
+
+    mark("first_response")
+    request_started.disconnect(_first_request)
+    request_finished.disconnect(_first_response)
+
+
+def application_loaded():
+    """Called by wsgi.py/asgi.py once the application object exists."""
+    from django.core.signals import request_finished, request_started
+
+    mark("django_setup")
+    warm_up()
+    mark("warmup")
+    request_started.connect(_first_request)
+    request_finished.connect(_first_response)
+
+
+# --------- Report --------- #
+
+def parse_importtime(lines):
+    """[(module, self_us, cumulative_us)] from `python -X importtime` stderr."""
+    modules = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def probe(entry="wsgi", path="/"):
+    """
+    Run in a fresh interpreter by startup_report: import the entry point,
+    send one GET request to it and print the phases as JSON.
+    """
+    import asyncio
+    import io
+    import json
+    from importlib import import_module
+
+    module = import_module(f"hospital_project.{entry}")
+    if entry == "wsgi":
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": "",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "HTTP_HOST": "localhost",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.url_scheme": "http",
+        }
+        status = []
+        body = module.application(environ, lambda code, headers: status.append(code))
+        b"".join(body)
+        body.close()
+        status = int(status[0].split()[0])
+    else:
+        status = asyncio.run(_asgi_get(module.application, path))
+    print(json.dumps({"status": status, "phases": phases}))
+
+
+async def _asgi_get(application, path):
+    import asyncio
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"host", b"localhost")],
+        "server": ("localhost", 80),
+    }
+    sent = []
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # No disconnect; Django cancels this listener once the response is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return next(m["status"] for m in sent if m["type"] == "http.response.start")
@@ -0,0 +1,52 @@
+// Progressive enhancement for AutocompleteSelect (clinic/widgets.py):
+// adds a search box above each <select data-autocomplete-url> and replaces
+// its options with matches from the JSON endpoint as the user types.
+(function () {
+    "use strict";
+
+    function attach(select) {
+        var input = document.createElement("input");
+        input.type = "search";
+        input.className = "form-control mb-1";
+        input.placeholder = "Type to search...";
+        input.autocomplete = "off";
+        select.parentNode.insertBefore(input, select);
+
+        var timer = null;
+        var pending = null;
+
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            var q = input.value.trim();
+            if (q.length < 2) {
+                return;
+            }
+            timer = setTimeout(function () {
+                if (pending) {
+                    pending.abort();
+                }
+                pending = new AbortController();
+                var url = select.dataset.autocompleteUrl + "?q=" + encodeURIComponent(q);
+                fetch(url, { signal: pending.signal, headers: { "Accept": "application/json" } })
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        var current = select.value;
+                        select.innerHTML = "";
+                        select.appendChild(new Option("---------", ""));
+                        data.results.forEach(function (item) {
+                            var value = String(item.id);
+                            select.appendChild(new Option(item.text, value, false, value === current));
+                        });
+                        if (data.results.length === 1) {
+                            select.value = String(data.results[0].id);
+                        }
+                    })
+                    .catch(function () {});
+            }, 200);
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("select[data-autocomplete-url]").forEach(attach);
+    });
+})();
@@ -0,0 +1,138 @@
+"""
+Synthetic data for load tests and benchmarks.
+
+Generates patients, providers (with specialties) and years of appointments
+using bulk_create in batches. Appointments are laid out day by day on a
+15-minute grid inside each provider's working day so they never overlap
+for a provider or a patient, with `density` controlling how full the
+schedules are. Everything is driven by a seeded random.Random, so the same
+arguments produce the same data.
+"""
+
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import providers_cache
+from .models import Appointment, Patient, PatientSearchTerm, Provider
+from .search import build_terms
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Karen",
+    "Daniel", "Lisa", "Matthew", "Nancy", "Anthony", "Betty", "Mark", "Sandra", "Luis", "Ashley",
+    "Wei", "Mei", "Ahmed", "Fatima", "José", "María", "Olga", "Ivan", "Aisha", "Kenji",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Nguyen", "Kim", "Patel", "O'Brien", "Müller", "Kowalski", "Ivanova", "Chen", "Wang", "Okafor",
+]
+SPECIALTIES = ["Family Medicine", "Cardiology", "Dermatology", "Pediatrics", "Orthopedics", "Neurology"]
+REASONS = ["Follow-up", "Annual physical", "Consultation", "Lab review", "New patient", "Vaccination", ""]
+
+SLOT_MINUTES = 15
+DAY_START = time(8, 0)
+DAY_SLOTS = 9 * 60 // SLOT_MINUTES  # 08:00-17:00
+DURATION_SLOTS = [1, 2, 2, 2, 3, 4]  # 15-60 minutes, mostly 30
+
+
+def _report(stdout, message):
+    if stdout:
+        stdout.write(message)
+
+
+def generate_providers(count, rng):
+    providers = [
+        Provider(name=f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} #{i}", specialty=rng.choice(SPECIALTIES))
+        for i in range(count)
+    ]
+    Provider.objects.bulk_create(providers)
+    # bulk_create skips the post_save that invalidates the cached provider list
+    transaction.on_commit(providers_cache.invalidate)
+    return list(Provider.objects.order_by("-id").values_list("id", flat=True)[:count])
+
+
+def generate_patients(count, rng, batch_size=5000, stdout=None):
+    """Bulk-create patients (chart numbers S-00000001...) and index them for search."""
+    start = Patient.objects.filter(chart_number__startswith="S-").count()
+    created = 0
+    while created < count:
+        batch = []
+        for i in range(start + created, start + min(created + batch_size, count)):
+            batch.append(Patient(
+                chart_number=f"S-{i + 1:08d}",
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                date_of_birth=date(1930, 1, 1) + timedelta(days=rng.randrange(0, 365 * 90)),
+                phone=f"({rng.randrange(200, 999)}) {rng.randrange(200, 999)}-{rng.randrange(0, 10000):04d}",
+                email=None,
+            ))
+        Patient.objects.bulk_create(batch)
+        # bulk_create skips post_save and may not return ids (MySQL), so
+        # re-read the batch to build its search terms.
+        charts = [p.chart_number for p in batch]
+        saved = Patient.objects.filter(chart_number__in=charts).only(
+            "id", "tenant_id", "first_name", "last_name", "phone", "date_of_birth"
+        )
+        PatientSearchTerm.objects.bulk_create(
+            [term for patient in saved for term in build_terms(patient)], batch_size=batch_size
+        )
+        created += len(batch)
+        _report(stdout, f"{created}/{count} patients")
+    return created
+
+
+def generate_appointments(provider_ids, patient_ids, start_date, end_date, density, rng,
+                          cancel_rate=0.08, batch_size=5000, stdout=None):
+    """
+    Fill weekdays between start_date and end_date. `density` is the chance
+    a free 15-minute slot starts an appointment. Returns rows created.
+    """
+    tz = timezone.get_current_timezone()
+    pending = []
+    created = 0
+    day = start_date
+    while day <= end_date:
+        if day.weekday() < 5:
+            day_start = timezone.make_aware(datetime.combine(day, DAY_START), tz)
+            # patient -> slots taken today, so a patient never double-books
+            patient_busy = {}
+            for provider_id in provider_ids:
+                slot = 0
+                while slot < DAY_SLOTS:
+                    if rng.random() >= density:
+                        slot += 1
+                        continue
+                    length = min(rng.choice(DURATION_SLOTS), DAY_SLOTS - slot)
+                    patient_id = rng.choice(patient_ids)
+                    taken = patient_busy.setdefault(patient_id, set())
+                    wanted = set(range(slot, slot + length))
+                    if taken & wanted:
+                        slot += 1
+                        continue
+                    taken |= wanted
+                    start = day_start + timedelta(minutes=slot * SLOT_MINUTES)
+                    pending.append(Appointment(
+                        patient_id=patient_id,
+                        provider_id=provider_id,
+                        start_time=start,
+                        end_time=start + timedelta(minutes=length * SLOT_MINUTES),
+                        reason=rng.choice(REASONS),
+                        status="canceled" if rng.random() < cancel_rate else "scheduled",
+                    ))
+                    slot += length
+            if len(pending) >= batch_size:
+                Appointment.objects.bulk_create(pending, batch_size=batch_size)
+                created += len(pending)
+                pending = []
+                _report(stdout, f"{created} appointments (through {day})")
+        day += timedelta(days=1)
+
+    if pending:
+        Appointment.objects.bulk_create(pending, batch_size=batch_size)
+        created += len(pending)
+    return created
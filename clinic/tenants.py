@@ -0,0 +1,93 @@
+"""
+Tenants: many clinics sharing one database.
+
+Patient, Provider, Appointment, AppointmentArchive, PatientSearchTerm
+and ProviderDailySummary carry a tenant foreign key, and every hot index
+on them leads with it ((tenant, chart_number), (tenant, provider,
+start_time, end_time), ...). A query for one clinic is therefore a
+narrow range scan that never reads other clinics' rows, however many
+clinics share the tables.
+
+The current tenant lives in a context variable, like the read replica
+alias in clinic/routers.py:
+
+- TenantMiddleware (clinic/middleware.py) sets it for each request from
+  the host: a Tenant whose `domain` is the host, else one whose `slug` is
+  the first label of the host (northside.clinic.example), else
+  CLINIC_DEFAULT_TENANT unless CLINIC_TENANT_REQUIRED is set;
+- use_tenant() sets it anywhere else (commands, tests, benchmarks).
+
+The models' `objects` manager (TenantManager) filters on the current
+tenant. With no tenant set, as in management commands and the reminder
+dispatcher, it returns every tenant's rows. `all_tenants` is never
+filtered; process-wide jobs (schedule index, daily summaries, reminders)
+use it so that running inside a request can't narrow them. New rows get
+the current tenant, or the default tenant, from the field default, which
+also covers bulk_create(); daily summaries take their provider's.
+
+Single-clinic deployments just use the default tenant, which the
+migration creates and assigns all existing rows to.
+"""
+
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+
+_current = contextvars.ContextVar("clinic_tenant", default=None)
+
+# Default tenant id by slug; cleared when a Tenant changes or the DB is flushed
+_default = {}
+
+
+def get_current_tenant():
+    return _current.get()
+
+
+@contextmanager
+def use_tenant(tenant):
+    """Scope TenantManager queries and new rows to `tenant` (None: all tenants) inside the block."""
+    token = _current.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current.reset(token)
+
+
+def default_tenant_id():
+    """Id of the CLINIC_DEFAULT_TENANT Tenant, created if missing."""
+    from .models import Tenant
+
+    slug = getattr(settings, "CLINIC_DEFAULT_TENANT", "default")
+    pk = _default.get(slug)
+    if pk is None:
+        # Only the id column: this runs as the default of every new row's tenant
+        pk = Tenant.objects.filter(slug=slug).values_list("pk", flat=True).first()
+        if pk is None:
+            try:
+                with transaction.atomic():
+                    pk = Tenant.objects.create(slug=slug, name="Default clinic").pk
+            except IntegrityError:
+                pk = Tenant.objects.filter(slug=slug).values_list("pk", flat=True).get()
+        _default[slug] = pk
+    return pk
+
+
+def forget_default_tenant(**kwargs):
+    _default.clear()
+
+
+def current_tenant_id():
+    """Field default for the tenant foreign keys."""
+    tenant = _current.get()
+    return tenant.pk if tenant is not None else default_tenant_id()
+
+
+class TenantManager(models.Manager):
+    """Rows of the current tenant, or of every tenant when none is set."""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tenant = _current.get()
+        return queryset if tenant is None else queryset.filter(tenant_id=tenant.pk)
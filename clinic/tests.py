@@ -1,3 +1,1435 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+import re
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import SkipTest
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseRedirect
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls.resolvers import RegexPattern, RoutePattern, URLResolver
+from django.utils import timezone
+
+from hospital_project.urls import LazyURLResolver
+
+from .archive import RAW_DELETED, archive_appointments, history_page, months_ago
+from .availability import find_free_slots
+from .booking import save_appointment
+from .bulk_booking import bulk_book
+from .booking_queue import BookingQueue, BookingQueueFull
+from .caching import cache_stats, clear_all, get_patient, get_providers, reset_cache_stats
+from .forms import AppointmentForm, AvailabilitySearchForm
+from .fragments import ROWS_MARKER
+from .admin import AppointmentAdmin
+from .interval_index import IntervalList, ScheduleIndex, VersionBumps, bump_version, current_version, to_epoch
+from .metrics import Histogram, MetricsRegistry, prometheus_text, registry
+from .middleware import ReplicaPinningMiddleware
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+from .patient_import import CREATED, DUPLICATE, INVALID, import_patients
+from .models import (
+    Appointment, AppointmentArchive, OutboxCursor, OutboxEvent, Patient, PatientSearchTerm, Provider,
+    ProviderDailySummary, Reminder, Tenant,
+)
+from .outbox import deliver, ready_events
+from .reminders import Dispatcher, FileTransport, RateLimiter, claim, dispatch, schedule_due
+from .routers import PIN_COOKIE, read_replica, use_primary, use_replica
+from .search import index_patient, rebuild_index, search_patients
+from .large_tables import EstimatedCountPaginator
+from .startup import parse_importtime, warm_templates
+from .synthetic import generate_providers
+from .tenants import use_tenant
+from .utilization import rebuild_summaries
+
+
+# For TestCases that go through @read_replica views: the test mirror replica
+# is a second connection that can't see the test's uncommitted rows
+primary_reads = override_settings(CLINIC_READ_REPLICAS=[])
+
+
+def make_patient(n):
+    return Patient.objects.create(
+        chart_number=f"T-{n}",
+        first_name=f"First{n}",
+        last_name=f"Last{n}",
+        date_of_birth=date(1980, 1, 1),
+        phone="555-0100",
+    )
+
+
+@primary_reads
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        provider = Provider.objects.create(name="Dr. Pages")
+        patient = make_patient(1)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        # Pairs of appointments share a start_time, so pages split ties on id
+        self.appointments = [
+            Appointment.objects.create(
+                patient=patient, provider=provider, status="canceled",
+                start_time=start + timedelta(hours=n // 2), end_time=start + timedelta(hours=n // 2, minutes=30),
+            )
+            for n in range(5)
+        ]
+
+    def page(self, cursor=None, page_size=2):
+        return keyset_paginate(Appointment.objects.all(), ["start_time", "id"], cursor=cursor, page_size=page_size)
+
+    def test_forward_and_backward_across_duplicate_keys(self):
+        first = self.page()
+        self.assertIsNone(first.previous_cursor)
+        second = self.page(first.next_cursor)
+        third = self.page(second.next_cursor)
+        self.assertEqual([a.pk for a in [*first, *second, *third]], [a.pk for a in self.appointments])
+        self.assertIsNone(third.next_cursor)
+
+        back = self.page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        back = self.page(back.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertIsNone(back.previous_cursor)
+
+    def test_cursor_round_trips_aware_datetimes(self):
+        appointment = self.appointments[2]
+        values, direction = decode_cursor(encode_cursor([appointment.start_time, appointment.pk]))
+        self.assertEqual((values, direction), ([str(appointment.start_time), str(appointment.pk)], "next"))
+        self.assertEqual(list(self.page(encode_cursor(values))), self.appointments[3:5])
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        first = [a.pk for a in self.page()]
+        for cursor in ["garbage!", encode_cursor(["not a date", "1"]), encode_cursor(["2026-01-01"]),
+                       encode_cursor([str(self.appointments[0].start_time), "x"], "prev")]:
+            self.assertEqual([a.pk for a in self.page(cursor)], first, cursor)
+            response = self.client.get("/appointments/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 200)
+
+
+class BookingServiceTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Test")
+        self.patient = make_patient(1)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def book(self, patient=None, provider=None, minutes=30, offset=0):
+        start = self.start + timedelta(minutes=offset)
+        appointment = Appointment(
+            patient=patient or self.patient,
+            provider=provider or self.provider,
+            start_time=start,
+            end_time=start + timedelta(minutes=minutes),
+        )
+        return save_appointment(appointment)
+
+    def test_overlap_check_is_one_query(self):
+        appointment = Appointment(
+            patient=self.patient,
+            provider=self.provider,
+            start_time=self.start,
+            end_time=self.start + timedelta(minutes=30),
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(appointment.find_conflicts(), (False, False))
+
+    def test_provider_conflict_rejected(self):
+        self.book()
+        with self.assertRaisesMessage(ValidationError, "provider already has"):
+            self.book(patient=make_patient(2), offset=15)
+
+    def test_patient_conflict_rejected(self):
+        self.book()
+        with self.assertRaisesMessage(ValidationError, "patient already has"):
+            self.book(provider=Provider.objects.create(name="Dr. Other"), offset=15)
+
+    def test_back_to_back_allowed(self):
+        self.book()
+        self.book(patient=make_patient(2), offset=30)
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_edit_does_not_conflict_with_itself(self):
+        appointment = self.book()
+        appointment.end_time += timedelta(minutes=15)
+        save_appointment(appointment)
+
+    def test_canceled_slot_can_be_rebooked(self):
+        appointment = self.book()
+        appointment.status = "canceled"
+        save_appointment(appointment)
+        self.book(patient=make_patient(2))
+
+
+class BulkBookingTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Bulk")
+        self.patients = [make_patient(n) for n in range(3)]
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def row(self, patient, offset=0, minutes=30, provider=None, **extra):
+        start = self.start + timedelta(minutes=offset)
+        return {
+            "patient_chart_number": patient.chart_number,
+            "provider_id": (provider or self.provider).pk,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=minutes)).isoformat(),
+            **extra,
+        }
+
+    def test_conflicts_within_batch(self):
+        other = Provider.objects.create(name="Dr. Other")
+        results = bulk_book([
+            self.row(self.patients[0]),
+            self.row(self.patients[1], offset=15),
+            self.row(self.patients[0], offset=15, provider=other),
+            self.row(self.patients[1], offset=30),
+        ])
+        self.assertEqual([r.accepted for r in results], [True, False, False, True])
+        self.assertIn("provider already has", results[1].message)
+        self.assertIn("patient already has", results[2].message)
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_conflicts_with_existing_rows(self):
+        Appointment.objects.create(
+            patient=self.patients[2], provider=self.provider,
+            start_time=self.start, end_time=self.start + timedelta(minutes=30),
+        )
+        Appointment.objects.create(
+            patient=self.patients[2], provider=self.provider, status="canceled",
+            start_time=self.start + timedelta(minutes=60), end_time=self.start + timedelta(minutes=90),
+        )
+        results = bulk_book([
+            self.row(self.patients[0], offset=15),
+            self.row(self.patients[0], offset=60),
+        ])
+        self.assertEqual([r.accepted for r in results], [False, True])
+        self.assertIn("provider already has", results[0].message)
+
+    def test_reports_errors_per_row(self):
+        results = bulk_book([
+            self.row(self.patients[0]),
+            self.row(self.patients[0], offset=60, minutes=-10),
+            {"patient_chart_number": "T-0", "provider_id": self.provider.pk, "start_time": "tomorrow"},
+            self.row(self.patients[0], offset=120, provider=Provider(pk=999999)),
+            {**self.row(self.patients[0], offset=180), "patient_chart_number": "NOPE"},
+            self.row(self.patients[0], offset=240, status="bogus"),
+        ], start_index=10)
+        self.assertEqual([r.row for r in results], list(range(10, 16)))
+        self.assertEqual([r.accepted for r in results], [True, False, False, False, False, False])
+        self.assertEqual(results[1].message, "Start time must be before end time.")
+        self.assertEqual(results[2].message, "Invalid or missing start_time/end_time.")
+        self.assertEqual(results[3].message, "Unknown provider.")
+        self.assertEqual(results[4].message, "Unknown patient or provider.")
+        self.assertEqual(results[5].message, "Invalid status 'bogus'.")
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_dry_run_checks_without_writing(self):
+        rows = [self.row(self.patients[0]), self.row(self.patients[1], offset=15)]
+        results = bulk_book(rows, dry_run=True)
+        self.assertEqual([r.accepted for r in results], [True, False])
+        self.assertFalse(Appointment.objects.exists())
+        self.assertFalse(OutboxEvent.objects.filter(entity=OutboxEvent.APPOINTMENT).exists())
+
+        self.assertEqual([r.accepted for r in bulk_book(rows)], [True, False])
+        self.assertEqual(Appointment.objects.count(), 1)
+        self.assertEqual(OutboxEvent.objects.filter(entity=OutboxEvent.APPOINTMENT).count(), 1)
+
+    def test_series_only_loads_rows_near_the_batch(self):
+        far = self.start + timedelta(days=200)
+        Appointment.objects.create(
+            patient=self.patients[2], provider=self.provider,
+            start_time=self.start + timedelta(days=100), end_time=self.start + timedelta(days=100, minutes=30),
+        )
+        Appointment.objects.create(
+            patient=self.patients[2], provider=self.provider, start_time=far, end_time=far + timedelta(minutes=30),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            results = bulk_book([self.row(self.patients[0]), self.row(self.patients[0], offset=200 * 24 * 60)])
+        self.assertEqual([r.accepted for r in results], [True, False])
+        # One busy-interval query with a window per row, not one spanning the 200 days
+        busy = [
+            q["sql"] for q in queries
+            if q["sql"].startswith("SELECT") and "clinic_appointment" in q["sql"] and "'scheduled'" in q["sql"]
+        ]
+        self.assertEqual(len(busy), 1)
+        self.assertEqual(len(re.findall(r"start_time\W* <", busy[0])), 2)
+
+    def test_ids_read_back_without_returning(self):
+        # Canceled rows aren't conflict-checked, so two can share provider, start and created_at
+        rows = [self.row(self.patients[0], status="canceled"), self.row(self.patients[1], status="canceled")]
+        with patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False), \
+                patch("django.utils.timezone.now", return_value=timezone.now()):
+            results = bulk_book(rows)
+        for result, patient in zip(results, self.patients):
+            self.assertEqual(Appointment.objects.get(pk=result.appointment.pk).patient, patient)
+
+
+class CacheInvalidationTests(TestCase):
+    def setUp(self):
+        clear_all()
+        self.provider = Provider.objects.create(name="Dr. Cached")
+        self.patient = make_patient(1)
+
+    def names(self):
+        return [p.name for p in get_providers()]
+
+    def test_provider_edit_and_delete(self):
+        self.assertEqual(self.names(), ["Dr. Cached"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.name = "Dr. Renamed"
+            self.provider.save()
+        self.assertEqual(self.names(), ["Dr. Renamed"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.delete()
+        self.assertEqual(self.names(), [])
+
+    def test_patient_edit_and_delete(self):
+        self.assertEqual(get_patient(self.patient.pk).last_name, "Last1")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.last_name = "Saved"
+            self.patient.save()
+        self.assertEqual(get_patient(self.patient.pk).last_name, "Saved")
+        # The versioned single-UPDATE path sends post_save too
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.last_name = "Changed"
+            self.patient.save_changes(["last_name"], self.patient.version)
+        self.assertEqual(get_patient(self.patient.pk).last_name, "Changed")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.delete()
+        self.assertIsNone(get_patient(self.patient.pk))
+
+    def test_bulk_created_providers(self):
+        self.assertEqual(self.names(), ["Dr. Cached"])
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_providers(2, random.Random(1))
+        self.assertEqual(len(self.names()), 3)
+
+    def test_edit_form_is_loaded_fresh(self):
+        get_patient(self.patient.pk)
+        # A write that skips signals leaves the cached copy stale
+        Patient.objects.filter(pk=self.patient.pk).update(last_name="Fresh", version=F("version") + 1)
+        self.assertEqual(get_patient(self.patient.pk).last_name, "Last1")
+        response = self.client.get(f"/patients/{self.patient.pk}/edit/")
+        self.assertEqual(response.context["form"]["version"].value(), self.patient.version + 1)
+        self.assertContains(response, 'value="Fresh"')
+
+
+def skip_unless_bookings_serialize():
+    # Concurrent bookings need a backend that serializes the check-then-insert:
+    # row locks (MySQL/PostgreSQL) or SQLite in IMMEDIATE transaction mode.
+    options = connection.settings_dict.get("OPTIONS", {})
+    if not (
+        connection.features.has_select_for_update
+        or options.get("transaction_mode") == "IMMEDIATE"
+    ):
+        raise SkipTest("Database backend cannot serialize concurrent bookings.")
+
+
+class BookingConcurrencyStressTests(TransactionTestCase):
+    """
+    Many threads race to book overlapping slots; the row locks taken by
+    save_appointment() must let exactly one of them win per slot.
+    """
+
+    THREADS = 12
+
+    def setUp(self):
+        skip_unless_bookings_serialize()
+        self.provider = Provider.objects.create(name="Dr. Busy")
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def race(self, build):
+        barrier = threading.Barrier(self.THREADS)
+        outcomes = []
+
+        def worker(i):
+            try:
+                appointment = build(i)
+                barrier.wait()
+                save_appointment(appointment)
+                outcomes.append("booked")
+            except ValidationError:
+                outcomes.append("conflict")
+            except Exception as e:  # surfaced below as a test failure
+                outcomes.append(repr(e))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return outcomes
+
+    def test_same_provider_slot_booked_once(self):
+        patients = [make_patient(i) for i in range(self.THREADS)]
+
+        def build(i):
+            start = self.start + timedelta(minutes=i % 3 * 10)
+            return Appointment(
+                patient=patients[i],
+                provider=self.provider,
+                start_time=start,
+                end_time=start + timedelta(minutes=30),
+            )
+
+        outcomes = self.race(build)
+        self.assertEqual(sorted(set(outcomes)), ["booked", "conflict"], outcomes)
+        self.assertEqual(outcomes.count("booked"), 1)
+        self.assertEqual(Appointment.objects.filter(status="scheduled").count(), 1)
+
+    def test_same_patient_across_providers_booked_once(self):
+        patient = make_patient(0)
+        providers = [Provider.objects.create(name=f"Dr. {i}") for i in range(self.THREADS)]
+
+        def build(i):
+            return Appointment(
+                patient=patient,
+                provider=providers[i],
+                start_time=self.start,
+                end_time=self.start + timedelta(minutes=30),
+            )
+
+        outcomes = self.race(build)
+        self.assertEqual(outcomes.count("booked"), 1, outcomes)
+        self.assertEqual(patient.appointments.filter(status="scheduled").count(), 1)
+
+
+class AsyncBookingQueueTests(TransactionTestCase):
+    # Queue workers use their own threads/connections, so data must be committed
+
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Queue")
+        self.patients = [make_patient(i) for i in range(2)]
+        self.start = timezone.localtime(timezone.now()).replace(second=0, microsecond=0) + timedelta(days=1)
+
+    def data(self, patient):
+        return {
+            "patient": patient.pk,
+            "provider": self.provider.pk,
+            "start_time": self.start.strftime("%Y-%m-%dT%H:%M"),
+            "end_time": (self.start + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M"),
+            "status": "scheduled",
+        }
+
+    async def test_overlapping_bookings_one_accepted(self):
+        skip_unless_bookings_serialize()
+        queue = BookingQueue(workers=2, maxsize=10)
+        results = await asyncio.gather(*(queue.submit(self.data(p)) for p in self.patients))
+        self.assertEqual(sorted(appointment is not None for appointment, _ in results), [False, True])
+        self.assertEqual(await Appointment.objects.acount(), 1)
+
+    async def test_full_queue_rejected(self):
+        queue = BookingQueue(workers=1, maxsize=1, timeout=0.01)
+        blocker = threading.Event()
+        queue._executor.submit(blocker.wait)
+        try:
+            first = asyncio.ensure_future(queue.submit(self.data(self.patients[0])))
+            second = asyncio.ensure_future(queue.submit(self.data(self.patients[1])))
+            await asyncio.sleep(0)
+            with self.assertRaises(BookingQueueFull):
+                await queue.submit(self.data(self.patients[1]))
+        finally:
+            blocker.set()
+        await asyncio.gather(first, second)
+
+    async def test_book_api(self):
+        response = await self.async_client.post("/api/async/appointments/book/", self.data(self.patients[0]))
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.post("/api/async/appointments/book/", self.data(self.patients[1]))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("provider already has", str(response.json()["errors"]))
+
+    def test_book_api_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        url = "/api/async/appointments/book/"
+        self.assertEqual(client.post(url, self.data(self.patients[0])).status_code, 403)
+
+        client.get("/appointments/new/")
+        token = client.cookies["csrftoken"].value
+        response = client.post(url, self.data(self.patients[0]), headers={"X-CSRFToken": token})
+        self.assertEqual(response.status_code, 201)
+
+
+@override_settings(CLINIC_READ_REPLICAS=["replica"])
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def routed_view(self, request):
+        @read_replica
+        def view(request):
+            return HttpResponse(router.db_for_read(Patient))
+        return view(request).content.decode()
+
+    def test_reads_default_to_primary(self):
+        self.assertEqual(router.db_for_read(Patient), "default")
+
+    def test_read_replica_view_reads_from_replica(self):
+        self.assertEqual(self.routed_view(self.factory.get("/")), "replica")
+
+    def test_writes_and_contrib_models_stay_on_primary(self):
+        with use_replica():
+            self.assertEqual(router.db_for_write(Patient), "default")
+            self.assertEqual(router.db_for_read(Session), "default")
+            with use_primary():
+                self.assertEqual(router.db_for_read(Appointment), "default")
+
+    def test_client_pinned_to_primary_after_write(self):
+        middleware = ReplicaPinningMiddleware(lambda request: HttpResponseRedirect("/appointments/"))
+        response = middleware(self.factory.post("/appointments/new/"))
+        request = self.factory.get("/appointments/")
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        self.assertEqual(self.routed_view(request), "default")
+
+
+@override_settings(CLINIC_READ_REPLICAS=["replica"])
+class ExportTests(TransactionTestCase):
+    # The replica is a test mirror on its own connection, so data must be committed
+    databases = {"default", "replica"}
+
+    def test_streamed_rows_read_from_the_views_replica(self):
+        make_patient(1)
+        response = self.client.get("/patients/", {"format": "csv"})
+        # The body is consumed after the view's @read_replica block has exited
+        with CaptureQueriesContext(connections["replica"]) as replica_queries:
+            body = b"".join(response.streaming_content).decode()
+        self.assertEqual(body.splitlines()[1], "T-1,Last1,First1,1980-01-01,555-0100,")
+        self.assertEqual(len(replica_queries), 1)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Archive")
+        self.patient = make_patient(1)
+        now = timezone.now().replace(microsecond=0)
+        for days in (800, 400, 10, -10):
+            start = now - timedelta(days=days)
+            Appointment.objects.create(
+                patient=self.patient, provider=self.provider, start_time=start, end_time=start + timedelta(minutes=30)
+            )
+
+    def test_moves_old_rows_and_history_reads_both(self):
+        moved = archive_appointments(cutoff=months_ago(12), canceled_cutoff=months_ago(1), batch_size=1)
+        self.assertEqual(moved, 2)
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertEqual(AppointmentArchive.objects.count(), 2)
+
+        rows, cursor = history_page(self.patient.pk, page_size=3)
+        self.assertEqual([row["archived"] for row in rows], [False, False, True])
+        rows, cursor = history_page(self.patient.pk, cursor=cursor, page_size=3)
+        self.assertEqual([row["archived"] for row in rows], [True])
+        self.assertIsNone(cursor)
+
+    def test_refuses_to_orphan_unhandled_relations(self):
+        with patch.dict(RAW_DELETED, {Appointment: set()}):
+            with self.assertRaises(ImproperlyConfigured):
+                archive_appointments(cutoff=months_ago(12))
+        self.assertEqual(Appointment.objects.count(), 4)
+
+
+class DailySummaryTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Summary")
+        self.patient = make_patient(1)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=3)
+
+    def summaries(self):
+        return sorted(ProviderDailySummary.objects.exclude(
+            booked_count=0, booked_minutes=0, canceled_count=0, canceled_minutes=0
+        ).values_list("provider_id", "date", "booked_count", "booked_minutes", "canceled_count", "canceled_minutes"))
+
+    def test_incremental_updates_match_rebuild(self):
+        appointment = save_appointment(Appointment(
+            patient=self.patient, provider=self.provider, start_time=self.start,
+            end_time=self.start + timedelta(minutes=45),
+        ))
+        day = timezone.localtime(self.start).date()
+        self.assertEqual(self.summaries(), [(self.provider.pk, day, 1, 45, 0, 0)])
+
+        # Move to the next day, then cancel
+        appointment = Appointment.objects.get(pk=appointment.pk)
+        appointment.start_time += timedelta(days=1)
+        appointment.end_time += timedelta(days=1)
+        save_appointment(appointment)
+        appointment.status = "canceled"
+        appointment.save()
+        self.assertEqual(self.summaries(), [(self.provider.pk, day + timedelta(days=1), 0, 0, 1, 45)])
+
+        incremental = self.summaries()
+        rebuild_summaries()
+        self.assertEqual(self.summaries(), incremental)
+
+        Appointment.objects.get(pk=appointment.pk).delete()
+        self.assertEqual(self.summaries(), [])
+
+
+class IntervalListTests(SimpleTestCase):
+    def test_overlapping(self):
+        intervals = IntervalList()
+        for pk, (start, end) in enumerate([(0, 30), (30, 60), (100, 400), (120, 150)], start=1):
+            intervals.add(pk, start, end)
+        self.assertEqual(intervals.overlapping(10, 20), [1])
+        self.assertEqual(intervals.overlapping(30, 60), [2])
+        # The long interval started well before the query
+        self.assertEqual(intervals.overlapping(300, 310), [3])
+        self.assertEqual(intervals.overlapping(60, 100), [])
+        self.assertEqual(intervals.overlapping(110, 130, exclude=3), [4])
+        intervals.remove(3, 100)
+        self.assertEqual(intervals.between(0, 500), [(0, 30), (30, 60), (120, 150)])
+
+
+@override_settings(CLINIC_SCHEDULE_INDEX_CHECK_SECONDS=0, CLINIC_SCHEDULE_INDEX_BUMP_SECONDS=0)
+class ScheduleIndexTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Index")
+        self.patient = make_patient(1)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+
+    def book(self, start, minutes=30):
+        with self.captureOnCommitCallbacks(execute=True):
+            return save_appointment(Appointment(
+                patient=self.patient, provider=self.provider, start_time=start,
+                end_time=start + timedelta(minutes=minutes),
+            ))
+
+    def test_other_process_catches_up_from_version(self):
+        index = ScheduleIndex()
+        index.warm()
+        appointment = self.book(self.start)
+        self.assertEqual(
+            index.conflicts(self.provider.pk, None, self.start, self.start + timedelta(minutes=10)), (True, False)
+        )
+        self.assertIn(appointment.pk, index.rows)
+
+        appointment.status = "canceled"
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment.save()
+        self.assertEqual(index.busy([self.provider.pk], self.start, self.start + timedelta(hours=1)), {self.provider.pk: []})
+
+    def overlapping_form(self):
+        return AppointmentForm(data={
+            "patient": make_patient(2).pk,
+            "provider": self.provider.pk,
+            "start_time": timezone.localtime(self.start + timedelta(minutes=15)).strftime("%Y-%m-%d %H:%M:%S"),
+            "end_time": timezone.localtime(self.start + timedelta(minutes=45)).strftime("%Y-%m-%d %H:%M:%S"),
+            "reason": "Check-up",
+            "status": "scheduled",
+        })
+
+    def test_form_precheck_reports_conflict(self):
+        index = ScheduleIndex()
+        index.warm()
+        self.book(self.start)
+        form = self.overlapping_form()
+        with patch("clinic.forms.schedule_index", index), CaptureQueriesContext(connection) as queries:
+            self.assertFalse(form.is_valid())
+        self.assertIn(Appointment.PROVIDER_CONFLICT, form.non_field_errors())
+        self.assertFalse(any("COUNT" in query["sql"] for query in queries))
+
+    def test_cold_index_loads_in_background_and_form_uses_the_database(self):
+        self.book(self.start)
+        index = ScheduleIndex()
+        form = self.overlapping_form()
+        with patch.object(index, "_load_in_background") as load, patch("clinic.forms.schedule_index", index):
+            self.assertFalse(form.is_valid())
+        load.assert_called_once()
+        self.assertIn(Appointment.PROVIDER_CONFLICT, form.non_field_errors())
+
+    def test_new_generation_stops_answering_until_reloaded(self):
+        index = ScheduleIndex()
+        index.warm()
+        bump_version(full_reload=True)
+        with patch.object(index, "_load_in_background") as load:
+            self.assertIsNone(index.conflicts(self.provider.pk, None, self.start, self.start + timedelta(minutes=10)))
+        load.assert_called_once()
+        index.warm()
+        self.assertEqual(index.conflicts(self.provider.pk, None, self.start, self.start + timedelta(minutes=10)), (False, False))
+
+    @override_settings(CLINIC_SCHEDULE_INDEX_BUMP_SECONDS=60)
+    def test_version_bumps_are_coalesced(self):
+        bumps = VersionBumps()
+        before = current_version()[0]
+        for _ in range(3):
+            bumps.request()
+        # The first is written at once, the other two wait for the interval to end
+        self.assertEqual(current_version()[0], before + 1)
+        bumps.flush()
+        self.assertEqual(current_version()[0], before + 2)
+        bumps.flush()
+        self.assertEqual(current_version()[0], before + 2)
+
+
+class MetricsTests(SimpleTestCase):
+    def test_quantiles_interpolate_inside_buckets(self):
+        histogram = Histogram((1, 2, 5))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.5, 1.5, 1.5, 4):
+            histogram.observe(value)
+        self.assertEqual(histogram.quantile(0.25), 1.0)
+        self.assertEqual(histogram.quantile(0.5), 1.5)
+        self.assertEqual(histogram.quantile(1.0), 5.0)
+        # Values past the last bound only say "more than 5"
+        histogram.observe(100)
+        self.assertEqual(histogram.quantile(1.0), 5)
+        self.assertEqual(list(histogram.cumulative()), [(1, 1), (2, 3), (5, 4), (float("inf"), 5)])
+
+    def test_prometheus_text(self):
+        metrics = MetricsRegistry()
+        metrics.record_request('list "all"', 0.02)
+        metrics.record_queries('list "all"', 3, 0.004, 1, {"SELECT 1": 2, "SELECT 2": 1})
+        lines = prometheus_text(metrics.snapshot()).splitlines()
+        for line in [
+            "# TYPE clinic_requests_total counter",
+            'clinic_requests_total{view="list \\"all\\""} 1',
+            "# TYPE clinic_request_duration_seconds histogram",
+            'clinic_request_duration_seconds_bucket{view="list \\"all\\"",le="0.01"} 0',
+            'clinic_request_duration_seconds_bucket{view="list \\"all\\"",le="0.025"} 1',
+            'clinic_request_duration_seconds_bucket{view="list \\"all\\"",le="+Inf"} 1',
+            'clinic_request_duration_seconds_count{view="list \\"all\\""} 1',
+            'clinic_request_sql_queries_sum{view="list \\"all\\""} 3.0',
+            'clinic_duplicate_queries_total{view="list \\"all\\""} 1',
+            'clinic_similar_queries_total{view="list \\"all\\""} 1',
+        ]:
+            self.assertIn(line, lines)
+
+
+@primary_reads
+@override_settings(
+    MIDDLEWARE=["clinic.middleware.QueryProfilingMiddleware", *settings.MIDDLEWARE],
+    CLINIC_PROFILING_SAMPLE_RATE=1.0,
+)
+class QueryProfilingTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.patient = make_patient(1)
+
+    def stats(self, view):
+        return dict(registry.snapshot())[view]
+
+    def test_metrics_view(self):
+        self.client.get("/patients/")
+        self.assertEqual(self.stats("patient_list").requests, 1)
+        self.assertGreater(self.stats("patient_list").sql_count.total, 0)
+
+        response = self.client.get("/metrics/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/metrics/")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4")
+        self.assertIn('clinic_requests_total{view="patient_list"} 1', response.content.decode().splitlines())
+
+    # Only async-capable middleware, so the request stays on the event loop
+    # and the ORM calls run in sync_to_async threads
+    @override_settings(MIDDLEWARE=["clinic.middleware.QueryProfilingMiddleware"])
+    async def test_async_view_queries_are_counted(self):
+        response = await self.async_client.get(f"/api/async/patients/{self.patient.pk}/")
+        self.assertEqual(response.status_code, 200)
+        stats = self.stats("async_patient_detail_api")
+        self.assertEqual(stats.requests, 1)
+        self.assertGreater(stats.sql_count.total, 0)
+
+
+class StartupTests(SimpleTestCase):
+    def test_parse_importtime(self):
+        lines = [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       153 |     181204 |   django.core.wsgi",
+            "Traceback (most recent call last):",
+        ]
+        self.assertEqual(parse_importtime(lines), [("django.core.wsgi", 153, 181204)])
+
+    def test_warm_templates_compiles_every_page(self):
+        self.assertGreaterEqual(warm_templates(), 10)
+
+    def test_lazy_resolver_waits_for_first_use(self):
+        def lazy():
+            return LazyURLResolver(RoutePattern("lazy/", is_endpoint=False), "clinic.urls", app_name="lazy", namespace="lazy")
+
+        resolving = lazy()
+        root = URLResolver(RegexPattern(r"^/"), [resolving])
+        self.assertIn("lazy", root.namespace_dict)
+        self.assertNotIn("urlconf_module", resolving.__dict__)
+        self.assertEqual(root.resolve("/lazy/patients/").url_name, "patient_list")
+
+        reversing = lazy()
+        URLResolver(RegexPattern(r"^/"), [reversing]).namespace_dict
+        self.assertEqual(reversing._reverse_with_prefix("patient_list", "/lazy/"), "/lazy/patients/")
+
+
+class PatientSearchTests(TestCase):
+    def patient(self, chart, first, last, phone="555-0100"):
+        return Patient.objects.create(
+            chart_number=chart, first_name=first, last_name=last, date_of_birth=date(1980, 1, 1), phone=phone
+        )
+
+    def test_ranks_exact_then_prefix_then_typo(self):
+        exact = self.patient("S-1", "Ann", "Smith")
+        prefix = self.patient("S-2", "Bob", "Smithers")
+        typo = self.patient("S-3", "Cat", "Smyth")
+        self.patient("S-4", "Dan", "Jones")
+        self.assertEqual(search_patients(name="smith"), [exact, prefix, typo])
+
+    def test_every_name_token_must_match(self):
+        ann = self.patient("S-1", "Ann", "Smith")
+        self.patient("S-2", "Bob", "Smith")
+        self.assertEqual(search_patients(name="ann smith"), [ann])
+
+    def test_phone_matches_leading_or_trailing_digits(self):
+        first = self.patient("S-1", "Ann", "Smith", phone="(555) 123-4567")
+        second = self.patient("S-2", "Bob", "Smith", phone="555.987.4567")
+        self.patient("S-3", "Cat", "Smith", phone="444-123-0000")
+        self.assertEqual(search_patients(phone="555-123"), [first])
+        self.assertEqual(search_patients(phone="4567"), [first, second])
+        self.assertEqual(search_patients(name="bob", phone="4567"), [second])
+        # Too few digits to use the index: the phone criterion is ignored
+        self.assertEqual(len(search_patients(name="smith", phone="45")), 3)
+
+
+class PatientImportTests(TestCase):
+    def row(self, first, last, dob, phone):
+        return {"first_name": first, "last_name": last, "date_of_birth": dob, "phone": phone}
+
+    def test_import_allocates_charts_and_skips_duplicates(self):
+        existing = make_patient(1)
+        index_patient(existing)
+        rows = [
+            self.row("Ada", "Lovelace", "1815-12-10", "555-123-4567"),
+            # Same DOB and phone as the first row
+            self.row("Augusta", "King", "1815-12-10", "(555) 123 4567"),
+            # Same last name, first initial and DOB as the existing patient
+            self.row("Fred", "Last1", "1980-01-01", "555-999-0000"),
+            self.row("Bad", "Date", "1980-02-30", "555-000-1111"),
+            self.row("Grace", "Hopper", "1906-12-09", "555-765-4321"),
+        ]
+        results = import_patients(rows, start_index=10)
+
+        self.assertEqual([r.status for r in results], [CREATED, DUPLICATE, DUPLICATE, INVALID, CREATED])
+        self.assertTrue(results[1].duplicate_of.startswith("row 10 "))
+        self.assertTrue(results[2].duplicate_of.startswith(f"patient {existing.pk} "))
+        first, second = int(results[0].chart_number[2:]), int(results[4].chart_number[2:])
+        self.assertEqual(second, first + 1)
+        self.assertEqual([p.pk for p in search_patients(name="hopper")], [results[4].patient_id])
+
+        # Imported rows are indexed, so a later chunk sees them as duplicates
+        again = import_patients([self.row("Grace", "Hopper", "1906-12-09", "555-765-4321")])
+        self.assertEqual(again[0].status, DUPLICATE)
+
+
+@primary_reads
+class JsonApiTests(TestCase):
+    def setUp(self):
+        self.patients = [make_patient(n) for n in range(3)]
+
+    def test_field_selection_and_pagination(self):
+        response = self.client.get("/api/v1/patients/", {"fields": "id,chart_number", "page_size": 2})
+        body = response.json()
+        self.assertEqual(body["results"], [{"id": p.pk, "chart_number": p.chart_number} for p in self.patients[:2]])
+        body = self.client.get("/api/v1/patients/", {"fields": "id", "cursor": body["next"]}).json()
+        self.assertEqual(body, {"results": [{"id": self.patients[2].pk}], "next": None})
+        self.assertEqual(self.client.get("/api/v1/patients/", {"fields": "ssn"}).status_code, 400)
+
+    def test_conditional_get(self):
+        url = f"/api/v1/patients/{self.patients[0].pk}/"
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+        listing = self.client.get("/api/v1/patients/")
+        self.assertEqual(self.client.get("/api/v1/patients/", HTTP_IF_NONE_MATCH=listing["ETag"]).status_code, 304)
+
+        self.patients[0].phone = "555-0199"
+        self.patients[0].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+        self.assertEqual(self.client.get("/api/v1/patients/", HTTP_IF_NONE_MATCH=listing["ETag"]).status_code, 200)
+
+    def test_updated_since_feed(self):
+        since = timezone.now()
+        changed = self.patients[1]
+        changed.first_name = "Changed"
+        changed.save()
+        with override_settings(CLINIC_API_FEED_SKEW_SECONDS=0):
+            body = self.client.get("/api/v1/patients/", {"updated_since": since.isoformat(), "fields": "id"}).json()
+        self.assertEqual(body["results"], [{"id": changed.pk}])
+        self.assertEqual(body["last_updated"], Patient.objects.get(pk=changed.pk).updated_at.isoformat())
+
+    def test_updated_since_feed_lags_by_skew_window(self):
+        since = timezone.now()
+        changed = self.patients[1]
+        changed.save()
+        body = self.client.get("/api/v1/patients/", {"updated_since": since.isoformat(), "fields": "id"}).json()
+        # A row stamped just before `changed` may still be committing, so the
+        # next poll starts from before the window and sees `changed` again
+        last_updated = datetime.fromisoformat(body["last_updated"])
+        self.assertLessEqual(last_updated, timezone.now() - timedelta(seconds=30))
+        body = self.client.get("/api/v1/patients/", {"updated_since": body["last_updated"], "fields": "id"}).json()
+        self.assertIn({"id": changed.pk}, body["results"])
+
+
+class AutocompleteWidgetTests(TestCase):
+    def test_invalid_selected_value_is_dropped(self):
+        provider = Provider.objects.create(name="Dr. Widget")
+        start = timezone.localtime().replace(microsecond=0) + timedelta(days=1)
+        form = AppointmentForm(data={
+            "patient": "abc", "provider": str(provider.pk), "status": "scheduled",
+            "start_time": start.strftime("%Y-%m-%dT%H:%M"),
+            "end_time": (start + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M"),
+        })
+        self.assertFalse(form.is_valid())
+        html = str(form["patient"]) + str(form["provider"])
+        self.assertIn(f'<option value="{provider.pk}" selected>Dr. Widget</option>', html)
+        self.assertNotIn('value="abc"', html)
+
+
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pw"))
+        self.provider = Provider.objects.create(name="Dr. Admin")
+        start = timezone.now().replace(microsecond=0)
+        self.appointments = [
+            Appointment.objects.create(
+                patient=make_patient(n),
+                provider=self.provider,
+                start_time=start + timedelta(hours=n),
+                end_time=start + timedelta(hours=n, minutes=30),
+            )
+            for n in range(5)
+        ]
+
+    def test_keyset_pages(self):
+        url = "/admin/clinic/appointment/"
+        with patch.object(AppointmentAdmin, "list_per_page", 3):
+            first = self.client.get(url)
+            self.assertEqual([a.pk for a in first.context["cl"].result_list], [a.pk for a in self.appointments[:3]])
+            second = self.client.get(url + first.context["cl"].keyset_links["next"])
+        self.assertEqual([a.pk for a in second.context["cl"].result_list], [a.pk for a in self.appointments[3:]])
+        self.assertNotIn("next", second.context["cl"].keyset_links)
+        # The provider filter is one <select> fed by the autocomplete endpoint
+        self.assertContains(second, 'data-autocomplete-url="/api/providers/autocomplete/"')
+
+    def test_count_is_capped(self):
+        with override_settings(CLINIC_ADMIN_COUNT_LIMIT=3):
+            paginator = EstimatedCountPaginator(Appointment.objects.filter(status="scheduled").order_by("id"), 2)
+            self.assertEqual((paginator.count, paginator.capped), (3, True))
+        paginator = EstimatedCountPaginator(Appointment.objects.order_by("id"), 2)
+        self.assertEqual((paginator.count, paginator.capped), (5, False))
+
+    def test_search_uses_patient_index(self):
+        response = self.client.get("/admin/clinic/appointment/", {"q": "last3"})
+        self.assertEqual([a.pk for a in response.context["cl"].result_list], [self.appointments[3].pk])
+        response = self.client.get("/admin/clinic/patient/", {"q": "T-4"})
+        self.assertEqual([p.chart_number for p in response.context["cl"].result_list], ["T-4"])
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Outbox")
+        self.patient = make_patient(1)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        # Ids don't restart at 1 per test (MySQL keeps AUTO_INCREMENT across
+        # rollbacks), so readers start just before the patient's event
+        self.after = OutboxEvent.objects.get().id - 1
+
+    def events(self):
+        return list(OutboxEvent.objects.order_by("id").values_list("entity", "entity_id", "event"))
+
+    def test_changes_write_events_in_their_transaction(self):
+        appointment = save_appointment(Appointment(
+            patient=self.patient, provider=self.provider,
+            start_time=self.start, end_time=self.start + timedelta(minutes=30),
+        ))
+        self.client.post(f"/appointments/{appointment.pk}/cancel/")
+        try:
+            with transaction.atomic():
+                make_patient(2)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self.events(), [
+            ("patient", self.patient.pk, "created"),
+            ("appointment", appointment.pk, "created"),
+            ("appointment", appointment.pk, "canceled"),
+        ])
+        self.assertEqual(OutboxEvent.objects.last().payload["status"], "canceled")
+
+        results = bulk_book([{
+            "patient_id": self.patient.pk, "provider_id": self.provider.pk,
+            "start_time": self.start + timedelta(hours=2), "end_time": self.start + timedelta(hours=3),
+        }])
+        self.assertEqual(self.events()[-1], ("appointment", results[0].appointment.pk, "created"))
+
+    def test_delivery_is_at_least_once(self):
+        def failing(messages):
+            raise OSError("disk full")
+
+        OutboxCursor.objects.create(name="billing", position=self.after)
+        with self.assertRaises(OSError):
+            deliver("billing", failing)
+        self.assertEqual(OutboxCursor.objects.get(name="billing").position, self.after)
+
+        received = []
+        self.assertEqual(deliver("billing", received.extend), 1)
+        self.assertEqual(deliver("billing", received.extend), 0)
+        self.assertEqual([m["entity_id"] for m in received], [self.patient.pk])
+        self.assertEqual(OutboxCursor.objects.get(name="billing").position, received[-1]["id"])
+
+    def test_reader_waits_at_recent_gap(self):
+        first = OutboxEvent.objects.get()
+        second, third = make_patient(2), make_patient(3)
+        OutboxEvent.objects.filter(entity_id=second.pk).delete()
+        self.assertEqual([e.id for e in ready_events(self.after, 10)], [first.id])
+        self.assertEqual(
+            [e.entity_id for e in ready_events(self.after, 10, settle_seconds=0)], [self.patient.pk, third.pk]
+        )
+
+    def test_gap_filled_after_settle_window_is_still_sent(self):
+        second, third = make_patient(2), make_patient(3)
+        # The second patient's transaction is still open: its event id is taken but not visible
+        pending = OutboxEvent.objects.get(entity_id=second.pk)
+        OutboxEvent.objects.filter(pk=pending.pk).delete()
+        OutboxEvent.objects.filter(entity_id=third.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        OutboxCursor.objects.create(name="billing", position=self.after)
+
+        received = []
+        self.assertEqual(deliver("billing", received.extend), 2)
+        self.assertEqual([m["entity_id"] for m in received], [self.patient.pk, third.pk])
+        cursor = OutboxCursor.objects.get(name="billing")
+        self.assertEqual(cursor.position, received[-1]["id"])
+        self.assertEqual([gap[:2] for gap in cursor.gaps], [[pending.id, pending.id]])
+        self.assertEqual(deliver("billing", received.extend), 0)
+
+        # It commits long after the reader moved on
+        OutboxEvent.objects.bulk_create([pending])
+        self.assertEqual(deliver("billing", received.extend), 1)
+        self.assertEqual(received[-1]["id"], pending.id)
+        self.assertEqual(OutboxCursor.objects.get(name="billing").gaps, [])
+        self.assertEqual(deliver("billing", received.extend), 0)
+
+    @override_settings(CLINIC_OUTBOX_GAP_SECONDS=0)
+    def test_gap_is_given_up_after_gap_seconds(self):
+        second, third = make_patient(2), make_patient(3)
+        OutboxEvent.objects.filter(entity_id=second.pk).delete()
+        OutboxEvent.objects.filter(entity_id=third.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        OutboxCursor.objects.create(name="billing", position=self.after)
+        received = []
+        self.assertEqual(deliver("billing", received.extend), 2)
+        self.assertEqual(len(OutboxCursor.objects.get(name="billing").gaps), 1)
+        self.assertEqual(deliver("billing", received.extend), 0)
+        self.assertEqual(OutboxCursor.objects.get(name="billing").gaps, [])
+
+    def test_stream_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/events.ndjson"
+            call_command(
+                "stream_outbox", "--output", path, "--consumer", "analytics", "--from-id", self.after,
+                stderr=StringIO(),
+            )
+            make_patient(2)
+            call_command("stream_outbox", "--output", path, "--consumer", "analytics", stderr=StringIO())
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        self.assertEqual([line["data"]["chart_number"] for line in lines], ["T-1", "T-2"])
+
+
+class FlakyTransport:
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, message):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("SMTP unavailable")
+        self.sent.append(message)
+
+    def close(self):
+        pass
+
+
+class InlinePool:
+    """Runs the sends on the test's thread (and database connection)."""
+
+    def map(self, fn, items):
+        return [fn(item) for item in items]
+
+
+@primary_reads
+class ReminderTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Remind")
+        self.patient = make_patient(1)
+        now = timezone.now().replace(microsecond=0)
+        self.soon = Appointment.objects.create(
+            patient=self.patient, provider=self.provider,
+            start_time=now + timedelta(hours=2), end_time=now + timedelta(hours=3),
+        )
+        # Outside the 24 hour lead time
+        Appointment.objects.create(
+            patient=self.patient, provider=self.provider,
+            start_time=now + timedelta(days=3), end_time=now + timedelta(days=3, hours=1),
+        )
+
+    def test_sent_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            dispatcher = Dispatcher(FileTransport(f"{directory}/out.ndjson"), workers=2, rate=0)
+            self.assertEqual(dispatcher.tick(), {Reminder.SENT: 1})
+            self.assertEqual(dispatcher.tick(), {})
+            dispatcher.close()
+            with open(f"{directory}/out.ndjson") as f:
+                messages = [json.loads(line) for line in f]
+        self.assertEqual(len(messages), 1)
+        self.assertIn("Dr. Remind", messages[0]["body"])
+        self.assertEqual(schedule_due(), 0)
+
+        # A moved appointment is due again for its new time
+        self.soon.start_time += timedelta(hours=1)
+        self.soon.end_time += timedelta(hours=1)
+        self.soon.save()
+        self.assertEqual(schedule_due(), 1)
+
+    def test_retry_then_skip_canceled(self):
+        transport = FlakyTransport(failures=1)
+        dispatcher = Dispatcher(transport, workers=2, rate=0)
+        self.assertEqual(dispatcher.tick(), {Reminder.PENDING: 1})
+        reminder = Reminder.objects.get()
+        self.assertEqual((reminder.attempts, reminder.last_error), (1, "ConnectionError: SMTP unavailable"))
+        self.assertEqual(dispatcher.tick(now=reminder.next_attempt_at), {Reminder.SENT: 1})
+        self.assertEqual(len(transport.sent), 1)
+
+        other = make_patient(2)
+        now = timezone.now()
+        canceled = Appointment.objects.create(
+            patient=other, provider=self.provider,
+            start_time=now + timedelta(hours=5), end_time=now + timedelta(hours=6),
+        )
+        schedule_due()
+        canceled.status = "canceled"
+        canceled.save()
+        self.assertEqual(dispatcher.tick(), {Reminder.SKIPPED: 1})
+        dispatcher.close()
+
+    def test_expired_lease_is_left_to_the_new_claimant(self):
+        schedule_due()
+        batch = claim()
+        # Another dispatcher claims the batch once its lease has run out
+        expired = batch[0].next_attempt_at
+        self.assertEqual(len(claim(now=expired)), 1)
+        transport = FlakyTransport(failures=0)
+        self.assertEqual(dispatch(batch, transport, InlinePool(), RateLimiter(0)), {"lease_lost": 1})
+        self.assertEqual(transport.sent, [])
+        reminder = Reminder.objects.get()
+        self.assertEqual((reminder.status, reminder.attempts), (Reminder.SENDING, 0))
+        self.assertNotEqual(reminder.claimed_by, batch[0].claimed_by)
+
+    def test_outcome_not_recorded_after_lease_lost_while_sending(self):
+        schedule_due()
+        batch = claim()
+        expired = batch[0].next_attempt_at
+
+        class SlowTransport(FlakyTransport):
+            def send(self, message):
+                super().send(message)
+                claim(now=expired)
+
+        transport = SlowTransport(failures=0)
+        self.assertEqual(dispatch(batch, transport, InlinePool(), RateLimiter(0)), {"lease_lost": 1})
+        self.assertEqual(len(transport.sent), 1)
+        reminder = Reminder.objects.get()
+        self.assertEqual((reminder.status, reminder.sent_at), (Reminder.SENDING, None))
+
+    def test_rate_limiter(self):
+        clock = [0.0]
+        waits = []
+        limiter = RateLimiter(2, burst=1, clock=lambda: clock[0], sleep=waits.append)
+        limiter.acquire()
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(waits, [0.5, 1.0])
+
+
+@primary_reads
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        clear_all()
+        self.provider = Provider.objects.create(name="Dr. Fragment")
+        self.patients = [make_patient(n) for n in range(3)]
+        # 9:00 tomorrow, so every appointment falls on one day of the schedule week
+        tomorrow = timezone.localtime() + timedelta(days=1)
+        start = self.start = tomorrow.replace(hour=9, minute=0, second=0, microsecond=0)
+        for n, patient in enumerate(self.patients):
+            Appointment.objects.create(
+                patient=patient, provider=self.provider,
+                start_time=start + timedelta(hours=n), end_time=start + timedelta(hours=n, minutes=30),
+            )
+
+    def test_rows_are_cached_until_updated(self):
+        self.client.get("/appointments/")
+        reset_cache_stats()
+        response = self.client.get("/appointments/")
+        self.assertEqual(cache_stats()["fragments"], (3, 0))
+        self.assertContains(response, "Last1, First1")
+
+        # A renamed patient changes the appointment row's key
+        self.patients[1].last_name = "Renamed"
+        self.patients[1].save()
+        response = self.client.get("/appointments/")
+        self.assertContains(response, "Renamed, First1")
+        self.assertNotContains(response, "Last1, First1")
+
+    @override_settings(CLINIC_STREAM_CHUNK_ROWS=1)
+    def test_long_page_is_streamed(self):
+        response = self.client.get("/patients/", {"page_size": 2})
+        self.assertTrue(response.streaming)
+        html = b"".join(response.streaming_content).decode()
+        self.assertEqual(html.count("<tr>"), 3)
+        self.assertIn("&amp;page_size=2", html)
+        self.assertNotIn(ROWS_MARKER, html)
+
+    def test_schedule_cells(self):
+        response = self.client.get(
+            "/calendar/schedule/", {"provider": self.provider.pk, "date": timezone.localdate(self.start).isoformat()},
+        )
+        self.assertContains(response, "Last2, First2")
+        self.assertEqual(len(response.context["days"]), 7)
+
+
+@override_settings(
+    CLINIC_SCHEDULE_INDEX_ENABLED=False,
+    CLINIC_DEFAULT_WORKING_HOURS={weekday: [("09:00", "12:00")] for weekday in range(7)},
+)
+class AvailabilityTests(TestCase):
+    day = date(2030, 3, 4)
+
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Free")
+        self.patients = [make_patient(n) for n in range(2)]
+
+    def at(self, hour, minute=0, day=None):
+        return datetime.combine(day or self.day, time(hour, minute), tzinfo=dt_timezone.utc)
+
+    def book(self, patient, start, end):
+        Appointment.objects.create(patient=patient, provider=self.provider, start_time=start, end_time=end)
+
+    def starts(self, provider_ids=None, minutes=30, limit=3, day=None, step=None):
+        day = day or self.day
+        slots = find_free_slots(
+            provider_ids or [self.provider.pk], timedelta(minutes=minutes), day, day, limit=limit, step=step,
+        )
+        return [start for start, _, _ in slots]
+
+    def test_overlapping_busy_merged_and_slots_on_the_grid(self):
+        self.book(self.patients[0], self.at(9), self.at(9, 10))
+        self.book(self.patients[1], self.at(9, 5), self.at(9, 40))
+        # 9:40 is free, but candidates stay on the 15-minute grid from 9:00
+        self.assertEqual(self.starts(), [self.at(9, 45), self.at(10), self.at(10, 15)])
+
+    def test_not_before_now(self):
+        with patch("django.utils.timezone.now", return_value=self.at(10, 7)):
+            self.assertEqual(self.starts(limit=2), [self.at(10, 15), self.at(10, 30)])
+
+    def test_limit_across_providers(self):
+        other = Provider.objects.create(name="Dr. Also")
+        self.book(self.patients[0], self.at(9), self.at(9, 30))
+        slots = find_free_slots([self.provider.pk, other.pk], timedelta(minutes=30), self.day, self.day, limit=3)
+        self.assertEqual(slots, [
+            (self.at(9), other.pk, self.at(9, 30)),
+            (self.at(9, 15), other.pk, self.at(9, 45)),
+            (self.at(9, 30), self.provider.pk, self.at(10)),
+        ])
+
+    @override_settings(CLINIC_DEFAULT_WORKING_HOURS={weekday: [("22:00", "02:00")] for weekday in range(7)})
+    def test_window_across_midnight(self):
+        # The previous evening's shift runs into the day; the day's own shift is cut at midnight
+        self.assertEqual(
+            self.starts(minutes=60, limit=10, step=timedelta(hours=1)),
+            [self.at(0), self.at(1), self.at(22), self.at(23)],
+        )
+
+    @override_settings(CLINIC_DEFAULT_WORKING_HOURS={6: [("00:00", "04:00")]})
+    def test_window_across_dst_change(self):
+        # Clocks go back at 2:00 on Sunday 2030-11-03 in New York: the shift is 5 hours long
+        with timezone.override("America/New_York"):
+            starts = self.starts(minutes=60, limit=10, step=timedelta(hours=1), day=date(2030, 11, 3))
+        self.assertEqual(starts, [self.at(hour, day=date(2030, 11, 3)) for hour in range(4, 9)])
+
+
+class ScheduleNavigationTests(TestCase):
+    databases = {"default", "replica"}
+
+    def dates(self, view, day):
+        response = self.client.get("/calendar/schedule/", {"view": view, "date": day})
+        return response.context["previous_date"], response.context["next_date"]
+
+    def test_month_steps_one_month(self):
+        # 31 days back from March 1 would land in January
+        self.assertEqual(self.dates("month", "2026-03-15"), (date(2026, 2, 1), date(2026, 4, 1)))
+        self.assertEqual(self.dates("month", "2026-01-31"), (date(2025, 12, 1), date(2026, 2, 1)))
+
+    def test_week_steps_one_week(self):
+        self.assertEqual(self.dates("week", "2026-03-18"), (date(2026, 3, 15), date(2026, 3, 23)))
+
+
+@primary_reads
+@override_settings(ALLOWED_HOSTS=["*"])
+class TenantTests(TestCase):
+    def setUp(self):
+        clear_all()
+        self.north = Tenant.objects.create(slug="north", name="North", domain="clinic.north.example")
+        self.south = Tenant.objects.create(slug="south", name="South")
+        with use_tenant(self.north):
+            self.north_patient = make_patient(1)
+        with use_tenant(self.south):
+            self.south_patient = make_patient(2)
+
+    def test_managers_are_scoped_to_the_current_tenant(self):
+        with use_tenant(self.north):
+            self.assertEqual(list(Patient.objects.all()), [self.north_patient])
+            self.assertEqual(Patient.all_tenants.filter(chart_number__startswith="T-").count(), 2)
+            self.assertIsNone(get_patient(self.south_patient.pk))
+            # Search terms carry their patient's tenant
+            self.assertFalse(PatientSearchTerm.objects.filter(patient=self.south_patient).exists())
+            self.assertNotIn(self.south_patient, search_patients(name="Last2"))
+        self.assertEqual(self.south_patient.tenant_id, self.south.pk)
+
+    def test_forms_only_accept_the_current_tenants_rows(self):
+        with use_tenant(self.south):
+            south_provider = Provider.objects.create(name="Dr. South")
+        with use_tenant(self.north):
+            north_provider = Provider.objects.create(name="Dr. North")
+            start = timezone.localtime().replace(microsecond=0) + timedelta(days=1)
+            form = AppointmentForm(data={
+                "patient": self.south_patient.pk, "provider": south_provider.pk, "status": "scheduled",
+                "start_time": start.strftime("%Y-%m-%dT%H:%M"),
+                "end_time": (start + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M"),
+            })
+            self.assertFalse(form.is_valid())
+            self.assertEqual(set(form.errors), {"patient", "provider"})
+
+            choices = list(AvailabilitySearchForm().fields["provider"].queryset)
+            self.assertEqual(choices, [north_provider])
+
+    def test_chart_numbers_are_unique_per_tenant(self):
+        with use_tenant(self.south):
+            # T-1 is taken in the north clinic only
+            make_patient(1)
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                make_patient(1)
+
+    def test_daily_summaries_carry_the_providers_tenant(self):
+        with use_tenant(self.south):
+            provider = Provider.objects.create(name="Dr. South")
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        # Booked and rebuilt from outside any clinic
+        Appointment.objects.create(
+            patient=self.south_patient, provider=provider, start_time=start, end_time=start + timedelta(minutes=30),
+        )
+        self.assertEqual(ProviderDailySummary.all_tenants.get().tenant_id, self.south.pk)
+        rebuild_summaries()
+        self.assertEqual(ProviderDailySummary.all_tenants.get().tenant_id, self.south.pk)
+        with use_tenant(self.north):
+            self.assertFalse(ProviderDailySummary.objects.exists())
+
+    def test_search_index_is_rebuilt_per_tenant(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(rebuild_index(), 2)
+        deletes = [q["sql"] for q in queries if q["sql"].startswith("DELETE") and "patientsearchterm" in q["sql"]]
+        self.assertTrue(deletes)
+        self.assertTrue(all("tenant_id" in sql for sql in deletes))
+        with use_tenant(self.north):
+            self.assertEqual(search_patients(name="Last1"), [self.north_patient])
+
+    def test_host_selects_the_tenant(self):
+        response = self.client.get("/patients/", HTTP_HOST="clinic.north.example")
+        self.assertContains(response, "Last1, First1")
+        self.assertNotContains(response, "Last2, First2")
+
+        response = self.client.get("/patients/", HTTP_HOST="south.clinics.example:8000")
+        self.assertContains(response, "Last2, First2")
+        self.assertNotContains(response, "Last1, First1")
+
+        # Another tenant's patient is not found
+        response = self.client.get(f"/patients/{self.north_patient.pk}/edit/", HTTP_HOST="south.clinics.example")
+        self.assertEqual(response.status_code, 404)
+
+    def test_unknown_host(self):
+        response = self.client.get("/patients/", HTTP_HOST="elsewhere.example")
+        self.assertNotContains(response, "Last1, First1")
+        self.assertEqual(response.wsgi_request.tenant.slug, "default")
+        with override_settings(CLINIC_TENANT_REQUIRED=True):
+            response = self.client_class().get("/patients/", HTTP_HOST="elsewhere.example")
+        self.assertEqual(response.status_code, 404)
+
+
+class EditConcurrencyTests(TestCase):
+    def setUp(self):
+        self.provider = Provider.objects.create(name="Dr. Version")
+        self.patient = make_patient(1)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.appointment = save_appointment(Appointment(
+            patient=self.patient, provider=self.provider, start_time=start, end_time=start + timedelta(minutes=30),
+        ))
+
+    def patient_data(self, **changes):
+        data = {
+            "first_name": "First1", "last_name": "Last1", "date_of_birth": "1980-01-01",
+            "phone": "555-0100", "email": "", "version": 1,
+        }
+        return {**data, **changes}
+
+    def test_edit_updates_changed_fields_only(self):
+        self.assertContains(self.client.get(f"/patients/{self.patient.pk}/edit/"), 'name="version" value="1"')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f"/patients/{self.patient.pk}/edit/", self.patient_data(phone="555-0199"))
+        self.assertEqual(response.status_code, 302)
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "clinic_patient"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn("first_name", updates[0])
+        self.patient.refresh_from_db()
+        self.assertEqual((self.patient.phone, self.patient.version), ("555-0199", 2))
+
+    def test_stale_edit_shows_conflict(self):
+        # Another clerk saves first
+        self.client.post(f"/patients/{self.patient.pk}/edit/", self.patient_data(last_name="Theirs"))
+        response = self.client.post(f"/patients/{self.patient.pk}/edit/", self.patient_data(phone="555-0199"))
+        self.assertContains(response, "Someone else saved this patient")
+        self.assertEqual(response.context["conflicts"], [("Last name", "Theirs"), ("Phone", "555-0100")])
+        self.patient.refresh_from_db()
+        self.assertEqual((self.patient.last_name, self.patient.phone), ("Theirs", "555-0100"))
+
+        # Saving again from the conflict page overwrites deliberately
+        response = self.client.post(f"/patients/{self.patient.pk}/edit/", self.patient_data(phone="555-0199", version=2))
+        self.assertEqual(response.status_code, 302)
+        self.patient.refresh_from_db()
+        self.assertEqual((self.patient.last_name, self.patient.phone, self.patient.version), ("Last1", "555-0199", 3))
+
+    def test_cancel_updates_conditionally_then_reads_back(self):
+        url = f"/appointments/{self.appointment.pk}/cancel/"
+        self.appointment.reason = "Moved by someone else"
+        self.appointment.save()
+        response = self.client.post(url, {"version": 1})
+        self.assertContains(response, "Someone else changed this appointment")
+        self.assertContains(response, 'name="version" value="2"')
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {"version": 2})
+        self.assertEqual(response.status_code, 302)
+        statements = [q["sql"] for q in ctx.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertTrue(statements[0].startswith('UPDATE "clinic_appointment"'))
+        self.assertTrue(statements[1].startswith('SELECT "clinic_appointment"'))
+        self.appointment.refresh_from_db()
+        self.assertEqual((self.appointment.status, self.appointment.version), ("canceled", 3))
+        summary = ProviderDailySummary.objects.get(provider=self.provider)
+        self.assertEqual((summary.booked_count, summary.canceled_count), (0, 1))
+        self.assertEqual(OutboxEvent.objects.last().event, OutboxEvent.CANCELED)
+
+        # A second cancel changes nothing
+        response = self.client.post(url, {"version": 3})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(OutboxEvent.objects.filter(event=OutboxEvent.CANCELED).count(), 1)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 urlpatterns = [
     # Patients
@@ -7,7 +7,9 @@ urlpatterns = [
     path("patients/", views.patient_list, name="patient_list"),
     path("patients/new/", views.patient_create, name="patient_create"),
     path("patients/<int:patient_id>/edit/", views.patient_edit, name="patient_edit"),
+    path("patients/<int:patient_id>/history/", views.patient_history, name="patient_history"),
     path("patients/search/", views.patient_search, name="patient_search"),
+    path("api/patients/autocomplete/", views.patient_autocomplete, name="patient_autocomplete"),
 
     # Appointments
     path("appointments/", views.appointment_list, name="appointment_list"),
@@ -17,4 +19,33 @@ urlpatterns = [
 
     # Provider calendar
     path("calendar/", views.provider_calendar, name="provider_calendar"),
+    path("calendar/schedule/", views.provider_schedule, name="provider_schedule"),
+    path("calendar/availability/", views.provider_availability, name="provider_availability"),
+    path("api/calendar/", views.provider_schedule_api, name="provider_schedule_api"),
+    path("api/providers/autocomplete/", views.provider_autocomplete, name="provider_autocomplete"),
+
+    # Reports
+    path("reports/utilization/", views.utilization_report, name="utilization_report"),
+
+    # Async (ASGI) views and JSON API
+    path("async/patients/search/", async_views.patient_search, name="async_patient_search"),
+    path("async/appointments/", async_views.appointment_list, name="async_appointment_list"),
+    path("async/calendar/", async_views.provider_calendar, name="async_provider_calendar"),
+    path("api/async/patients/<int:patient_id>/", async_views.patient_detail_api, name="async_patient_detail_api"),
+    path("api/async/patients/<int:patient_id>/appointments/", async_views.patient_appointments_api,
+         name="async_patient_appointments_api"),
+    path("api/async/appointments/", async_views.appointment_list_api, name="async_appointment_list_api"),
+    path("api/async/appointments/book/", async_views.appointment_book_api, name="async_appointment_book_api"),
+
+    # Read-only JSON API (see clinic/api.py)
+    path("api/v1/patients/", api.resource_list, {"resource": "patients"}, name="api_patient_list"),
+    path("api/v1/patients/<int:pk>/", api.resource_detail, {"resource": "patients"}, name="api_patient_detail"),
+    path("api/v1/providers/", api.resource_list, {"resource": "providers"}, name="api_provider_list"),
+    path("api/v1/providers/<int:pk>/", api.resource_detail, {"resource": "providers"}, name="api_provider_detail"),
+    path("api/v1/appointments/", api.resource_list, {"resource": "appointments"}, name="api_appointment_list"),
+    path("api/v1/appointments/<int:pk>/", api.resource_detail, {"resource": "appointments"},
+         name="api_appointment_detail"),
+
+    # Monitoring
+    path("metrics/", views.metrics, name="metrics"),
 ]
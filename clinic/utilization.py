@@ -0,0 +1,212 @@
+"""
+Provider utilization from the ProviderDailySummary table.
+
+Every appointment contributes to the summary row of its provider and
+(local) start date: booked_count/minutes while scheduled,
+canceled_count/minutes once canceled. Appointment signals apply the
+difference between an appointment's loaded and saved state with F()
+updates inside the saving transaction, so create, edit (including
+moving to another provider or day) and cancel keep the rows current.
+Paths that skip signals (bulk booking, synthetic data) call
+record_appointments() or rebuild_summaries() instead. Archiving moves a
+row without changing its summary.
+
+Capacity comes from working hours (clinic.availability.working_hours) at
+report time, so changing someone's hours doesn't require a rebuild.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Max, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .availability import working_hours
+from .models import Appointment, AppointmentArchive, Provider, ProviderDailySummary
+from .routers import use_primary
+from .schedule import date_range, day_bounds
+
+COUNTERS = ["booked_count", "booked_minutes", "canceled_count", "canceled_minutes"]
+GROUPS = ["total", "month", "week", "day"]
+
+
+def summary_state(appointment):
+    return (appointment.provider_id, appointment.start_time, appointment.end_time, appointment.status)
+
+
+def contribution(provider_id, start_time, end_time, status):
+    """{(provider_id, date): Counter} that an appointment in this state adds to the summaries."""
+    if not (provider_id and start_time and end_time) or status not in ("scheduled", "canceled"):
+        return {}
+    prefix = "booked" if status == "scheduled" else "canceled"
+    minutes = int((end_time - start_time).total_seconds() // 60)
+    day = timezone.localtime(start_time).date()
+    return {(provider_id, day): Counter({f"{prefix}_count": 1, f"{prefix}_minutes": minutes})}
+
+
+def _totals(states, sign=1, totals=None):
+    totals = totals if totals is not None else defaultdict(Counter)
+    for state in states:
+        for key, counts in contribution(*state).items():
+            for field, value in counts.items():
+                totals[key][field] += sign * value
+    return totals
+
+
+def _apply(provider_id, day, delta):
+    updates = {field: F(field) + value for field, value in delta.items()}
+    rows = ProviderDailySummary.all_tenants.filter(provider_id=provider_id, date=day)
+    if rows.update(**updates):
+        return
+    tenant_id = Provider.all_tenants.filter(pk=provider_id).values_list("tenant_id", flat=True).get()
+    try:
+        with transaction.atomic():
+            ProviderDailySummary.all_tenants.create(tenant_id=tenant_id, provider_id=provider_id, date=day, **delta)
+    except IntegrityError:
+        # Someone created the row between our UPDATE and INSERT
+        rows.update(**updates)
+
+
+def apply_changes(old_states, new_states):
+    """Move summaries from the appointments' old (provider, start, end, status) states to the new ones."""
+    totals = _totals(old_states, sign=-1, totals=_totals(new_states))
+    for (provider_id, day), delta in totals.items():
+        delta = {field: value for field, value in delta.items() if value}
+        if delta:
+            _apply(provider_id, day, delta)
+
+
+def record_appointments(appointments):
+    """Add newly inserted appointments (e.g. after bulk_create) to the summaries."""
+    apply_changes([], [summary_state(a) for a in appointments])
+
+
+# --------- Rebuild --------- #
+
+def _month_starts(first, last):
+    month = first.replace(day=1)
+    while month <= last:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def rebuild_summaries(start_date=None, end_date=None, stdout=None):
+    """
+    Recompute summaries from the live and archived appointments for
+    start_date..end_date (default: everything), one month per transaction.
+    Returns the number of summary rows written.
+    """
+    if start_date is None or end_date is None:
+        bounds = [
+            qs.aggregate(first=Min("start_time"), last=Max("start_time"))
+            for qs in (Appointment.all_tenants.all(), AppointmentArchive.all_tenants.all())
+        ]
+        firsts = [timezone.localtime(b["first"]).date() for b in bounds if b["first"]]
+        lasts = [timezone.localtime(b["last"]).date() for b in bounds if b["last"]]
+        if not firsts:
+            return 0
+        start_date = start_date or min(firsts)
+        end_date = end_date or max(lasts)
+
+    tenants = dict(Provider.all_tenants.values_list("id", "tenant_id"))
+    written = 0
+    for month in _month_starts(start_date, end_date):
+        first = max(month, start_date)
+        last = min((month + timedelta(days=32)).replace(day=1) - timedelta(days=1), end_date)
+        range_start, range_end = day_bounds(first, last)
+        with use_primary(), transaction.atomic():
+            totals = defaultdict(Counter)
+            for qs in (Appointment.all_tenants.all(), AppointmentArchive.all_tenants.all()):
+                states = qs.filter(start_time__gte=range_start, start_time__lt=range_end).values_list(
+                    "provider_id", "start_time", "end_time", "status"
+                )
+                _totals(states.iterator(chunk_size=5000), totals=totals)
+            ProviderDailySummary.all_tenants.filter(date__range=(first, last)).delete()
+            ProviderDailySummary.all_tenants.bulk_create(
+                [
+                    ProviderDailySummary(tenant_id=tenants[provider_id], provider_id=provider_id, date=day, **counts)
+                    for (provider_id, day), counts in totals.items()
+                ],
+                batch_size=2000,
+            )
+        written += len(totals)
+        if stdout:
+            stdout.write(f"  {month:%Y-%m}: {len(totals)} provider-days")
+    return written
+
+
+# --------- Report --------- #
+
+def period_start(day, group, start_date):
+    if group == "day":
+        return day
+    if group == "week":
+        return day - timedelta(days=day.weekday())
+    if group == "month":
+        return day.replace(day=1)
+    return start_date
+
+
+def _capacity(provider_ids, start_date, end_date, group):
+    """{(provider_id, period): minutes of working hours} for the range."""
+    # Weekday counts per period are shared by every provider
+    weekdays = defaultdict(Counter)
+    for day in date_range(start_date, end_date):
+        weekdays[period_start(day, group, start_date)][day.weekday()] += 1
+
+    capacity = {}
+    for provider_id, hours in working_hours(provider_ids).items():
+        per_weekday = {
+            weekday: sum((end.hour * 60 + end.minute) - (start.hour * 60 + start.minute) for start, end in windows)
+            for weekday, windows in hours.items()
+        }
+        for period, counts in weekdays.items():
+            capacity[(provider_id, period)] = sum(per_weekday.get(wd, 0) * n for wd, n in counts.items())
+    return capacity
+
+
+def utilization_report(start_date, end_date, group="total", providers=None):
+    """
+    Rows of {"provider", "period", counters..., "capacity_minutes",
+    "open_minutes", "utilization"} for every provider (default: all) and
+    period in start_date..end_date, read from the daily summaries only.
+    """
+    qs = ProviderDailySummary.objects.filter(date__range=(start_date, end_date))
+    if providers is None:
+        providers = list(Provider.objects.order_by("name", "id"))
+    else:
+        providers = list(providers)
+        qs = qs.filter(provider_id__in=[p.pk for p in providers])
+    provider_ids = [p.pk for p in providers]
+
+    if group == "month":
+        qs = qs.annotate(period=TruncMonth("date"))
+    elif group == "week":
+        qs = qs.annotate(period=TruncWeek("date"))
+    elif group == "day":
+        qs = qs.annotate(period=F("date"))
+    aggregated = qs.values("provider_id", *(["period"] if group != "total" else [])).annotate(
+        **{field: Sum(field) for field in COUNTERS}
+    ).order_by()
+
+    totals = {(row["provider_id"], row.get("period", start_date)): row for row in aggregated}
+
+    capacity = _capacity(provider_ids, start_date, end_date, group)
+    periods = sorted({period for _, period in capacity})
+    rows = []
+    for provider in providers:
+        for period in periods:
+            counts = totals.get((provider.pk, period), {})
+            booked = counts.get("booked_minutes") or 0
+            available = capacity.get((provider.pk, period), 0)
+            rows.append({
+                "provider": provider,
+                "period": period,
+                **{field: counts.get(field) or 0 for field in COUNTERS},
+                "capacity_minutes": available,
+                "open_minutes": max(available - booked, 0),
+                "utilization": booked / available if available else None,
+            })
+    return rows
@@ -1,28 +1,114 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.contrib import admin
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.contrib import messages
 
-from .models import Patient, Provider, Appointment
-from .forms import PatientForm, PatientSearchForm, AppointmentForm
-
-import uuid
-from datetime import datetime, date
+from .models import Patient, Provider, Appointment, EditConflict
+from .forms import PatientForm, PatientSearchForm, AppointmentForm, AvailabilitySearchForm, UtilizationReportForm
+from .pagination import keyset_paginate
+from .exports import EXPORT_FORMATS, stream_export
+from .fragments import render_cells, render_rows, stream_page
+from .search import prefix_search, search_patients
+from .booking import cancel_appointment, save_appointment
+from .availability import find_free_slots
+from .schedule import date_range, get_schedule
+from .archive import history_page
+from .chart_numbers import next_chart_number
+from .caching import cache_stats, get_providers, reset_cache_stats
+from .routers import read_replica
+from .utilization import utilization_report as build_utilization_report
+from . import metrics as clinic_metrics
+
+from datetime import datetime, date, timedelta
 
 def base(request):
     return render(request, "clinic/base.html")
 
+
+def _page_size():
+    return getattr(settings, "CLINIC_PAGE_SIZE", 50)
+
+
+def _list_page_size(request):
+    """?page_size=N for the long lists, at most CLINIC_LIST_MAX_PAGE_SIZE."""
+    value = request.GET.get("page_size", "")
+    if value.isdigit() and int(value) > 0:
+        return min(int(value), getattr(settings, "CLINIC_LIST_MAX_PAGE_SIZE", 1000))
+    return _page_size()
+
+
+def _render_list(request, template_name, context, page, render_page_rows):
+    """
+    A list page whose rows are cached fragments (clinic/fragments.py).
+    Pages longer than CLINIC_STREAM_CHUNK_ROWS are streamed in chunks.
+    """
+    if request.GET.get("page_size"):
+        context["page_size_query"] = f"&page_size={_list_page_size(request)}"
+    if len(page) > getattr(settings, "CLINIC_STREAM_CHUNK_ROWS", 200):
+        return stream_page(request, template_name, context, page.items, render_page_rows)
+    return render(request, template_name, {**context, "rows": render_page_rows(page.items)})
+
+# --------- Edit conflicts --------- #
+
+EDIT_CONFLICT = (
+    "Someone else saved this {} while you were editing it. Their values are listed below; "
+    "save again to replace them with yours."
+)
+
+
+def _conflict_form(form_class, request, queryset, pk):
+    """
+    After an EditConflict: the user's submission bound to the row as it is
+    now, so saving again overwrites it, with an error and the saved values
+    that differ from the submission as [(label, value)].
+    """
+    current = get_object_or_404(queryset, pk=pk)
+    data = request.POST.copy()
+    data["version"] = current.version
+    form = form_class(data, instance=current)
+    theirs = [(form[name].label, getattr(current, name)) for name in form.changed_fields()]
+    form.add_error(None, EDIT_CONFLICT.format(current._meta.verbose_name))
+    return form, theirs
+
+
+def _posted_version(request):
+    value = request.POST.get("version", "")
+    return int(value) if value.isdigit() else None
+
 # --------- Patient Views --------- #
 
 def generate_chart_number():
-    # Simple unique ID; you can change the format
-    return "P-" + uuid.uuid4().hex[:8].upper()
+    # Sequential, from a per-process reserved block (clinic/chart_numbers.py)
+    return next_chart_number()
+
+
+def render_patient_rows(patients):
+    return render_rows("clinic/rows/patient_row.html", patients, lambda p: (p.updated_at,))
+
 
+PATIENT_EXPORT_FIELDS = ["chart_number", "last_name", "first_name", "date_of_birth", "phone", "email"]
 
+
+@read_replica
 def patient_list(request):
-    patients = Patient.objects.all()
-    return render(request, "clinic/patient_list.html", {"patients": patients})
+    export_format = request.GET.get("format")
+    if export_format in EXPORT_FORMATS:
+        qs = Patient.objects.order_by("last_name", "first_name", "id")
+        return stream_export(qs, PATIENT_EXPORT_FIELDS, export_format, "patients")
+
+    # Keyset pagination on Meta.ordering + id (see Patient.Meta.indexes)
+    patients = keyset_paginate(
+        Patient.objects.all(),
+        ["last_name", "first_name", "id"],
+        cursor=request.GET.get("cursor"),
+        page_size=_list_page_size(request),
+    )
+    return _render_list(request, "clinic/patient_list.html", {"patients": patients}, patients, render_patient_rows)
 
 
 def patient_create(request):
@@ -31,7 +117,9 @@ def patient_create(request):
         if form.is_valid():
             patient = form.save(commit=False)
             patient.chart_number = generate_chart_number()
-            patient.save()
+            # The patient, its search terms and its outbox event commit together
+            with transaction.atomic():
+                patient.save()
             messages.success(request, "Patient created successfully.")
             return redirect("patient_list")
     else:
@@ -40,18 +128,31 @@ def patient_create(request):
 
 
 def patient_edit(request, patient_id):
+    # Not from the cache: the form carries the row's version, and a stale
+    # cached copy would make the save a guaranteed edit conflict
     patient = get_object_or_404(Patient, pk=patient_id)
+    conflicts = None
     if request.method == "POST":
         form = PatientForm(request.POST, instance=patient)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Patient updated successfully.")
-            return redirect("patient_list")
+            try:
+                changed = form.changed_fields()
+                if changed:
+                    # One UPDATE of the changed columns, only if nobody saved since the form was rendered
+                    with transaction.atomic():
+                        patient.save_changes(changed, form.expected_version())
+                messages.success(request, "Patient updated successfully.")
+                return redirect("patient_list")
+            except EditConflict:
+                form, conflicts = _conflict_form(PatientForm, request, Patient.objects, patient_id)
     else:
         form = PatientForm(instance=patient)
-    return render(request, "clinic/patient_form.html", {"form": form, "title": "Edit Patient"})
+    return render(
+        request, "clinic/patient_form.html", {"form": form, "title": "Edit Patient", "conflicts": conflicts},
+    )
 
 
+@read_replica
 def patient_search(request):
     form = PatientSearchForm(request.GET or None)
     results = []
@@ -60,20 +161,8 @@ def patient_search(request):
         dob = form.cleaned_data.get("date_of_birth")
         phone = form.cleaned_data.get("phone")
 
-        qs = Patient.objects.all()
-
-        if name:
-            # Partial, case-insensitive match on first OR last name
-            qs = qs.filter(
-                Q(first_name__icontains=name) |
-                Q(last_name__icontains=name)
-            )
-        if dob:
-            qs = qs.filter(date_of_birth=dob)
-        if phone:
-            qs = qs.filter(phone__icontains=phone)
-
-        results = qs
+        # Ranked lookup against the PatientSearchTerm index (clinic/search.py)
+        results = search_patients(name=name, date_of_birth=dob, phone=phone)
 
     context = {
         "form": form,
@@ -82,11 +171,70 @@ def patient_search(request):
     return render(request, "clinic/patient_search.html", context)
 
 
+@read_replica
+def patient_history(request, patient_id):
+    """All of a patient's appointments, live and archived, newest first."""
+    patient = get_object_or_404(Patient, pk=patient_id)
+    cursor = request.GET.get("cursor")
+    appointments, next_cursor = history_page(patient.pk, cursor=cursor, page_size=_page_size())
+    context = {
+        "patient": patient,
+        "appointments": appointments,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+    }
+    return render(request, "clinic/patient_history.html", context)
+
+
+AUTOCOMPLETE_LIMIT = 20
+
+
+@read_replica
+def patient_autocomplete(request):
+    q = request.GET.get("q", "")
+    patients = prefix_search(q, limit=AUTOCOMPLETE_LIMIT) if len(q.strip()) >= 2 else []
+    return JsonResponse({"results": [{"id": p.pk, "text": str(p)} for p in patients]})
+
+
 # --------- Appointment Views --------- #
 
+APPOINTMENT_EXPORT_FIELDS = [
+    "id",
+    "patient__chart_number",
+    "patient__last_name",
+    "patient__first_name",
+    "provider__name",
+    "start_time",
+    "end_time",
+    "reason",
+    "status",
+]
+
+
+def render_appointment_rows(appointments):
+    # Rows show the patient's and provider's names, so their updated_at is part of the key
+    return render_rows(
+        "clinic/rows/appointment_row.html", appointments,
+        lambda a: (a.updated_at, a.patient.updated_at, a.provider.updated_at),
+    )
+
+
+@read_replica
 def appointment_list(request):
-    appointments = Appointment.objects.select_related("patient", "provider").order_by("start_time")
-    return render(request, "clinic/appointment_list.html", {"appointments": appointments})
+    export_format = request.GET.get("format")
+    if export_format in EXPORT_FORMATS:
+        qs = Appointment.objects.order_by("start_time", "id")
+        return stream_export(qs, APPOINTMENT_EXPORT_FIELDS, export_format, "appointments")
+
+    appointments = keyset_paginate(
+        Appointment.objects.select_related("patient", "provider"),
+        ["start_time", "id"],
+        cursor=request.GET.get("cursor"),
+        page_size=_list_page_size(request),
+    )
+    return _render_list(
+        request, "clinic/appointment_list.html", {"appointments": appointments}, appointments, render_appointment_rows,
+    )
 
 
 def appointment_create(request):
@@ -95,48 +243,74 @@ def appointment_create(request):
         if form.is_valid():
             appointment = form.save(commit=False)
             try:
-                appointment.full_clean()  # triggers model.clean() for conflict checking
-                appointment.save()
+                # Locked, single-query conflict check + save in one transaction
+                save_appointment(appointment)
                 messages.success(request, "Appointment created successfully.")
                 return redirect("appointment_list")
             except ValidationError as e:
                 form.add_error(None, e)
     else:
-        form = AppointmentForm()
+        # Allow prefilling from e.g. the availability search "Book" links
+        initial = {k: request.GET[k] for k in ("patient", "provider", "start_time", "end_time") if k in request.GET}
+        form = AppointmentForm(initial=initial)
 
     return render(request, "clinic/appointment_form.html", {"form": form, "title": "Create Appointment"})
 
 
 def appointment_edit(request, appointment_id):
     appointment = get_object_or_404(Appointment, pk=appointment_id)
+    conflicts = None
     if request.method == "POST":
         form = AppointmentForm(request.POST, instance=appointment)
         if form.is_valid():
             appointment = form.save(commit=False)
             try:
-                appointment.full_clean()
-                appointment.save()
+                changed = form.changed_fields()
+                if changed:
+                    # Changed columns only, conditional on the version the form was rendered from
+                    save_appointment(appointment, changed, form.expected_version())
                 messages.success(request, "Appointment updated successfully.")
                 return redirect("appointment_list")
             except ValidationError as e:
                 form.add_error(None, e)
+            except EditConflict:
+                form, conflicts = _conflict_form(AppointmentForm, request, Appointment.objects, appointment_id)
     else:
         form = AppointmentForm(instance=appointment)
 
-    return render(request, "clinic/appointment_form.html", {"form": form, "title": "Edit Appointment"})
+    return render(
+        request, "clinic/appointment_form.html", {"form": form, "title": "Edit Appointment", "conflicts": conflicts},
+    )
 
 
 def appointment_cancel(request, appointment_id):
-    appointment = get_object_or_404(Appointment, pk=appointment_id)
+    changed = False
     if request.method == "POST":
-        appointment.status = "canceled"
-        appointment.save()
-        messages.success(request, "Appointment canceled successfully.")
+        try:
+            # Conditional UPDATE first; the row is only read back once it is ours
+            cancel_appointment(appointment_id, _posted_version(request))
+            messages.success(request, "Appointment canceled successfully.")
+            return redirect("appointment_list")
+        except EditConflict:
+            changed = True
+
+    appointment = get_object_or_404(Appointment.objects.select_related("patient", "provider"), pk=appointment_id)
+    if changed and appointment.status == "canceled":
+        messages.info(request, "Appointment was already canceled.")
         return redirect("appointment_list")
+    return render(
+        request, "clinic/appointment_cancel_confirm.html", {"appointment": appointment, "changed": changed},
+    )
 
-    return render(request, "clinic/appointment_cancel_confirm.html", {"appointment": appointment})
 
+def _parse_date(value, default=None):
+    try:
+        return datetime.strptime(value or "", "%Y-%m-%d").date()
+    except ValueError:
+        return default or date.today()
 
+
+@read_replica
 def provider_calendar(request):
     """
     Simple provider availability view:
@@ -144,34 +318,23 @@ def provider_calendar(request):
     - Choose date
     - See all appointments for that day
     """
-    providers = Provider.objects.all()
+    providers = get_providers()
     provider_id = request.GET.get("provider")
-    date_str = request.GET.get("date")
 
     selected_provider = None
     appointments = []
 
     # Default date = today
-    if date_str:
-        try:
-            selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        except ValueError:
-            selected_date = date.today()
-    else:
-        selected_date = date.today()
+    selected_date = _parse_date(request.GET.get("date"))
 
     if provider_id:
-        selected_provider = get_object_or_404(Provider, pk=provider_id)
-        # Get appointments for this provider on selected_date
-        start_dt = datetime.combine(selected_date, datetime.min.time())
-        end_dt = datetime.combine(selected_date, datetime.max.time())
-
-        appointments = Appointment.objects.filter(
-            provider=selected_provider,
-            start_time__gte=start_dt,
-            start_time__lte=end_dt,
-            status="scheduled",
-        ).select_related("patient")
+        selected_provider = next((p for p in providers if str(p.pk) == provider_id), None)
+        if selected_provider is None:
+            raise Http404("No Provider matches the given query.")
+        # Cached day bucket for this provider (clinic/schedule.py)
+        appointments = get_schedule([selected_provider.pk], selected_date, selected_date)[
+            (selected_provider.pk, selected_date)
+        ]
 
     context = {
         "providers": providers,
@@ -180,3 +343,196 @@ def provider_calendar(request):
         "appointments": appointments,
     }
     return render(request, "clinic/provider_calendar.html", context)
+
+
+def _schedule_range(view, selected_date):
+    if view == "month":
+        start = selected_date.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        start = selected_date - timedelta(days=selected_date.weekday())
+        end = start + timedelta(days=6)
+    return start, end
+
+
+def _selected_provider_ids(request):
+    return [int(pk) for pk in request.GET.getlist("provider") if pk.isdigit()]
+
+
+@read_replica
+def provider_schedule(request):
+    """
+    Week / month calendar for one or more providers:
+    - Choose providers, week or month, and any date in it
+    - Rows are days, columns are providers
+    """
+    providers = get_providers()
+    view = "month" if request.GET.get("view") == "month" else "week"
+    selected_date = _parse_date(request.GET.get("date"))
+    start_date, end_date = _schedule_range(view, selected_date)
+
+    selected_providers = []
+    days = []
+    selected_ids = _selected_provider_ids(request)
+    if selected_ids:
+        selected_providers = [p for p in providers if p.pk in selected_ids]
+        schedule = get_schedule([p.pk for p in selected_providers], start_date, end_date)
+        dates = list(date_range(start_date, end_date))
+        cells = render_cells(
+            "clinic/rows/schedule_cell.html", [schedule[(p.pk, day)] for day in dates for p in selected_providers],
+        )
+        width = len(selected_providers)
+        days = [{"date": day, "cells": cells[i * width:(i + 1) * width]} for i, day in enumerate(dates)]
+
+    previous_date = start_date - timedelta(days=1)
+    if view == "month":
+        previous_date = previous_date.replace(day=1)
+    context = {
+        "providers": providers,
+        "selected_ids": selected_ids,
+        "selected_providers": selected_providers,
+        "view": view,
+        "selected_date": selected_date,
+        "start_date": start_date,
+        "end_date": end_date,
+        "previous_date": previous_date,
+        "next_date": end_date + timedelta(days=1),
+        "days": days,
+    }
+    return render(request, "clinic/provider_schedule.html", context)
+
+
+MAX_SCHEDULE_API_DAYS = 62
+
+
+@read_replica
+def provider_schedule_api(request):
+    """
+    JSON schedule for ?provider=<id>&provider=<id> between ?start= and ?end=
+    (YYYY-MM-DD, inclusive), or for the ?view=week|month containing ?date=.
+    """
+    provider_ids = _selected_provider_ids(request)
+    if not provider_ids:
+        return JsonResponse({"error": "At least one provider is required."}, status=400)
+
+    if request.GET.get("start"):
+        start_date = _parse_date(request.GET.get("start"))
+        end_date = _parse_date(request.GET.get("end"), default=start_date)
+    else:
+        start_date, end_date = _schedule_range(request.GET.get("view"), _parse_date(request.GET.get("date")))
+
+    if end_date < start_date or (end_date - start_date).days >= MAX_SCHEDULE_API_DAYS:
+        return JsonResponse({"error": f"Range must be 1-{MAX_SCHEDULE_API_DAYS} days."}, status=400)
+
+    provider_ids = list(Provider.objects.filter(pk__in=provider_ids).values_list("pk", flat=True))
+    schedule = get_schedule(provider_ids, start_date, end_date)
+    days = {
+        day.isoformat(): {str(pk): schedule[(pk, day)] for pk in provider_ids}
+        for day in date_range(start_date, end_date)
+    }
+    return JsonResponse({
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "providers": provider_ids,
+        "days": days,
+    })
+
+
+@read_replica
+def provider_autocomplete(request):
+    q = request.GET.get("q", "").strip()
+    providers = []
+    if q:
+        # istartswith is a plain LIKE 'abc%' on MySQL, so it can use the name index
+        providers = Provider.objects.filter(name__istartswith=q).order_by("name")[:AUTOCOMPLETE_LIMIT]
+    return JsonResponse({"results": [{"id": p.pk, "text": str(p)} for p in providers]})
+
+
+@read_replica
+def provider_availability(request):
+    """
+    Next-available search:
+    - Choose a provider or a specialty
+    - Choose duration and date range
+    - See the first N free slots across matching providers
+    """
+    form = AvailabilitySearchForm(request.GET or None, initial={"start_date": date.today()})
+    slots = []
+    if form.is_valid():
+        provider = form.cleaned_data.get("provider")
+        if provider:
+            providers = {provider.pk: provider}
+        else:
+            providers = Provider.objects.filter(specialty__iexact=form.cleaned_data["specialty"]).in_bulk()
+
+        start_date = form.cleaned_data["start_date"]
+        found = find_free_slots(
+            providers.keys(),
+            timedelta(minutes=form.cleaned_data["duration"]),
+            start_date,
+            start_date + timedelta(days=form.cleaned_data["days"] - 1),
+            limit=form.cleaned_data["limit"],
+        )
+        slots = [
+            {"provider": providers[provider_id], "start_time": start, "end_time": end}
+            for start, provider_id, end in found
+        ]
+
+    return render(request, "clinic/provider_availability.html", {"form": form, "slots": slots})
+
+
+# --------- Reports --------- #
+
+@read_replica
+def utilization_report(request):
+    """
+    Provider utilization (booked, canceled and open minutes against working
+    hours) per provider and period, read from ProviderDailySummary only.
+    """
+    today = date.today()
+    default_start = (today.replace(day=1) - timedelta(days=335)).replace(day=1)
+    form = UtilizationReportForm(request.GET or None, initial={"start_date": default_start, "end_date": today})
+    rows = []
+    if form.is_valid():
+        providers = None
+        if form.cleaned_data["provider"]:
+            providers = [form.cleaned_data["provider"]]
+        elif form.cleaned_data["specialty"]:
+            providers = Provider.objects.filter(specialty__iexact=form.cleaned_data["specialty"]).order_by("name", "id")
+        rows = build_utilization_report(
+            form.cleaned_data["start_date"],
+            form.cleaned_data["end_date"],
+            group=form.cleaned_data["group"],
+            providers=providers,
+        )
+    return render(request, "clinic/utilization_report.html", {"form": form, "rows": rows})
+
+
+# --------- Monitoring Views --------- #
+
+def metrics(request):
+    """Prometheus text-format export of this worker's request metrics."""
+    allowed_ips = getattr(settings, "CLINIC_METRICS_ALLOWED_IPS", ["127.0.0.1"])
+    if not (request.user.is_staff or request.META.get("REMOTE_ADDR") in allowed_ips):
+        return HttpResponseForbidden()
+    return HttpResponse(clinic_metrics.prometheus_text(), content_type="text/plain; version=0.0.4")
+
+
+def profiling_dashboard(request):
+    """Admin page: per-view latency percentiles and SQL stats for this worker."""
+    if request.method == "POST" and "reset" in request.POST:
+        clinic_metrics.registry.reset()
+        reset_cache_stats()
+        return redirect("profiling_dashboard")
+    context = {
+        **admin.site.each_context(request),
+        "title": "Request profiling",
+        "rows": clinic_metrics.summary_rows(),
+        "cache_rows": [
+            {"namespace": ns, "hits": hits, "misses": misses,
+             "hit_rate": hits / (hits + misses) if hits + misses else None}
+            for ns, (hits, misses) in cache_stats().items()
+        ],
+        "sample_rate": getattr(settings, "CLINIC_PROFILING_SAMPLE_RATE", 0.05),
+    }
+    return render(request, "clinic/admin/profiling.html", context)
@@ -0,0 +1,55 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+
+
+class AutocompleteSelect(forms.Select):
+    """
+    <select> that only renders the currently selected option. Other choices
+    are fetched as the user types from a JSON endpoint returning
+    {"results": [{"id": ..., "text": ...}]}, so rendering the form costs at
+    most one primary-key lookup regardless of table size.
+    """
+
+    class Media:
+        js = ["clinic/js/autocomplete.js"]
+
+    def __init__(self, url_name, model, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.model = model
+
+    def __deepcopy__(self, memo):
+        obj = super().__deepcopy__(memo)
+        obj.url_name = self.url_name
+        obj.model = self.model
+        return obj
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-autocomplete-url"] = str(reverse_lazy(self.url_name))
+        return attrs
+
+    def _valid_pks(self, value):
+        # A re-rendered bound form can carry whatever was posted; values that
+        # aren't a valid primary key can't be selected, so skip them rather
+        # than letting the lookup raise.
+        pk_field = self.model._meta.pk
+        pks = []
+        for v in value:
+            if not v:
+                continue
+            try:
+                pks.append(pk_field.to_python(v))
+            except ValidationError:
+                continue
+        return pks
+
+    def optgroups(self, name, value, attrs=None):
+        selected = self._valid_pks(value)
+        options = [self.create_option(name, "", "---------", not selected, 0)]
+        if selected:
+            objs = self.model._default_manager.filter(pk__in=selected)
+            for index, obj in enumerate(objs, start=1):
+                options.append(self.create_option(name, str(obj.pk), str(obj), True, index))
+        return [(None, options, 0)]
@@ -0,0 +1,14 @@
+"""
+Admin URLs for lean startup (CLINIC_LEAN_STARTUP=1).
+
+hospital_project/urls.py points admin/ at this module by name, so it is
+imported, and every app's admin.py autodiscovered, by the first request
+under /admin/ (or the first reverse() of an admin: URL) instead of at
+startup.
+"""
+from django.contrib import admin
+
+# SimpleAdminConfig skipped this during django.setup()
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
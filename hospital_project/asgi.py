@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+# Imported first: startup phases are timed from here (see clinic/startup.py)
+from clinic import startup
+
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_project.settings')
 
 application = get_asgi_application()
+
+# Startup phases; in lean mode also warms URLs, templates, connections and the schedule index
+startup.application_loaded()
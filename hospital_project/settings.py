@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,6 +28,11 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+# Lean startup (clinic/startup.py): load the admin on the first /admin/
+# request instead of during django.setup(), and warm URLs, templates, DB
+# connections and the schedule index before a web worker takes traffic
+CLINIC_LEAN_STARTUP = os.environ.get("CLINIC_LEAN_STARTUP", "0") == "1"
+
 
 # Application definition
 
@@ -40,14 +46,24 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 ]
 
+if CLINIC_LEAN_STARTUP:
+    # Same admin without autodiscover() at startup; see hospital_project/admin_urls.py
+    INSTALLED_APPS[INSTALLED_APPS.index('django.contrib.admin')] = 'django.contrib.admin.apps.SimpleAdminConfig'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Scopes the clinic models to the Tenant the host resolves to
+    'clinic.middleware.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Read-your-writes: keeps a client on the primary briefly after it writes
+    'clinic.middleware.ReplicaPinningMiddleware',
+    # Opt-in per-view latency/SQL profiling; see /metrics/ and /admin/profiling/
+    # 'clinic.middleware.QueryProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'hospital_project.urls'
@@ -56,8 +72,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Compiled templates are kept per process (lean startup fills the
+            # cache before the first request); runserver resets it on change
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
@@ -72,19 +95,104 @@ WSGI_APPLICATION = 'hospital_project.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.mysql",
-        "NAME": "hospital_db",      # your MySQL database name
-        "USER": "hospital_user",    # your MySQL username
-        "PASSWORD": "ruKgoj_kuxzi7-xihDyr",
-        "HOST": "localhost",
-        "PORT": "3306",
-        "OPTIONS": {
-            "charset": "utf8mb4",
+#
+#   CLINIC_DB_BACKEND=mysql   - MySQL primary below; read replicas from
+#                               CLINIC_DB_REPLICA_HOSTS (comma-separated)
+#   CLINIC_DB_BACKEND=sqlite  - local stand-in: db.sqlite3 as primary and
+#                               db_replica.sqlite3 as its replica, refreshed
+#                               with `python manage.py sync_replica`
+#
+# Connections are kept open for CLINIC_DB_CONN_MAX_AGE seconds (0 closes them
+# after every request) and health-checked before reuse.
+
+CLINIC_DB_BACKEND = os.environ.get("CLINIC_DB_BACKEND", "mysql")
+CLINIC_DB_CONN_MAX_AGE = int(os.environ.get("CLINIC_DB_CONN_MAX_AGE", 60))
+
+if CLINIC_DB_BACKEND == "sqlite":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "CONN_MAX_AGE": CLINIC_DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        },
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db_replica.sqlite3",
+            "CONN_MAX_AGE": CLINIC_DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "TEST": {"MIRROR": "default"},
         },
     }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.mysql",
+            "NAME": "hospital_db",      # your MySQL database name
+            "USER": "hospital_user",    # your MySQL username
+            "PASSWORD": "ruKgoj_kuxzi7-xihDyr",
+            "HOST": "localhost",
+            "PORT": "3306",
+            "OPTIONS": {
+                "charset": "utf8mb4",
+            },
+            "CONN_MAX_AGE": CLINIC_DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        }
+    }
+    for i, host in enumerate(filter(None, os.environ.get("CLINIC_DB_REPLICA_HOSTS", "").split(",")), start=1):
+        DATABASES[f"replica{i}"] = {
+            **DATABASES["default"],
+            "HOST": host.strip(),
+            "TEST": {"MIRROR": "default"},
+        }
+
+# Read-only views (@read_replica) read clinic data from one of these
+CLINIC_READ_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+
+DATABASE_ROUTERS = ["clinic.routers.ReplicaRouter"]
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# The "clinic" cache holds provider lists, patient records and per-day
+# schedules (clinic/caching.py). Pick a backend that needs no extra service:
+#   locmem - per process; fine for a single worker / development
+#   file   - shared by every worker on the host
+#   db     - shared by every host; run `python manage.py createcachetable` first
+
+CLINIC_CACHE_BACKEND = os.environ.get("CLINIC_CACHE_BACKEND", "file")
+
+CLINIC_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "clinic",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache" / "clinic",
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "clinic_cache",
+        "OPTIONS": {"MAX_ENTRIES": 1_000_000},
+    },
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "clinic": CLINIC_CACHE_BACKENDS[CLINIC_CACHE_BACKEND],
+    # Rendered list rows (clinic/fragments.py): small entries read and written
+    # a page at a time, kept per process (the file cache writes one file each)
+    "fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "fragments",
+        "OPTIONS": {"MAX_ENTRIES": 20_000},
+    },
 }
 
 
@@ -128,3 +236,124 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Clinic app tuning
+
+# Tenants (clinic/tenants.py): hosts that match no Tenant's domain or
+# subdomain slug are served as the DEFAULT tenant (created on first use),
+# or get a 404 with CLINIC_TENANT_REQUIRED=1
+CLINIC_DEFAULT_TENANT = os.environ.get("CLINIC_DEFAULT_TENANT", "default")
+CLINIC_TENANT_REQUIRED = os.environ.get("CLINIC_TENANT_REQUIRED", "0") == "1"
+
+# Rows per page for the keyset-paginated patient/appointment lists
+CLINIC_PAGE_SIZE = 50
+
+# Rows fetched per round trip when streaming CSV/NDJSON exports
+CLINIC_EXPORT_CHUNK_SIZE = 2000
+
+# Maximum number of ranked matches returned by patient search
+CLINIC_SEARCH_RESULT_LIMIT = 50
+
+# Provider hours used by the availability search when a provider has no
+# ProviderWorkingHours rows, keyed by weekday (Monday = 0)
+CLINIC_DEFAULT_WORKING_HOURS = {
+    0: [("09:00", "17:00")],
+    1: [("09:00", "17:00")],
+    2: [("09:00", "17:00")],
+    3: [("09:00", "17:00")],
+    4: [("09:00", "17:00")],
+}
+
+# Granularity of offered appointment start times
+CLINIC_SLOT_STEP_MINUTES = 15
+
+# Seconds a cached provider-day schedule bucket lives (invalidated on change)
+CLINIC_SCHEDULE_CACHE_TIMEOUT = 300
+
+# Fraction of requests whose SQL is counted/timed by QueryProfilingMiddleware
+# (wall time is always recorded)
+CLINIC_PROFILING_SAMPLE_RATE = 0.05
+
+# Addresses allowed to scrape /metrics/ without a staff login
+CLINIC_METRICS_ALLOWED_IPS = ["127.0.0.1"]
+
+# Default lifetime of clinic cache entries (invalidated on change regardless)
+CLINIC_CACHE_TIMEOUT = 600
+
+# Async booking API: bookings saved concurrently (= max DB connections used),
+# queue length, and seconds to wait for a queue slot before answering 503
+CLINIC_BOOKING_WORKERS = 4
+CLINIC_BOOKING_QUEUE_SIZE = 100
+CLINIC_BOOKING_QUEUE_TIMEOUT = 2.0
+
+# Seconds a client reads from the primary after a write (covers replica lag)
+CLINIC_REPLICA_PIN_SECONDS = 10
+
+# archive_appointments moves rows that started more than this many months
+# ago (canceled ones sooner) out of the live Appointment table
+CLINIC_ARCHIVE_AFTER_MONTHS = 12
+CLINIC_ARCHIVE_CANCELED_AFTER_MONTHS = 1
+
+# In-memory schedule index (clinic/interval_index.py): loaded in the
+# background on first use (at startup in lean mode), checked against the DB version at most every
+# CHECK_SECONDS, fully reloaded after MAX_AGE seconds. SKEW_SECONDS of
+# updated_at overlap covers transactions that commit out of order. Each
+# process bumps the shared version row at most every BUMP_SECONDS.
+CLINIC_SCHEDULE_INDEX_ENABLED = True
+CLINIC_SCHEDULE_INDEX_CHECK_SECONDS = 1.0
+CLINIC_SCHEDULE_INDEX_MAX_AGE = 600
+CLINIC_SCHEDULE_INDEX_SKEW_SECONDS = 30
+CLINIC_SCHEDULE_INDEX_BUMP_SECONDS = 1.0
+
+# New chart numbers are <PREFIX>-000000001, ... (clinic/chart_numbers.py);
+# single creates reserve BLOCK numbers at a time per process
+CLINIC_CHART_NUMBER_PREFIX = "C"
+CLINIC_CHART_NUMBER_BLOCK = 50
+
+# Long HTML lists (/patients/, /appointments/): largest ?page_size=, pages
+# longer than STREAM_CHUNK_ROWS are streamed in chunks of that many rows,
+# and lifetime of a cached row fragment (clinic/fragments.py)
+CLINIC_LIST_MAX_PAGE_SIZE = 1000
+CLINIC_STREAM_CHUNK_ROWS = 200
+CLINIC_FRAGMENT_CACHE_TIMEOUT = 3600
+
+# Largest ?page_size= the JSON API (/api/v1/) accepts
+CLINIC_API_MAX_PAGE_SIZE = 500
+
+# The ?updated_since= feed's "last_updated" stays this far behind now, so
+# rows whose transaction commits (or replicates) late are still picked up
+CLINIC_API_FEED_SKEW_SECONDS = 30
+
+# Admin changelists count at most this many rows; larger unfiltered tables
+# show MySQL's row estimate, filtered lists "<limit>+" (clinic/large_tables.py)
+CLINIC_ADMIN_COUNT_LIMIT = 10000
+
+# Outbox (clinic/outbox.py): stream_outbox waits up to SETTLE_SECONDS for a
+# gap in event ids to be filled by a still-open transaction, then reads past
+# it and polls the missing ids for another GAP_SECONDS; --prune drops
+# delivered events older than RETENTION_DAYS
+CLINIC_OUTBOX_SETTLE_SECONDS = 30
+CLINIC_OUTBOX_GAP_SECONDS = 3600
+CLINIC_OUTBOX_RETENTION_DAYS = 30
+
+# Appointment reminders (clinic/reminders.py, `manage.py send_reminders`):
+# sent LEAD_HOURS before the appointment through TRANSPORT (FileTransport
+# appends to FILE), by WORKERS threads at no more than RATE_PER_SECOND,
+# claimed BATCH_SIZE at a time for LEASE_SECONDS. Failed sends are retried
+# after RETRY_SECONDS, doubling, up to MAX_ATTEMPTS.
+CLINIC_REMINDER_LEAD_HOURS = 24
+CLINIC_REMINDER_TRANSPORT = os.environ.get("CLINIC_REMINDER_TRANSPORT", "clinic.reminders.EmailTransport")
+CLINIC_REMINDER_FILE = os.environ.get("CLINIC_REMINDER_FILE", str(BASE_DIR / "reminders.ndjson"))
+CLINIC_REMINDER_WORKERS = 8
+CLINIC_REMINDER_RATE_PER_SECOND = 20
+CLINIC_REMINDER_BATCH_SIZE = 200
+CLINIC_REMINDER_LEASE_SECONDS = 300
+CLINIC_REMINDER_RETRY_SECONDS = 60
+CLINIC_REMINDER_MAX_ATTEMPTS = 5
+
+# Email for reminders; e.g. CLINIC_EMAIL_PORT=1025 with a local SMTP debug
+# server (python -m aiosmtpd -n -l localhost:1025)
+EMAIL_HOST = os.environ.get("CLINIC_EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("CLINIC_EMAIL_PORT", 25))
+DEFAULT_FROM_EMAIL = os.environ.get("CLINIC_EMAIL_FROM", "reminders@clinic.local")
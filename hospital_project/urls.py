@@ -14,10 +14,40 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
+from django.urls.resolvers import RoutePattern, URLResolver
+
+from clinic import views as clinic_views
+
+
+class LazyURLResolver(URLResolver):
+    """
+    Imports its URLconf (given by module name) when a request or reverse()
+    first needs it, instead of when the parent URLconf is populated.
+    """
+
+    def _populate(self):
+        # The parent calls this for every child while building its own reverse tables
+        if "urlconf_module" in self.__dict__:
+            super()._populate()
+
+    def _reverse_with_prefix(self, *args, **kwargs):
+        self.urlconf_module
+        return super()._reverse_with_prefix(*args, **kwargs)
+
+
+if getattr(settings, "CLINIC_LEAN_STARTUP", False):
+    # The admin is autodiscovered by the first /admin/ request
+    admin_urls = LazyURLResolver(
+        RoutePattern("admin/", is_endpoint=False), "hospital_project.admin_urls", app_name="admin", namespace="admin",
+    )
+else:
+    admin_urls = path('admin/', admin.site.urls)
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    path('admin/profiling/', admin.site.admin_view(clinic_views.profiling_dashboard), name="profiling_dashboard"),
+    admin_urls,
     path("", include("clinic.urls"))
 ]
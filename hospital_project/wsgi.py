@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+# Imported first: startup phases are timed from here (see clinic/startup.py)
+from clinic import startup
+
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital_project.settings')
 
 application = get_wsgi_application()
+
+# Startup phases; in lean mode also warms URLs, templates, connections and the schedule index
+startup.application_loaded()